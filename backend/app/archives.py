@@ -0,0 +1,137 @@
+"""Zip archives of folders and projects, streamed while they are built.
+
+zipfile writes to a sink that is drained after every chunk, so the archive
+never sits in memory or on disk. The sink is unseekable, so entries carry
+data descriptors and ZIP64 records are written where sizes or offsets need
+them. A few objects are opened ahead of the one being written, which keeps
+MinIO busy while the client reads.
+"""
+from datetime import datetime
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional
+import asyncio
+import zipfile
+
+from app.config import settings
+from app.minio_client import minio_client
+from app.models import FileNode, FileNodeType
+
+_COMPRESSIBLE = ("text/", "application/json", "application/xml", "application/javascript")
+
+
+@dataclass
+class ArchiveEntry:
+    name: str  # path inside the archive; folders end with "/"
+    storage_path: Optional[str] = None
+    size: Optional[int] = None
+    mime_type: Optional[str] = None
+    modified: Optional[datetime] = None
+
+
+class _Sink:
+    """Write-only buffer handed to ZipFile; drain() returns what was written since the last call"""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def archive_entries(nodes: List[FileNode], root: Optional[FileNode], root_name: str) -> List[ArchiveEntry]:
+    """Entries for root's subtree (root None = whole project), nested under root_name/"""
+    names: Dict[str, str] = {node.id: node.name for node in nodes}
+    skip = len(root.path.strip('/').split('/')) if root else 0
+    entries = []
+    for node in sorted(nodes, key=lambda n: n.path):
+        ids = node.path.strip('/').split('/')[skip:]
+        if not ids or any(i not in names for i in ids):
+            continue  # the root itself, or an orphan
+        name = "/".join([root_name] + [names[i] for i in ids])
+        if node.type == FileNodeType.FOLDER:
+            entries.append(ArchiveEntry(name=name + "/", modified=node.updated_at))
+        elif node.storage_path:
+            entries.append(ArchiveEntry(
+                name=name,
+                storage_path=node.storage_path,
+                size=node.size,
+                mime_type=node.mime_type,
+                modified=node.updated_at,
+            ))
+    return entries
+
+
+def _zip_info(entry: ArchiveEntry) -> zipfile.ZipInfo:
+    stamp = (entry.modified or datetime.utcnow()).timetuple()[:6]
+    info = zipfile.ZipInfo(entry.name, date_time=max(stamp, (1980, 1, 1, 0, 0, 0)))
+    if entry.name.endswith("/"):
+        info.external_attr = 0o40755 << 16 | 0x10
+        return info
+    info.external_attr = 0o644 << 16
+    # Photos and scans are already compressed; deflate only text such as notes and manifests
+    info.compress_type = zipfile.ZIP_STORED
+    if (entry.mime_type or "").startswith(_COMPRESSIBLE) or entry.name.endswith((".txt", ".json")):
+        info.compress_type = zipfile.ZIP_DEFLATED
+    info.file_size = entry.size or 0
+    return info
+
+
+async def stream_zip(entries: List[ArchiveEntry]) -> AsyncIterator[bytes]:
+    """Yield a zip of entries chunk by chunk, with ARCHIVE_PREFETCH objects opened ahead"""
+    files = [entry for entry in entries if entry.storage_path]
+    opened: Dict[int, asyncio.Task] = {}
+    next_to_open = 0
+
+    def open_ahead(position: int):
+        nonlocal next_to_open
+        while next_to_open < len(files) and next_to_open < position + settings.ARCHIVE_PREFETCH:
+            opened[next_to_open] = asyncio.ensure_future(minio_client.open_file(files[next_to_open].storage_path))
+            next_to_open += 1
+
+    sink = _Sink()
+    archive = zipfile.ZipFile(sink, "w", allowZip64=True)
+    position = 0
+    try:
+        for entry in entries:
+            info = _zip_info(entry)
+            if not entry.storage_path:
+                archive.writestr(info, b"")
+                continue  # directory records are flushed with the next file
+            open_ahead(position)
+            task = opened.pop(position)
+            position += 1
+            try:
+                response = await task
+            except Exception as e:
+                print(f"✗ Archive entry {entry.name} skipped: {e}")
+                continue
+            # Sizes unknown up front (older rows) get ZIP64 headers to be safe
+            force_zip64 = entry.size is None or entry.size > zipfile.ZIP64_LIMIT
+            with archive.open(info, "w", force_zip64=force_zip64) as dest:
+                async for chunk in minio_client.iter_chunks(response, settings.DOWNLOAD_CHUNK_SIZE):
+                    dest.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+        archive.close()
+        yield sink.drain()
+    finally:
+        # Client went away or an error stopped the stream: release prefetched connections
+        for task in opened.values():
+            task.cancel()
+            if task.done() and not task.cancelled() and task.exception() is None:
+                response = task.result()
+                response.close()
+                response.release_conn()
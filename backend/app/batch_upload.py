@@ -0,0 +1,240 @@
+"""Many-file imports into one folder in a single request and transaction.
+
+Plain files keep their relative path (from the `paths` form field or the
+filename). Zip and tar archives are expanded server-side into spooled temp
+files, preserving their folder structure. Folders are reused or created, files
+whose name is already taken are skipped, and the content goes through the
+blob store with bounded upload concurrency. All rows and folder totals are
+written in the caller's transaction.
+"""
+from dataclasses import dataclass, field
+from tempfile import SpooledTemporaryFile
+from typing import BinaryIO, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import mimetypes
+import tarfile
+import zipfile
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.blobs import hash_file, store_blobs
+from app.config import settings
+from app.file_tree import apply_total_deltas, assign_path
+from app.models import FileNode, FileNodeType
+from app.schemas import BatchUploadResult, FileNodeBase
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+_IGNORED_NAMES = {".DS_Store", "Thumbs.db", "desktop.ini"}
+_COPY_CHUNK = 1024 * 1024
+
+
+class BatchLimitExceeded(Exception):
+    pass
+
+
+@dataclass
+class ImportEntry:
+    folders: Tuple[str, ...]  # folder names below the target folder
+    name: str
+    stream: BinaryIO
+    content_type: str
+    sha256: Optional[str] = None
+    size: int = 0
+    owned: bool = field(default=False, repr=False)  # spool created here, closed by close_entries
+
+    @property
+    def path(self) -> str:
+        return "/".join(self.folders + (self.name,))
+
+
+def split_path(raw: str) -> Optional[Tuple[Tuple[str, ...], str]]:
+    """Sanitized (folders, name) of a client or archive path; None for nothing usable"""
+    parts = [p for p in raw.replace("\\", "/").split("/") if p not in ("", ".", "..")]
+    if not parts or parts[0] == "__MACOSX" or parts[-1] in _IGNORED_NAMES:
+        return None
+    return tuple(parts[:-1]), parts[-1]
+
+
+def is_archive(filename: Optional[str]) -> bool:
+    return bool(filename) and filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def _guess_type(name: str) -> str:
+    return mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+
+def _spool(source: BinaryIO, budget: List[int]) -> Tuple[SpooledTemporaryFile, str, int]:
+    """Copy an archive member to a spooled file, hashing on the way"""
+    spool = SpooledTemporaryFile(max_size=settings.MINIO_UPLOAD_PART_SIZE)
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        data = source.read(_COPY_CHUNK)
+        if not data:
+            break
+        size += len(data)
+        budget[0] -= len(data)
+        if budget[0] < 0:
+            spool.close()
+            raise BatchLimitExceeded("Archive expands beyond the allowed size")
+        digest.update(data)
+        spool.write(data)
+    spool.seek(0)
+    return spool, digest.hexdigest(), size
+
+
+def expand_archive(stream: BinaryIO, filename: str, prefix: Tuple[str, ...], budget: List[int], limit: int) -> List[ImportEntry]:
+    """Blocking: unpack a zip or tar into spooled entries (run it in a thread)"""
+    entries: List[ImportEntry] = []
+
+    def add(member_path: str, source: BinaryIO):
+        split = split_path(member_path)
+        if not split:
+            return
+        if len(entries) >= limit:
+            raise BatchLimitExceeded("Too many files in batch")
+        folders, name = split
+        spool, sha256, size = _spool(source, budget)
+        entries.append(ImportEntry(prefix + folders, name, spool, _guess_type(name), sha256, size, owned=True))
+
+    stream.seek(0)
+    try:
+        if filename.lower().endswith(".zip"):
+            with zipfile.ZipFile(stream) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir():
+                        with archive.open(info) as source:
+                            add(info.filename, source)
+        else:
+            # Stream mode reads members in order without seeking back
+            with tarfile.open(fileobj=stream, mode="r|*") as archive:
+                for member in archive:
+                    if member.isfile():
+                        add(member.name, archive.extractfile(member))
+    except BatchLimitExceeded:
+        close_entries(entries)
+        raise
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError) as e:
+        close_entries(entries)
+        raise ValueError(f"Unreadable archive: {e}")
+    return entries
+
+
+def close_entries(entries: List[ImportEntry]) -> None:
+    for entry in entries:
+        if entry.owned:
+            entry.stream.close()
+
+
+async def _children_by_name(db: AsyncSession, project_id: str, parent_id: Optional[str]) -> Dict[str, FileNode]:
+    where = FileNode.parent_id == parent_id if parent_id else FileNode.parent_id.is_(None)
+    nodes = (await db.scalars(select(FileNode).where(FileNode.project_id == project_id, where))).all()
+    return {node.name: node for node in nodes}
+
+
+async def import_entries(
+    db: AsyncSession,
+    project_id: str,
+    target: Optional[FileNode],
+    entries: List[ImportEntry]
+) -> Tuple[List[BatchUploadResult], List[FileNode], int]:
+    """Store entries below target (None = project root) without committing.
+
+    Returns per-entry results, the file nodes created and the number of folders created.
+    """
+    # Hash plain uploads in worker threads; archive members were hashed while spooling
+    semaphore = asyncio.Semaphore(settings.BATCH_UPLOAD_CONCURRENCY)
+
+    async def hash_entry(entry: ImportEntry):
+        async with semaphore:
+            entry.sha256, entry.size = await asyncio.to_thread(hash_file, entry.stream)
+
+    await asyncio.gather(*(hash_entry(entry) for entry in entries if entry.sha256 is None))
+
+    results: Dict[int, BatchUploadResult] = {}
+    folders: Dict[Tuple[str, ...], Optional[FileNode]] = {(): target}
+    children: Dict[Optional[str], Dict[str, FileNode]] = {}
+    folders_created = 0
+
+    async def names_in(folder: Optional[FileNode]) -> Dict[str, FileNode]:
+        key = folder.id if folder else None
+        if key not in children:
+            children[key] = await _children_by_name(db, project_id, key)
+        return children[key]
+
+    # Reuse or create every folder on the way, shallowest first
+    for path in sorted({entry.folders[:i] for entry in entries for i in range(1, len(entry.folders) + 1)}, key=len):
+        parent = folders.get(path[:-1])
+        if path[:-1] not in folders:
+            continue  # an ancestor name is taken by a file
+        siblings = await names_in(parent)
+        existing = siblings.get(path[-1])
+        if existing is not None:
+            if existing.type == FileNodeType.FOLDER:
+                folders[path] = existing
+            continue
+        folder = FileNode(
+            project_id=project_id,
+            parent_id=parent.id if parent else None,
+            name=path[-1],
+            type=FileNodeType.FOLDER,
+        )
+        assign_path(folder, parent)
+        db.add(folder)
+        siblings[folder.name] = folder
+        children[folder.id] = {}
+        folders[path] = folder
+        folders_created += 1
+
+    accepted: List[Tuple[int, ImportEntry, Optional[FileNode]]] = []
+    for index, entry in enumerate(entries):
+        if entry.folders not in folders:
+            results[index] = BatchUploadResult(path=entry.path, status="skipped", detail="A file is in the way of its folder")
+            continue
+        parent = folders[entry.folders]
+        siblings = await names_in(parent)
+        if entry.name in siblings:
+            results[index] = BatchUploadResult(path=entry.path, status="skipped", detail="Name already exists in folder")
+            continue
+        siblings[entry.name] = None  # reserve the name for this batch
+        accepted.append((index, entry, parent))
+
+    stored = await store_blobs(
+        db,
+        [(entry.stream, entry.content_type, entry.sha256, entry.size) for _, entry, _ in accepted],
+        concurrency=settings.BATCH_UPLOAD_CONCURRENCY
+    )
+
+    created: List[Tuple[int, FileNode]] = []
+    deltas: Dict[str, Tuple[int, int]] = {}
+    for (index, entry, parent), blob in zip(accepted, stored):
+        if isinstance(blob, Exception):
+            results[index] = BatchUploadResult(path=entry.path, status="failed", detail=str(blob))
+            continue
+        node = FileNode(
+            project_id=project_id,
+            parent_id=parent.id if parent else None,
+            name=entry.name,
+            type=FileNodeType.FILE,
+            mime_type=entry.content_type,
+            size=blob.size,
+            checksum=blob.sha256,
+            storage_path=blob.object_name,
+        )
+        assign_path(node, parent)
+        db.add(node)
+        created.append((index, node))
+        for ancestor_id in node.path.strip('/').split('/')[:-1]:
+            files, nbytes = deltas.get(ancestor_id, (0, 0))
+            deltas[ancestor_id] = (files + 1, nbytes + blob.size)
+
+    # Folders are added before files, so parents are inserted first
+    await db.flush()
+    await apply_total_deltas(db, deltas)
+    await db.flush()
+
+    for index, node in created:
+        results[index] = BatchUploadResult(path=entries[index].path, status="created", node=FileNodeBase.model_validate(node))
+    return [results[i] for i in range(len(entries))], [node for _, node in created], folders_created
@@ -0,0 +1,207 @@
+"""Content-addressed storage for uploaded files.
+
+An upload is hashed from its spooled copy before anything is sent to MinIO.
+Its bytes live at blobs/<aa>/<bb>/<sha256>, and the blobs table counts the
+FileNodes pointing there. A duplicate only bumps ref_count and is never
+uploaded again. The object is queued for deletion when the last reference
+goes.
+
+Objects outside the blobs/ prefix are owned by exactly one row: note .txt
+files rewritten in place, direct and resumable uploads, and files stored
+before deduplication. release_objects deletes those outright.
+"""
+from collections import Counter
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import asyncio
+import hashlib
+
+from sqlalchemy import Integer, String, column, delete, func, literal_column, select, update, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal
+from app.minio_client import minio_client
+from app.models import Blob
+from app.object_cleanup import chunks, reclaim_objects, schedule_and_purge, schedule_object_deletion
+from app.renditions import rendition_keys
+
+BLOB_PREFIX = "blobs/"
+_HASH_CHUNK = 1024 * 1024
+
+
+@dataclass
+class StoredBlob:
+    object_name: str
+    sha256: str
+    size: int
+    deduplicated: bool  # True when the bytes were already stored
+
+
+def blob_key(sha256: str) -> str:
+    return f"{BLOB_PREFIX}{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+def is_blob_key(object_name: Optional[str]) -> bool:
+    return bool(object_name) and object_name.startswith(BLOB_PREFIX)
+
+
+def hash_file(stream: BinaryIO) -> Tuple[str, int]:
+    """(sha256, size) of a seekable stream, left rewound for the upload"""
+    digest = hashlib.sha256()
+    size = 0
+    stream.seek(0)
+    while True:
+        data = stream.read(_HASH_CHUNK)
+        if not data:
+            break
+        digest.update(data)
+        size += len(data)
+    stream.seek(0)
+    return digest.hexdigest(), size
+
+
+async def store_blob(db: AsyncSession, stream: BinaryIO, content_type: str) -> StoredBlob:
+    """Take a reference on the blob holding the stream's bytes, uploading them if new"""
+    sha256, size = await asyncio.to_thread(hash_file, stream)
+    (stored,) = await store_blobs(db, [(stream, content_type, sha256, size)])
+    if isinstance(stored, Exception):
+        raise stored
+    return stored
+
+
+async def store_blobs(
+    db: AsyncSession,
+    files: Sequence[Tuple[BinaryIO, str, str, int]],
+    concurrency: int = 1
+) -> List[Union[StoredBlob, Exception]]:
+    """Take one reference per (stream, content_type, sha256, size) and upload new content.
+
+    The blobs rows are upserted in the caller's transaction. Concurrent uploads of
+    the same bytes wait on the row lock until that transaction commits, so they
+    never see a blob whose object is still in flight. New objects are uploaded
+    with at most `concurrency` in flight. A failed upload gives its files an
+    Exception in place of a StoredBlob and withdraws the blob row.
+    """
+    counts = Counter(sha256 for _, _, sha256, _ in files)
+    sources = {}
+    for stream, content_type, sha256, size in files:
+        sources.setdefault(sha256, (stream, content_type, size))
+
+    created = []
+    for chunk in chunks(sorted(counts)):
+        stmt = insert(Blob).values([
+            {"sha256": sha256, "object_name": blob_key(sha256), "size": sources[sha256][2], "ref_count": counts[sha256]}
+            for sha256 in chunk
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["sha256"],
+            set_={"ref_count": Blob.ref_count + stmt.excluded.ref_count}
+        ).returning(Blob.sha256, literal_column("xmax = 0"))
+        created.extend(sha256 for sha256, is_new in await db.execute(stmt) if is_new)
+
+    failures: Dict[str, Exception] = {}
+    if created:
+        # The same bytes may have been freed a moment ago; keep the purge away from the new copies
+        await reclaim_objects(db, [blob_key(sha256) for sha256 in created])
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def upload(sha256: str):
+            stream, content_type, _ = sources[sha256]
+            async with semaphore:
+                await minio_client.upload_stream(stream, blob_key(sha256), content_type)
+
+        outcomes = await asyncio.gather(*(upload(sha256) for sha256 in created), return_exceptions=True)
+        failures = {sha256: outcome for sha256, outcome in zip(created, outcomes) if isinstance(outcome, Exception)}
+        if failures:
+            # Created by this transaction, so no other node can reference them yet
+            await db.execute(delete(Blob).where(Blob.sha256.in_(list(failures))))
+
+    new = set(created)
+    return [
+        failures[sha256] if sha256 in failures else StoredBlob(
+            object_name=blob_key(sha256), sha256=sha256, size=size, deduplicated=sha256 not in new
+        )
+        for _, _, sha256, size in files
+    ]
+
+
+async def commit_or_release(db: AsyncSession, object_names: Iterable[Optional[str]]) -> None:
+    """Commit the caller's transaction; if that fails, queue the blobs it uploaded for deletion and re-raise.
+
+    Pass the keys the transaction stored. Deduplicated ones still have their
+    committed blobs row and are left alone.
+    """
+    try:
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        await _release_uncommitted([name for name in object_names if name and is_blob_key(name)])
+        raise
+
+
+async def _release_uncommitted(object_names: List[str]) -> None:
+    if not object_names:
+        return
+    try:
+        async with AsyncSessionLocal() as db:
+            referenced = set()
+            for chunk in chunks(sorted(set(object_names))):
+                referenced.update((await db.scalars(select(Blob.object_name).where(Blob.object_name.in_(chunk)))).all())
+            await schedule_and_purge(db, [name for name in object_names if name not in referenced])
+            await db.commit()
+    except Exception as e:
+        print(f"✗ Could not queue objects of a failed upload for deletion: {e}")
+
+
+async def release_objects(db: AsyncSession, rows: Iterable[Tuple[Optional[str], Optional[str]]]) -> List[str]:
+    """Drop the references held by removed rows and queue whatever is no longer used.
+
+    rows are (storage_path, mime_type) pairs; returns the keys scheduled for
+    deletion, ready for enqueue_purge in the same transaction.
+    """
+    rows = [(path, mime_type) for path, mime_type in rows if path]
+    mime_types: Dict[str, Optional[str]] = dict(rows)
+    released = [path for path, _ in rows if not is_blob_key(path)]
+
+    counts = Counter(path for path, _ in rows if is_blob_key(path))
+    for chunk in chunks(sorted(counts)):
+        decrements = values(
+            column("object_name", String), column("n", Integer), name="decrements"
+        ).data([(name, counts[name]) for name in chunk])
+        await db.execute(
+            update(Blob)
+            .where(Blob.object_name == decrements.c.object_name)
+            .values(ref_count=Blob.ref_count - decrements.c.n)
+        )
+        freed = await db.scalars(
+            delete(Blob)
+            .where(Blob.object_name.in_(chunk), Blob.ref_count <= 0)
+            .returning(Blob.object_name)
+        )
+        released.extend(freed)
+
+    return await schedule_object_deletion(
+        db, released + rendition_keys((path, mime_types.get(path)) for path in released)
+    )
+
+
+async def dedup_report(db: AsyncSession) -> Dict[str, int]:
+    """How much storage content addressing saves across all projects"""
+    row = (await db.execute(
+        select(
+            func.count(Blob.sha256),
+            func.coalesce(func.sum(Blob.ref_count), 0),
+            func.coalesce(func.sum(Blob.size), 0),
+            func.coalesce(func.sum(Blob.size * Blob.ref_count), 0),
+        )
+    )).one()
+    blobs, references, stored_bytes, logical_bytes = (int(value) for value in row)
+    return {
+        "blobs": blobs,
+        "references": references,
+        "stored_bytes": stored_bytes,
+        "logical_bytes": logical_bytes,
+        "bytes_saved": logical_bytes - stored_bytes,
+    }
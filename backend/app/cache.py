@@ -0,0 +1,124 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+import threading
+import time
+
+
+class CacheBackend(ABC):
+    """Storage interface behind TTLCache.
+
+    The default MemoryBackend is per-process. Implement this interface over a
+    shared store (e.g. Redis) and pass it to TTLCache.set_backend() to share
+    entries and invalidations between workers. Values must then be serializable.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    async def delete_prefix(self, prefix: str) -> None:
+        ...
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+class MemoryBackend(CacheBackend):
+    """In-process LRU with per-entry expiry"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    async def delete_prefix(self, prefix: str) -> None:
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+    def size(self) -> Optional[int]:
+        return len(self._data)
+
+
+_registry: List["TTLCache"] = []
+
+
+class TTLCache:
+    """Named cache with a TTL, LRU eviction and hit/miss counters"""
+
+    def __init__(self, name: str, ttl: float, maxsize: int, backend: Optional[CacheBackend] = None):
+        self.name = name
+        self.ttl = ttl
+        self.backend = backend or MemoryBackend(maxsize)
+        self.hits = 0
+        self.misses = 0
+        _registry.append(self)
+
+    def set_backend(self, backend: CacheBackend) -> None:
+        """Swap in a shared backend (call at startup, before serving requests)"""
+        self.backend = backend
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        value = await self.backend.get(key)
+        if value is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        await self.backend.set(key, value, self.ttl if ttl is None else ttl)
+
+    async def invalidate(self, key: str) -> None:
+        await self.backend.delete(key)
+
+    async def invalidate_prefix(self, prefix: str) -> None:
+        await self.backend.delete_prefix(prefix)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": self.backend.size(),
+            "ttl_seconds": self.ttl,
+        }
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats for every cache created in this process, keyed by cache name"""
+    return {cache.name: cache.stats() for cache in _registry}
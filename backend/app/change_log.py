@@ -0,0 +1,194 @@
+"""Per-project change log behind the delta sync API.
+
+Row triggers on notes, note_attachments, file_nodes and project_members
+append (entity, id, upsert|delete) entries in the writing transaction, so
+every path is covered, including bulk UPDATEs, subtree moves and cascades.
+Attachment changes are logged as an upsert of their note.
+
+Entries are read in (txid, id) order. Ids alone are not safe: a transaction
+that has not committed yet may already hold a lower id. Readers only take
+entries whose txid is below the xmin of their snapshot, and every
+transaction still in flight, or yet to start, has a txid at or above it.
+The cursor is that (txid, id) position plus the time it was current. Entries
+older than CHANGE_LOG_RETENTION_DAYS are pruned, and cursors older than that
+are rejected so the client falls back to a full reload.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import base64
+import calendar
+import json
+import time
+
+from fastapi import HTTPException
+from sqlalchemy import delete, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import ChangeLog
+
+SYNCED_TABLES = ("notes", "note_attachments", "file_nodes", "project_members")
+
+LOG_FUNCTION = """
+CREATE OR REPLACE FUNCTION log_row_change() RETURNS trigger AS $$
+DECLARE
+    rec record;
+    entity text;
+    entity_key text;
+    project text;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        rec := OLD;
+    ELSE
+        rec := NEW;
+    END IF;
+    IF TG_TABLE_NAME = 'notes' THEN
+        entity := 'note'; entity_key := rec.id; project := rec.project_id;
+    ELSIF TG_TABLE_NAME = 'file_nodes' THEN
+        entity := 'file_node'; entity_key := rec.id; project := rec.project_id;
+    ELSIF TG_TABLE_NAME = 'project_members' THEN
+        entity := 'member'; entity_key := rec.user_id; project := rec.project_id;
+    ELSE
+        -- note_attachments: the note's attachment list changed
+        entity := 'note'; entity_key := rec.note_id;
+        SELECT project_id INTO project FROM notes WHERE id = rec.note_id;
+        IF project IS NULL THEN
+            RETURN NULL;
+        END IF;
+        INSERT INTO change_log (project_id, entity_type, entity_id, op, txid, changed_at)
+        VALUES (project, entity, entity_key, 'upsert', pg_current_xact_id()::text::bigint, now() AT TIME ZONE 'utc');
+        RETURN NULL;
+    END IF;
+    INSERT INTO change_log (project_id, entity_type, entity_id, op, txid, changed_at)
+    VALUES (
+        project, entity, entity_key,
+        CASE WHEN TG_OP = 'DELETE' THEN 'delete' ELSE 'upsert' END,
+        pg_current_xact_id()::text::bigint,
+        now() AT TIME ZONE 'utc'
+    );
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def _trigger_ddl(table: str) -> List[str]:
+    """Idempotent CREATE TRIGGER statements logging writes to table"""
+    triggers = [
+        (f"trg_{table}_change_log_write", "AFTER INSERT OR DELETE", ""),
+        (f"trg_{table}_change_log_update", "AFTER UPDATE", "WHEN (OLD.* IS DISTINCT FROM NEW.*)"),
+    ]
+    return [
+        f"""
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = '{name}') THEN
+            CREATE TRIGGER {name} {events} ON {table}
+            FOR EACH ROW {condition} EXECUTE FUNCTION log_row_change();
+        END IF;
+    END $$
+    """
+        for name, events, condition in triggers
+    ]
+
+
+TRIGGER_MIGRATIONS = [LOG_FUNCTION] + [ddl for table in SYNCED_TABLES for ddl in _trigger_ddl(table)]
+
+
+@dataclass
+class Change:
+    entity_type: str
+    entity_id: str
+    op: str
+    changed_at: datetime
+
+
+def encode_change_cursor(txid: int, entry_id: int, stamp: Optional[float] = None) -> str:
+    """stamp: when the position was current (entries after it are younger than that)"""
+    raw = json.dumps([txid, entry_id, int(stamp if stamp is not None else time.time())]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_change_cursor(cursor: str) -> Tuple[int, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        txid, entry_id, stamp = json.loads(base64.urlsafe_b64decode(padded))
+        txid, entry_id, stamp = int(txid), int(entry_id), int(stamp)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # Entries this far back may already be pruned
+    if time.time() - stamp > settings.CHANGE_LOG_RETENTION_DAYS * 86400:
+        raise HTTPException(status_code=410, detail="Cursor expired; reload the project and sync from a new cursor")
+    return txid, entry_id
+
+
+async def _snapshot_xmin(db: AsyncSession) -> int:
+    return int(await db.scalar(text("SELECT pg_snapshot_xmin(pg_current_snapshot())::text::bigint")))
+
+
+async def read_changes(
+    db: AsyncSession,
+    project_id: str,
+    cursor: Optional[str],
+    limit: int
+) -> Tuple[List[Change], str, bool]:
+    """Changes after cursor, one per entity (latest wins), the next cursor and whether more remain.
+
+    Without a cursor nothing is returned, only the current position: take it
+    before loading the project in full, then poll from it.
+    """
+    xmin = await _snapshot_xmin(db)
+    if not cursor:
+        return [], encode_change_cursor(xmin, 0), False
+
+    txid, entry_id = decode_change_cursor(cursor)
+    rows = (await db.execute(
+        select(ChangeLog.id, ChangeLog.txid, ChangeLog.entity_type, ChangeLog.entity_id, ChangeLog.op, ChangeLog.changed_at)
+        .where(
+            ChangeLog.project_id == project_id,
+            tuple_(ChangeLog.txid, ChangeLog.id) > tuple_(txid, entry_id),
+            ChangeLog.txid < xmin,
+        )
+        .order_by(ChangeLog.txid, ChangeLog.id)
+        .limit(limit + 1)
+    )).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    latest: Dict[Tuple[str, str], Change] = {}
+    for row in rows:
+        key = (row.entity_type, row.entity_id)
+        latest.pop(key, None)  # re-insert so entities stay in the order of their last change
+        latest[key] = Change(row.entity_type, row.entity_id, row.op, row.changed_at)
+
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_change_cursor(last.txid, last.id, calendar.timegm(last.changed_at.timetuple()))
+    else:
+        # Everything below xmin has been read; later entries all have txid >= xmin
+        next_cursor = encode_change_cursor(max(xmin, txid), 0 if xmin > txid else entry_id)
+    return list(latest.values()), next_cursor, has_more
+
+
+async def prune_change_log() -> int:
+    """Delete entries past retention; returns how many were removed"""
+    cutoff = datetime.utcnow() - timedelta(days=settings.CHANGE_LOG_RETENTION_DAYS)
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(delete(ChangeLog).where(ChangeLog.changed_at < cutoff))
+        await db.commit()
+        return result.rowcount
+
+
+async def run_periodic_change_log_prune() -> None:
+    """Background loop started with the app"""
+    while True:
+        try:
+            count = await prune_change_log()
+            if count:
+                print(f"✓ Pruned {count} change log entries")
+        except Exception as e:
+            print(f"✗ Change log prune error: {e}")
+        await asyncio.sleep(settings.CHANGE_LOG_PRUNE_INTERVAL_SECONDS)
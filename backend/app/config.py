@@ -22,6 +22,11 @@ class Settings(BaseSettings):
     POSTGRES_HOST: str = "localhost"
     POSTGRES_PORT: int = 5432
     DATABASE_URL: str
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30  # seconds to wait for a pooled connection
+    DB_POOL_RECYCLE: int = 1800  # seconds before a connection is replaced
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
     
     # MinIO
     MINIO_ENDPOINT: str
@@ -29,6 +34,37 @@ class Settings(BaseSettings):
     MINIO_SECRET_KEY: str
     MINIO_BUCKET_NAME: str = "stratum-files"
     MINIO_USE_SSL: bool = False
+    MINIO_UPLOAD_PART_SIZE: int = 8 * 1024 * 1024  # bytes buffered per multipart part (min 5 MiB)
+    MINIO_REGION: str = "us-east-1"  # set explicitly so presigning never does a region lookup
+    MINIO_PUBLIC_ENDPOINT: str = ""  # host clients use for presigned URLs; defaults to MINIO_ENDPOINT
+    MINIO_PUBLIC_USE_SSL: bool = False
+    MINIO_MAX_WORKERS: int = 16  # threads running blocking SDK calls
+    MINIO_CONNECTION_POOL_SIZE: int = 32
+    MINIO_CONNECT_TIMEOUT: float = 5.0
+    MINIO_READ_TIMEOUT: float = 300.0
+    DOWNLOAD_CHUNK_SIZE: int = 256 * 1024  # bytes per chunk streamed to clients
+    DIRECT_UPLOAD_EXPIRY_SECONDS: int = 3600  # lifetime of presigned upload URLs and tokens
+    DIRECT_UPLOAD_MULTIPART_THRESHOLD: int = 64 * 1024 * 1024  # larger direct uploads use multipart
+    PRESIGNED_DOWNLOAD_EXPIRY_SECONDS: int = 300
+    PRESIGNED_URL_EXPIRY_SECONDS: int = 3600  # attachment URLs in note responses
+    PRESIGNED_URL_CACHE_TTL_SECONDS: int = 3000
+    PRESIGNED_URL_CACHE_MAX_ENTRIES: int = 50000
+    RESUMABLE_UPLOAD_TTL_SECONDS: int = 24 * 3600  # idle time before a resumable session is collected
+    RESUMABLE_UPLOAD_GC_INTERVAL_SECONDS: int = 900
+    BATCH_UPLOAD_MAX_FILES: int = 2000  # files per batch request, archive members included
+    BATCH_UPLOAD_MAX_EXPANDED_BYTES: int = 20 * 1024 ** 3  # uncompressed size allowed from archives
+    BATCH_UPLOAD_CONCURRENCY: int = 8  # objects uploaded in parallel per batch
+    ARCHIVE_PREFETCH: int = 4  # objects opened ahead while streaming a zip export
+    OBJECT_DELETE_RETRIES: int = 3  # inline attempts before leaving keys to the reconciler
+    OBJECT_DELETE_RETRY_DELAY: float = 0.5  # seconds, doubled after each attempt
+    OBJECT_RECONCILE_INTERVAL_SECONDS: int = 300
+    OBJECT_DELETE_CLAIM_SECONDS: int = 300  # keys of a purge that died are retried after this
+    OBJECT_RECLAIM_WAIT_SECONDS: float = 5.0  # an upload waits this long for a purge of the same key, then gets 503
+    
+    # Thumbnails
+    THUMBNAIL_WORKERS: int = 2  # processes decoding and resizing images
+    THUMBNAIL_QUALITY: int = 80  # WebP quality, 0-100
+    THUMBNAIL_MAX_SOURCE_BYTES: int = 64 * 1024 * 1024  # originals above this are not rendered
     
     # App
     APP_SECRET_KEY: str
@@ -41,6 +77,47 @@ class Settings(BaseSettings):
     JWT_SECRET_KEY: str
     JWT_EXPIRATION_HOURS: int = 24
     
+    # Auth cache (users and project access decisions)
+    AUTH_CACHE_TTL_SECONDS: int = 60
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+    
+    # User search (member picker) result cache
+    USER_SEARCH_CACHE_TTL_SECONDS: int = 30
+    USER_SEARCH_CACHE_MAX_ENTRIES: int = 5000
+    
+    # Full-text search over .txt files
+    TEXT_INDEX_MAX_BYTES: int = 256 * 1024
+    TEXT_INDEX_INTERVAL_SECONDS: int = 300
+    
+    # Delta sync change log
+    CHANGE_LOG_RETENTION_DAYS: int = 30
+    CHANGE_LOG_PRUNE_INTERVAL_SECONDS: int = 3600
+    
+    # Note text sync (how long a confirmed object version is trusted without a stat)
+    NOTE_SYNC_CHECK_SECONDS: int = 30
+    NOTE_SYNC_CACHE_MAX_ENTRIES: int = 50000
+    NOTE_BATCH_UPLOAD_CONCURRENCY: int = 8  # .txt objects written at once by POST /notes/batch
+    
+    # Live project events (Server-Sent Events); "postgres" shares them between workers via LISTEN/NOTIFY
+    EVENT_BACKEND: str = "memory"
+    EVENT_REPLAY_BUFFER: int = 500
+    EVENT_SUBSCRIBER_QUEUE_SIZE: int = 256
+    EVENT_HEARTBEAT_SECONDS: int = 15
+    EVENT_RETRY_MS: int = 3000
+    
+    # Background job queue (jobs table); run more workers with `python -m app.worker`
+    JOB_WORKER_IN_APP: bool = True
+    JOB_WORKER_CONCURRENCY: int = 8  # jobs claimed and run at once per worker
+    JOB_POLL_INTERVAL_SECONDS: float = 1.0
+    JOB_LEASE_SECONDS: int = 300  # a claimed job is retried if not finished by then
+    JOB_MAX_ATTEMPTS: int = 8  # then it moves to dead_jobs
+    JOB_RETRY_BASE_SECONDS: float = 2.0
+    JOB_RETRY_MAX_SECONDS: float = 900.0
+    
+    # GET /metrics: scrapers send "Authorization: Bearer <METRICS_TOKEN>"; empty disables the endpoint
+    METRICS_TOKEN: str = ""
+    METRICS_CACHE_SECONDS: int = 60  # how long the job and storage aggregates are reused
+    
     # Environment
     ENVIRONMENT: str = "development"
     
@@ -1,18 +1,52 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from app.cache import TTLCache
 from app.database import get_db
-from app.models import User
+from app.models import User, UserRole, Project, project_members
 from app.config import settings
+import hmac
 import jwt
 from datetime import datetime
 
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+# Authenticated users by id, and (project, user) access decisions.
+# Membership routes invalidate the permission entries they change.
+user_cache = TTLCache("users", ttl=settings.AUTH_CACHE_TTL_SECONDS, maxsize=settings.AUTH_CACHE_MAX_ENTRIES)
+permission_cache = TTLCache("project_permissions", ttl=settings.AUTH_CACHE_TTL_SECONDS, maxsize=settings.AUTH_CACHE_MAX_ENTRIES)
+
+
+def _user_snapshot(user: User) -> dict:
+    return {column.key: getattr(user, column.key) for column in User.__table__.columns}
+
+
+def _user_from_snapshot(snapshot: dict) -> User:
+    # Detached instance: readable like a loaded row, never re-inserted if cascaded
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return user
+
+
+async def invalidate_user(user_id: str) -> None:
+    """Drop a cached user after its row changes"""
+    await user_cache.invalidate(user_id)
+
+
+async def invalidate_project_permissions(project_id: str, user_id: str = None) -> None:
+    """Drop cached access decisions for one member, or for the whole project"""
+    if user_id:
+        await permission_cache.invalidate(f"{project_id}:{user_id}")
+    else:
+        await permission_cache.invalidate_prefix(f"{project_id}:")
 
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ) -> User:
     """Dependency to get the current authenticated user"""
     token = credentials.credentials
@@ -29,8 +63,12 @@ async def get_current_user(
                 headers={"WWW-Authenticate": "Bearer"},
             )
             
+        snapshot = await user_cache.get(user_id)
+        if snapshot:
+            return _user_from_snapshot(snapshot)
+
         # Get user from database
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await db.get(User, user_id)
         
         if not user:
             raise HTTPException(
@@ -39,6 +77,7 @@ async def get_current_user(
                 headers={"WWW-Authenticate": "Bearer"},
             )
             
+        await user_cache.set(user_id, _user_snapshot(user))
         return user
         
     except jwt.ExpiredSignatureError:
@@ -55,36 +94,55 @@ async def get_current_user(
         )
 
 
-def check_project_permission(
+def require_metrics_token(credentials: HTTPAuthorizationCredentials = Depends(optional_security)) -> None:
+    """Dependency guarding /metrics with the shared METRICS_TOKEN (404 while none is configured)"""
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if credentials is None or not hmac.compare_digest(credentials.credentials.encode(), settings.METRICS_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+async def check_project_permission(
     project_id: str,
     user: User,
-    db: Session,
+    db: AsyncSession,
     required_role: str = None
 ) -> bool:
     """Check if user has permission to access a project"""
-    from app.models import Project, project_members
-    from sqlalchemy import select
-    
-    project = db.query(Project).filter(Project.id == project_id).first()
-    
-    if not project:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Project not found"
-        )
+    cache_key = f"{project_id}:{user.id}"
+    access = await permission_cache.get(cache_key)
+
+    if access is None:
+        project = await db.get(Project, project_id)
+        
+        if not project:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Project not found"
+            )
+        
+        # Check if user is a member (owners need no membership row)
+        role = None
+        if project.owner_id != user.id:
+            stmt = select(project_members.c.role).where(
+                project_members.c.project_id == project_id,
+                project_members.c.user_id == user.id
+            )
+            row = (await db.execute(stmt)).first()
+            if row:
+                role = (row.role or UserRole.GUEST).value
+        access = {"owner": project.owner_id == user.id, "member": bool(role), "role": role}
+        await permission_cache.set(cache_key, access)
     
     # Owner has all permissions
-    if project.owner_id == user.id:
+    if access["owner"]:
         return True
     
-    # Check if user is a member
-    stmt = select(project_members).where(
-        project_members.c.project_id == project_id,
-        project_members.c.user_id == user.id
-    )
-    result = db.execute(stmt).first()
-    
-    if not result:
+    if not access["member"]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You don't have access to this project"
@@ -92,10 +150,10 @@ def check_project_permission(
     
     # If specific role is required, check it
     if required_role:
-        user_role = result.role
+        user_role = access["role"]
         role_hierarchy = {'leader': 3, 'researcher': 2, 'guest': 1}
         
-        if role_hierarchy.get(user_role.value, 0) < role_hierarchy.get(required_role, 0):
+        if role_hierarchy.get(user_role, 0) < role_hierarchy.get(required_role, 0):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail=f"Requires {required_role} role or higher"
@@ -0,0 +1,114 @@
+"""Conditional and ranged GET helpers for object downloads.
+
+Validators come straight from MinIO's stat: the object etag becomes a strong
+ETag and last_modified the Last-Modified date. Only single byte ranges are
+honoured; multi-range requests are answered with the full body, which RFC 9110
+allows.
+"""
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+from urllib.parse import quote
+import unicodedata
+
+from fastapi import HTTPException, Request
+
+
+def etag_for(stat) -> str:
+    return f'"{stat.etag.strip(chr(34))}"'
+
+
+def validator_headers(stat) -> Dict[str, str]:
+    headers = {
+        "ETag": etag_for(stat),
+        "Accept-Ranges": "bytes",
+        # Clients may keep a copy but must revalidate; revalidation is a cheap 304
+        "Cache-Control": "private, no-cache",
+    }
+    if stat.last_modified:
+        headers["Last-Modified"] = format_datetime(stat.last_modified, usegmt=True)
+    return headers
+
+
+def content_disposition(filename: str) -> str:
+    """attachment header that survives any name: an ASCII fallback plus the UTF-8 name (RFC 6266)"""
+    # Accents fold to their base letter; anything else outside printable ASCII becomes _
+    decomposed = (c for c in unicodedata.normalize("NFKD", filename) if not unicodedata.combining(c))
+    fallback = "".join(c if " " <= c <= "~" and c not in '"\\' else "_" for c in decomposed)
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+
+def _parse_http_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    # asctime dates and "-0000" parse as naive; HTTP dates are always UTC
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # Weak comparison, as required for If-None-Match
+    opaque = etag.removeprefix("W/")
+    return any(
+        tag.strip() == "*" or tag.strip().removeprefix("W/") == opaque
+        for tag in header.split(",")
+    )
+
+
+def is_not_modified(request: Request, stat) -> bool:
+    """True when the client's cached copy is current (answer with 304)"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag_for(stat))
+    since = _parse_http_date(request.headers.get("if-modified-since"))
+    if since is None or not stat.last_modified:
+        return False
+    return stat.last_modified.replace(microsecond=0) <= since
+
+
+def _if_range_allows(request: Request, stat) -> bool:
+    if_range = request.headers.get("if-range")
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        # If-Range requires a strong match
+        return if_range == etag_for(stat)
+    when = _parse_http_date(if_range)
+    return bool(when and stat.last_modified and stat.last_modified.replace(microsecond=0) == when)
+
+
+def requested_range(request: Request, stat) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) byte range to serve, or None for the full body.
+
+    Raises 416 when the single range requested lies outside the object.
+    """
+    header = request.headers.get("range")
+    if not header or not _if_range_allows(request, stat):
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep or not (first or last) or not (first + last).isdigit():
+        return None  # malformed ranges are ignored, not rejected
+    size = stat.size
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    else:
+        # Suffix range: the final N bytes
+        start, end = max(size - int(last), 0), size - 1
+        if int(last) == 0:
+            start = size
+    if start >= size:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
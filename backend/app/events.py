@@ -0,0 +1,209 @@
+"""Per-project change events, fanned out to Server-Sent Events streams.
+
+Routes call publish() after their commit. The broker delivers each event
+to the subscribers of its project in this process and keeps the last
+EVENT_REPLAY_BUFFER events per project, so a client reconnecting with
+Last-Event-ID receives what it missed. When that id has already left the
+buffer, the client gets a "resync" event and reloads.
+
+Which processes see an event depends on the backend. MemoryBackend
+(the default) delivers inside one process only. PostgresNotifyBackend
+sends every event through NOTIFY and delivers what LISTEN receives, so
+all uvicorn workers share events and keep identical replay buffers.
+
+Each subscriber has a bounded queue. A client too slow to drain it is sent
+"resync" and disconnected; it catches up by resuming from its last id.
+"""
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Set
+import asyncio
+import json
+import secrets
+import time
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+from app.config import settings
+
+NOTIFY_CHANNEL = "stratum_events"
+_NOTIFY_LIMIT = 7900  # NOTIFY payloads must stay under 8000 bytes
+
+
+@dataclass
+class Event:
+    project_id: str
+    type: str  # e.g. "note.updated", "file.created", "member.removed"
+    data: Dict[str, Any] = field(default_factory=dict)
+    id: str = ""
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), default=str, separators=(",", ":"))
+
+
+def new_event_id() -> str:
+    # Millisecond prefix keeps ids readable in logs; ids are matched, never compared
+    return f"{int(time.time() * 1000)}-{secrets.token_hex(4)}"
+
+
+class EventBackend(ABC):
+    """Transport between publishers and the broker of every process"""
+
+    async def start(self, deliver: Callable[[Event], None]) -> None:
+        self.deliver = deliver
+
+    @abstractmethod
+    async def publish(self, event: Event) -> None:
+        ...
+
+    async def stop(self) -> None:
+        pass
+
+
+class MemoryBackend(EventBackend):
+    """Single process: events go straight to the local broker"""
+
+    async def publish(self, event: Event) -> None:
+        self.deliver(event)
+
+
+class PostgresNotifyBackend(EventBackend):
+    """Shares events between workers with LISTEN/NOTIFY on the application database"""
+
+    def __init__(self, channel: str = NOTIFY_CHANNEL):
+        self.channel = channel
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Callable[[Event], None]) -> None:
+        await super().start(deliver)
+        self._task = asyncio.create_task(self._listen())
+
+    async def publish(self, event: Event) -> None:
+        from app.database import async_engine
+
+        payload = event.to_json()
+        if len(payload.encode("utf-8")) > _NOTIFY_LIMIT:
+            # Too large to send: subscribers only learn that something changed
+            event = Event(event.project_id, event.type, {"truncated": True}, event.id)
+            payload = event.to_json()
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": self.channel, "payload": payload})
+            await conn.commit()
+
+    async def _listen(self) -> None:
+        import psycopg
+
+        dsn = make_url(settings.DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+        delay = 1
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(dsn, autocommit=True) as conn:
+                    await conn.execute(f"LISTEN {self.channel}")
+                    print(f"✓ Listening for events on '{self.channel}'")
+                    delay = 1
+                    async for notify in conn.notifies():
+                        try:
+                            self.deliver(Event(**json.loads(notify.payload)))
+                        except Exception as e:
+                            print(f"✗ Dropped malformed event: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"✗ Event listener error, reconnecting in {delay}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+
+
+class Subscription:
+    def __init__(self, project_id: str, maxsize: int):
+        self.project_id = project_id
+        self.queue: "asyncio.Queue[Event]" = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+
+class EventBroker:
+    def __init__(self, backend: Optional[EventBackend] = None):
+        self.backend = backend or MemoryBackend()
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._recent: Dict[str, Deque[Event]] = {}
+        self.published = 0
+        self.dropped_subscribers = 0
+
+    def set_backend(self, backend: EventBackend) -> None:
+        self.backend = backend
+
+    async def start(self) -> None:
+        await self.backend.start(self._deliver)
+
+    async def stop(self) -> None:
+        await self.backend.stop()
+
+    async def publish(self, project_id: str, event_type: str, data: Optional[Dict[str, Any]] = None) -> None:
+        """Send an event to the project's subscribers; never raises (call after commit)"""
+        event = Event(project_id, event_type, data or {}, new_event_id())
+        try:
+            await self.backend.publish(event)
+            self.published += 1
+        except Exception as e:
+            print(f"✗ Event publish failed ({event_type}): {e}")
+
+    def _deliver(self, event: Event) -> None:
+        recent = self._recent.get(event.project_id)
+        if recent is None:
+            recent = self._recent[event.project_id] = deque(maxlen=settings.EVENT_REPLAY_BUFFER)
+        recent.append(event)
+        for subscription in list(self._subscribers.get(event.project_id, ())):
+            if subscription.overflowed:
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                subscription.overflowed = True
+                self.dropped_subscribers += 1
+
+    def subscribe(self, project_id: str) -> Subscription:
+        subscription = Subscription(project_id, settings.EVENT_SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.setdefault(project_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.project_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.project_id]
+
+    def replay_after(self, project_id: str, last_event_id: str) -> Optional[List[Event]]:
+        """Events after last_event_id, or None when it is no longer buffered"""
+        recent = list(self._recent.get(project_id, ()))
+        for index, event in enumerate(recent):
+            if event.id == last_event_id:
+                return recent[index + 1:]
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "projects": len(self._subscribers),
+            "subscribers": sum(len(s) for s in self._subscribers.values()),
+            "published": self.published,
+            "dropped_subscribers": self.dropped_subscribers,
+        }
+
+
+def _backend_from_settings() -> EventBackend:
+    if settings.EVENT_BACKEND == "postgres":
+        return PostgresNotifyBackend()
+    return MemoryBackend()
+
+
+event_broker = EventBroker(_backend_from_settings())
+
+
+async def publish(project_id: str, event_type: str, data: Optional[Dict[str, Any]] = None) -> None:
+    await event_broker.publish(project_id, event_type, data)
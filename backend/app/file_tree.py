@@ -0,0 +1,262 @@
+"""Materialized paths, keyset pagination and subtree queries over file_nodes.
+
+Every node stores path = '/<root id>/.../<own id>/'. Ancestors are read off
+the path, and a subtree is one indexed prefix match (path LIKE '<path>%').
+A move rewrites the prefix of the whole subtree in one UPDATE.
+
+Siblings are ordered by (type desc, name asc), the same order the folder
+listings have always used. A cursor is the (type, name) of the last node a
+client received, so pages stay stable while nodes are added or removed.
+"""
+from typing import Dict, List, Optional, Tuple
+import base64
+import json
+
+from fastapi import HTTPException
+from sqlalchemy import BigInteger, String, and_, column, func, literal, or_, select, true, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import FileNode, FileNodeType, generate_uuid
+from app.schemas import FileNodeBase, FileTreeNode
+
+SIBLING_ORDER = (FileNode.type.desc(), FileNode.name.asc())
+
+
+def assign_path(node: FileNode, parent: Optional[FileNode]) -> FileNode:
+    """Give a new node its id and materialized path under parent (None = project root)"""
+    if not node.id:
+        node.id = generate_uuid()
+    node.path = f"{parent.path if parent else '/'}{node.id}/"
+    return node
+
+
+async def resolve_parent(db: AsyncSession, project_id: str, parent_id: Optional[str]) -> Optional[FileNode]:
+    """Load the folder new nodes go into (None = project root), rejecting anything else"""
+    if not parent_id:
+        return None
+    parent = await db.scalar(select(FileNode).where(FileNode.id == parent_id, FileNode.project_id == project_id))
+    if not parent:
+        raise HTTPException(status_code=404, detail="Parent folder not found")
+    if parent.type != FileNodeType.FOLDER:
+        raise HTTPException(status_code=400, detail="Parent must be a folder")
+    return parent
+
+
+async def add_file_node(
+    db: AsyncSession,
+    project_id: str,
+    parent: Optional[FileNode],
+    name: str,
+    storage_path: str,
+    size: int,
+    mime_type: Optional[str] = None,
+    checksum: Optional[str] = None
+) -> FileNode:
+    """Add a stored object as a file node and count it in its ancestors' totals"""
+    node = FileNode(
+        project_id=project_id,
+        parent_id=parent.id if parent else None,
+        name=name,
+        type=FileNodeType.FILE,
+        mime_type=mime_type,
+        size=size,
+        checksum=checksum,
+        storage_path=storage_path,
+    )
+    assign_path(node, parent)
+    db.add(node)
+    await adjust_ancestor_totals(db, node.path, 1, size)
+    return node
+
+
+def ancestor_ids(node: FileNode) -> List[str]:
+    """Ids from the project root down to the node's parent"""
+    return node.path.strip('/').split('/')[:-1]
+
+
+def is_within(path: str, ancestor_path: str) -> bool:
+    """True when path is ancestor_path itself or lies below it"""
+    return path.startswith(ancestor_path)
+
+
+def in_subtree(node: FileNode):
+    """WHERE clause matching a node and all its descendants"""
+    return and_(
+        FileNode.project_id == node.project_id,
+        FileNode.path.startswith(node.path, autoescape=True)
+    )
+
+
+async def move_subtree(db: AsyncSession, node: FileNode, new_parent: Optional[FileNode]) -> None:
+    """Re-parent a node, rewriting the path prefix of its whole subtree in one statement"""
+    old_path = node.path
+    new_path = f"{new_parent.path if new_parent else '/'}{node.id}/"
+    files, nbytes = node_totals(node)
+    await adjust_ancestor_totals(db, old_path, -files, -nbytes)
+    await adjust_ancestor_totals(db, new_path, files, nbytes)
+    await db.execute(
+        update(FileNode)
+        .where(in_subtree(node))
+        .values(path=literal(new_path) + func.substr(FileNode.path, len(old_path) + 1))
+        .execution_options(synchronize_session=False)
+    )
+    node.parent_id = new_parent.id if new_parent else None
+    node.path = new_path
+
+
+def node_totals(node: FileNode) -> Tuple[int, int]:
+    """(file count, bytes) a node contributes to each of its ancestors"""
+    if node.type == FileNodeType.FOLDER:
+        return node.descendant_file_count or 0, node.descendant_bytes or 0
+    if node.type == FileNodeType.FILE:
+        return 1, node.size or 0
+    return 0, 0
+
+
+async def adjust_ancestor_totals(db: AsyncSession, path: str, files: int, nbytes: int) -> None:
+    """Add deltas to the folder aggregates of every ancestor of the node at path.
+
+    One UPDATE over the ancestor ids taken from the path; increments are
+    applied in SQL so concurrent uploads into the same folder don't race.
+    """
+    ids = path.strip('/').split('/')[:-1]
+    if not ids or (not files and not nbytes):
+        return
+    await db.execute(
+        update(FileNode)
+        .where(FileNode.id.in_(ids))
+        .values(
+            descendant_file_count=FileNode.descendant_file_count + files,
+            descendant_bytes=FileNode.descendant_bytes + nbytes
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def apply_total_deltas(db: AsyncSession, deltas: Dict[str, Tuple[int, int]]) -> None:
+    """Add many folders' (files, bytes) deltas in one UPDATE ... FROM (VALUES ...)"""
+    rows = [(folder_id, files, nbytes) for folder_id, (files, nbytes) in deltas.items() if files or nbytes]
+    if not rows:
+        return
+    changes = values(
+        column("id", String), column("files", BigInteger), column("nbytes", BigInteger), name="changes"
+    ).data(rows)
+    await db.execute(
+        update(FileNode)
+        .where(FileNode.id == changes.c.id)
+        .values(
+            descendant_file_count=FileNode.descendant_file_count + changes.c.files,
+            descendant_bytes=FileNode.descendant_bytes + changes.c.nbytes
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def encode_cursor(node_type: FileNodeType, name: str) -> str:
+    raw = json.dumps([FileNodeType(node_type).value, name]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[FileNodeType, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        node_type, name = json.loads(base64.urlsafe_b64decode(padded))
+        return FileNodeType(node_type), name
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def after_cursor(cursor: Optional[str]):
+    """WHERE clause selecting the siblings that come after a cursor"""
+    if not cursor:
+        return true()
+    node_type, name = decode_cursor(cursor)
+    return or_(
+        FileNode.type < node_type,
+        and_(FileNode.type == node_type, FileNode.name > name)
+    )
+
+
+def _sibling_page(where, limit: int):
+    # limit + 1 rows so the caller can tell whether another page exists
+    return (
+        select(
+            FileNode.id,
+            FileNode.type,
+            func.row_number().over(order_by=SIBLING_ORDER).label("rn")
+        )
+        .where(*where)
+        .order_by(*SIBLING_ORDER)
+        .limit(limit + 1)
+    )
+
+
+async def load_tree(
+    db: AsyncSession,
+    project_id: str,
+    parent_id: Optional[str],
+    depth: int,
+    limit: int,
+    cursor: Optional[str] = None
+) -> Tuple[List[FileTreeNode], Optional[str]]:
+    """Load up to `depth` levels below parent_id (project root when None) in one query.
+
+    Every folder contributes at most `limit` children; folders with more get a
+    next_cursor for /files/{id}/children. Returns the top-level nodes and the
+    cursor for the next page of the top level.
+    """
+    root_where = [
+        FileNode.project_id == project_id,
+        FileNode.parent_id == parent_id if parent_id else FileNode.parent_id.is_(None),
+        after_cursor(cursor),
+    ]
+    root_page = _sibling_page(root_where, limit).subquery("root_page")
+    tree = select(
+        root_page.c.id,
+        root_page.c.type,
+        root_page.c.rn,
+        literal(1).label("depth")
+    ).cte("tree", recursive=True)
+
+    child_page = _sibling_page([FileNode.parent_id == tree.c.id], limit).lateral("child_page")
+    tree = tree.union_all(
+        select(child_page.c.id, child_page.c.type, child_page.c.rn, tree.c.depth + 1)
+        .select_from(tree.join(child_page, true()))
+        .where(
+            tree.c.depth < depth,
+            tree.c.type == FileNodeType.FOLDER,
+            tree.c.rn <= limit
+        )
+    )
+    rows = (await db.execute(
+        select(FileNode, tree.c.depth, tree.c.rn)
+        .join(tree, tree.c.id == FileNode.id)
+        .order_by(tree.c.depth, tree.c.rn)
+    )).all()
+
+    items: Dict[str, FileTreeNode] = {}
+    top: List[FileTreeNode] = []
+    next_cursor = None
+    last_kept: Dict[Optional[str], FileNode] = {}
+    for node, level, rank in rows:
+        parent_key = node.parent_id if level > 1 else None
+        if level > 1 and parent_key not in items:
+            continue  # child of the extra look-ahead row
+        if rank > limit:
+            last = last_kept[parent_key]
+            page_cursor = encode_cursor(last.type, last.name)
+            if level == 1:
+                next_cursor = page_cursor
+            else:
+                items[parent_key].next_cursor = page_cursor
+            continue
+        item = FileTreeNode(**FileNodeBase.model_validate(node).model_dump())
+        if node.type == FileNodeType.FOLDER and level < depth:
+            item.children = []
+        items[node.id] = item
+        last_kept[parent_key] = node
+        if level == 1:
+            top.append(item)
+        else:
+            items[parent_key].children.append(item)
+    return top, next_cursor
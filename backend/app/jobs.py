@@ -0,0 +1,220 @@
+"""Durable job queue in PostgreSQL for side effects that follow a commit.
+
+Routes call enqueue() in the transaction that makes their database change,
+so a job exists exactly when the change was committed, and the request
+returns without waiting for object storage. Workers claim due jobs with
+FOR UPDATE SKIP LOCKED, which lets any number of them poll the same table
+without blocking each other. Claiming pushes run_at past JOB_LEASE_SECONDS,
+so a job whose worker died is picked up again once the lease runs out.
+
+A job that succeeds is deleted. One that fails is retried with exponential
+backoff; after max_attempts it moves to dead_jobs. Handlers therefore run at
+least once and must be idempotent. An idempotency key drops a second
+enqueue of the same work while the first is still queued.
+
+Handlers are registered with @job_handler in the modules that own the work.
+Workers run inside the app (JOB_WORKER_IN_APP) and/or as `python -m app.worker`.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+import importlib
+import random
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import DeadJob, Job
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+_handlers: Dict[str, JobHandler] = {}
+
+# Modules whose @job_handler registrations a standalone worker needs
+HANDLER_MODULES = ("app.object_cleanup", "app.renditions", "app.note_storage")
+
+
+def job_handler(kind: str):
+    """Register an async handler(payload) for a job kind"""
+    def register(func: JobHandler) -> JobHandler:
+        _handlers[kind] = func
+        return func
+    return register
+
+
+def load_handlers() -> None:
+    for module in HANDLER_MODULES:
+        importlib.import_module(module)
+
+
+async def enqueue(
+    db: AsyncSession,
+    kind: str,
+    payload: Dict[str, Any],
+    key: Optional[str] = None,
+    delay: float = 0,
+    max_attempts: Optional[int] = None
+) -> None:
+    """Add a job to the caller's transaction; it becomes visible to workers on commit"""
+    stmt = insert(Job).values(
+        kind=kind,
+        payload=payload,
+        idempotency_key=key,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        run_at=datetime.utcnow() + timedelta(seconds=delay),
+    )
+    if key is not None:
+        stmt = stmt.on_conflict_do_nothing(index_elements=["idempotency_key"])
+    await db.execute(stmt)
+
+
+async def enqueue_many(db: AsyncSession, kind: str, jobs: List[Tuple[Dict[str, Any], Optional[str]]]) -> None:
+    """enqueue() for many (payload, key) pairs of one kind in a single INSERT"""
+    if not jobs:
+        return
+    now = datetime.utcnow()
+    await db.execute(
+        insert(Job)
+        .values([
+            {"kind": kind, "payload": payload, "idempotency_key": key, "max_attempts": settings.JOB_MAX_ATTEMPTS, "run_at": now}
+            for payload, key in jobs
+        ])
+        .on_conflict_do_nothing(index_elements=["idempotency_key"])
+    )
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds before the next attempt: doubling from JOB_RETRY_BASE_SECONDS, capped, with jitter"""
+    delay = min(settings.JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.JOB_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+async def claim_jobs(limit: int) -> List[Any]:
+    """Lease up to limit due jobs to this worker"""
+    now = datetime.utcnow()
+    due = (
+        select(Job.id)
+        .where(Job.run_at <= now)
+        .order_by(Job.run_at, Job.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(
+            update(Job)
+            .where(Job.id.in_(due))
+            .values(attempts=Job.attempts + 1, run_at=now + timedelta(seconds=settings.JOB_LEASE_SECONDS))
+            .returning(Job.id, Job.kind, Job.payload, Job.attempts, Job.max_attempts)
+            .execution_options(synchronize_session=False)
+        )).all()
+        await db.commit()
+    return rows
+
+
+async def _finish(job, error: Optional[str], retry: bool = True) -> None:
+    async with AsyncSessionLocal() as db:
+        if error is None:
+            await db.execute(delete(Job).where(Job.id == job.id))
+        elif not retry or job.attempts >= job.max_attempts:
+            row = await db.get(Job, job.id)
+            if row is not None:
+                db.add(DeadJob(
+                    id=row.id, kind=row.kind, payload=row.payload, idempotency_key=row.idempotency_key,
+                    attempts=row.attempts, last_error=error, created_at=row.created_at
+                ))
+                await db.delete(row)
+            print(f"✗ Job {job.id} ({job.kind}) moved to dead_jobs after {job.attempts} attempts: {error}")
+        else:
+            await db.execute(
+                update(Job)
+                .where(Job.id == job.id)
+                .values(run_at=datetime.utcnow() + timedelta(seconds=retry_delay(job.attempts)), last_error=error)
+            )
+        await db.commit()
+
+
+async def run_job(job) -> None:
+    """Run one claimed job and record the outcome"""
+    handler = _handlers.get(job.kind)
+    if handler is None:
+        await _finish(job, f"No handler for job kind '{job.kind}'", retry=False)
+        return
+    error = None
+    try:
+        # Finishing within the lease keeps a second worker from starting the same job
+        await asyncio.wait_for(handler(job.payload), settings.JOB_LEASE_SECONDS)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        print(f"✗ Job {job.id} ({job.kind}) failed (attempt {job.attempts}): {error}")
+    await _finish(job, error)
+
+
+async def _run_logged(job) -> None:
+    try:
+        await run_job(job)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        # The lease runs out and the job is claimed again
+        print(f"✗ Job {job.id} ({job.kind}) outcome not recorded: {e}")
+
+
+async def run_worker() -> None:
+    """Claim and run jobs until cancelled, at most JOB_WORKER_CONCURRENCY at a time.
+
+    Each job runs as its own task. A finished job frees its slot and the next
+    claim fills it, so a slow job holds back only the slot it occupies.
+    """
+    load_handlers()
+    running: Set[asyncio.Task] = set()
+    try:
+        while True:
+            free = settings.JOB_WORKER_CONCURRENCY - len(running)
+            if free > 0:
+                try:
+                    for job in await claim_jobs(free):
+                        task = asyncio.create_task(_run_logged(job))
+                        running.add(task)
+                        task.add_done_callback(running.discard)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"✗ Job worker error: {e}")
+            # Claim again when a slot frees up, or at the next poll for newly due jobs
+            if running:
+                await asyncio.wait(
+                    set(running), timeout=settings.JOB_POLL_INTERVAL_SECONDS, return_when=asyncio.FIRST_COMPLETED
+                )
+            else:
+                await asyncio.sleep(settings.JOB_POLL_INTERVAL_SECONDS)
+    finally:
+        for task in list(running):
+            task.cancel()
+
+
+async def requeue_dead_jobs(kind: Optional[str] = None) -> int:
+    """Move dead jobs (of one kind, or all) back into the queue; returns how many"""
+    async with AsyncSessionLocal() as db:
+        stmt = select(DeadJob)
+        if kind:
+            stmt = stmt.where(DeadJob.kind == kind)
+        dead = (await db.scalars(stmt)).all()
+        for job in dead:
+            await enqueue(db, job.kind, job.payload, key=job.idempotency_key)
+            await db.delete(job)
+        await db.commit()
+    return len(dead)
+
+
+async def job_stats(db: AsyncSession) -> Dict[str, int]:
+    now = datetime.utcnow()
+    queued, due = (await db.execute(
+        select(func.count(), func.count().filter(Job.run_at <= now)).select_from(Job)
+    )).one()
+    dead = await db.scalar(select(func.count()).select_from(DeadJob))
+    return {"queued": queued, "due": due, "dead": dead}
@@ -1,10 +1,23 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
-from sqlalchemy import text
-from app.database import engine, Base
+from app.database import engine, Base, AsyncSessionLocal
+from app.dependencies import require_metrics_token
+from app.migrations import run_migrations
 from app.firebase_config import initialize_firebase
-from app.routes import auth, projects, notes, files
+from app.minio_client import minio_client
+from app.cache import cache_stats
+from app.blobs import dedup_report
+from app.object_cleanup import run_periodic_reconciliation
+from app.upload_sessions import run_periodic_session_gc
+from app.text_index import run_periodic_text_indexing
+from app.change_log import run_periodic_change_log_prune
+from app.renditions import shutdown_pool as shutdown_renditions
+from app.events import event_broker
+from app.jobs import job_stats, run_worker
+import asyncio
+import time
+from app.routes import auth, projects, notes, files, uploads, search, sync, events
 
 # Initialize Firebase
 initialize_firebase()
@@ -13,14 +26,7 @@ initialize_firebase()
 Base.metadata.create_all(bind=engine)
 
 # Lightweight migrations for schema updates (no Alembic yet)
-with engine.connect() as conn:
-    try:
-        # Add storage_path column to file_nodes if it's missing
-        conn.execute(text("ALTER TABLE file_nodes ADD COLUMN IF NOT EXISTS storage_path VARCHAR"))
-        conn.commit()
-    except Exception as e:
-        # Don't crash app if migration fails; it will log and continue
-        print(f"Schema migration warning: {e}")
+run_migrations(engine)
 
 # Create FastAPI app
 app = FastAPI(
@@ -36,6 +42,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified", "Accept-Ranges", "Content-Range", "Content-Length", "Content-Disposition"],
 )
 
 # Include routers
@@ -43,6 +50,35 @@ app.include_router(auth.router, prefix="/api")
 app.include_router(projects.router, prefix="/api")
 app.include_router(notes.router, prefix="/api")
 app.include_router(files.router, prefix="/api")
+app.include_router(uploads.router, prefix="/api")
+app.include_router(search.router, prefix="/api")
+app.include_router(sync.router, prefix="/api")
+app.include_router(events.router, prefix="/api")
+
+
+_background_tasks = []
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    """Start the sweeps that retry failed object deletions, collect abandoned uploads, index text files and prune the change log, the event broker and the in-app job worker"""
+    await event_broker.start()
+    if settings.JOB_WORKER_IN_APP:
+        _background_tasks.append(asyncio.create_task(run_worker()))
+    _background_tasks.append(asyncio.create_task(run_periodic_reconciliation()))
+    _background_tasks.append(asyncio.create_task(run_periodic_session_gc()))
+    _background_tasks.append(asyncio.create_task(run_periodic_text_indexing()))
+    _background_tasks.append(asyncio.create_task(run_periodic_change_log_prune()))
+
+
+@app.on_event("shutdown")
+async def shutdown_storage():
+    """Stop background sweeps and release the storage and rendition pools"""
+    for task in _background_tasks:
+        task.cancel()
+    await event_broker.stop()
+    shutdown_renditions()
+    minio_client.close()
 
 
 @app.get("/")
@@ -65,6 +101,33 @@ async def health_check():
     }
 
 
+# Job and storage aggregates scan whole tables; scrapes within METRICS_CACHE_SECONDS reuse them
+_aggregates = {"expires_at": 0.0, "value": None}
+_aggregates_lock = asyncio.Lock()
+
+
+async def _database_aggregates() -> dict:
+    async with _aggregates_lock:
+        if _aggregates["value"] is None or _aggregates["expires_at"] < time.monotonic():
+            async with AsyncSessionLocal() as db:
+                _aggregates["value"] = {"jobs": await job_stats(db), "storage": await dedup_report(db)}
+            _aggregates["expires_at"] = time.monotonic() + settings.METRICS_CACHE_SECONDS
+        return _aggregates["value"]
+
+
+@app.get("/metrics", dependencies=[Depends(require_metrics_token)])
+async def metrics():
+    """In-process cache statistics (hit rate per cache), live event streams, job queue depth and storage saved by deduplication.
+
+    Requires the METRICS_TOKEN bearer token. Job and storage figures may be up to METRICS_CACHE_SECONDS old.
+    """
+    return {
+        "caches": cache_stats(),
+        "events": event_broker.stats(),
+        **await _database_aggregates(),
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -0,0 +1,122 @@
+"""Lightweight schema migrations run at startup (no Alembic yet).
+
+create_all() only creates missing tables, so columns, indexes and backfills
+for existing databases are listed here. Every statement must be idempotent;
+they run in order, each in its own transaction.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.change_log import TRIGGER_MIGRATIONS
+from app.models import FILE_SEARCH_VECTOR, NOTE_SEARCH_VECTOR, TEXT_PENDING_PREDICATE
+
+MIGRATIONS = [
+    # Object key of uploaded files
+    "ALTER TABLE file_nodes ADD COLUMN IF NOT EXISTS storage_path VARCHAR",
+    # SHA-256 computed while streaming uploads
+    "ALTER TABLE file_nodes ADD COLUMN IF NOT EXISTS checksum VARCHAR",
+    # Materialized path ('/<root id>/.../<own id>/') for ancestry and subtree queries
+    "ALTER TABLE file_nodes ADD COLUMN IF NOT EXISTS path VARCHAR",
+    "CREATE INDEX IF NOT EXISTS ix_file_nodes_path ON file_nodes (path text_pattern_ops)",
+    # Integer byte sizes and per-folder aggregates
+    """
+    DO $$
+    BEGIN
+        IF (SELECT data_type FROM information_schema.columns
+            WHERE table_name = 'file_nodes' AND column_name = 'size') <> 'bigint' THEN
+            ALTER TABLE file_nodes ALTER COLUMN size TYPE BIGINT USING NULLIF(size, '')::bigint;
+        END IF;
+    END $$
+    """,
+    "ALTER TABLE file_nodes ADD COLUMN IF NOT EXISTS descendant_file_count BIGINT NOT NULL DEFAULT 0",
+    "ALTER TABLE file_nodes ADD COLUMN IF NOT EXISTS descendant_bytes BIGINT NOT NULL DEFAULT 0",
+    # Direct-upload commits look nodes up by object key
+    "CREATE INDEX IF NOT EXISTS ix_file_nodes_storage_path ON file_nodes (storage_path)",
+    # Attachment loading and counting per note
+    "CREATE INDEX IF NOT EXISTS ix_note_attachments_note_id ON note_attachments (note_id)",
+    # Object version mirrored in notes.content, so note reads skip MinIO
+    "ALTER TABLE file_nodes ADD COLUMN IF NOT EXISTS storage_etag VARCHAR",
+    # Keyset-paginated note listings
+    "CREATE INDEX IF NOT EXISTS ix_notes_project_updated ON notes (project_id, updated_at DESC, id)",
+    # Full-text search over notes and the text of .txt files
+    f"ALTER TABLE notes ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ({NOTE_SEARCH_VECTOR}) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_notes_search_vector ON notes USING gin (search_vector)",
+    "ALTER TABLE file_nodes ADD COLUMN IF NOT EXISTS extracted_text TEXT",
+    f"ALTER TABLE file_nodes ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ({FILE_SEARCH_VECTOR}) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_file_nodes_search_vector ON file_nodes USING gin (search_vector)",
+    f"CREATE INDEX IF NOT EXISTS ix_file_nodes_text_pending ON file_nodes (id) WHERE {TEXT_PENDING_PREDICATE}",
+    # User search: prefix lookups on btree, substring matches and similarity on trigrams
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_users_email_prefix ON users (lower(email) text_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_users_display_name_prefix ON users (lower(display_name) text_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_users_email_trgm ON users USING gin (email gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_users_display_name_trgm ON users USING gin (display_name gin_trgm_ops)",
+    # Purges claim their keys in a committed row instead of holding a lock across MinIO calls
+    "ALTER TABLE pending_object_deletions ADD COLUMN IF NOT EXISTS claimed_until TIMESTAMP",
+    # Change log triggers feeding the delta sync API
+    *TRIGGER_MIGRATIONS,
+]
+
+# Expensive backfills that only need to run once; recorded in schema_migrations
+ONE_TIME_MIGRATIONS = [
+    # Materialized paths for nodes created before the path column existed
+    ("file_nodes_paths", """
+    WITH RECURSIVE paths AS (
+        SELECT id, '/' || id || '/' AS path
+        FROM file_nodes
+        WHERE parent_id IS NULL
+        UNION ALL
+        SELECT f.id, p.path || f.id || '/'
+        FROM file_nodes f
+        JOIN paths p ON f.parent_id = p.id
+    )
+    UPDATE file_nodes
+    SET path = paths.path
+    FROM paths
+    WHERE file_nodes.id = paths.id
+      AND file_nodes.path IS DISTINCT FROM paths.path
+    """),
+    ("file_nodes_folder_totals", """
+    UPDATE file_nodes AS folder
+    SET descendant_file_count = agg.files,
+        descendant_bytes = agg.bytes
+    FROM (
+        SELECT f.id, count(d.id) AS files, coalesce(sum(d.size), 0) AS bytes
+        FROM file_nodes f
+        JOIN file_nodes d
+          ON d.path LIKE f.path || '%' AND d.id <> f.id AND d.type = 'FILE'
+        WHERE f.type = 'FOLDER'
+        GROUP BY f.id
+    ) agg
+    WHERE folder.id = agg.id
+    """),
+]
+
+
+def run_migrations(engine: Engine) -> None:
+    for statement in MIGRATIONS:
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(statement))
+        except Exception as e:
+            # Don't crash app if a migration fails; it will log and continue
+            print(f"Schema migration warning: {e}")
+
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "name VARCHAR PRIMARY KEY, applied_at TIMESTAMP NOT NULL DEFAULT now())"
+        ))
+    for name, statement in ONE_TIME_MIGRATIONS:
+        try:
+            with engine.begin() as conn:
+                # Row lock serializes workers starting at the same time
+                inserted = conn.execute(
+                    text("INSERT INTO schema_migrations (name) VALUES (:name) ON CONFLICT DO NOTHING"),
+                    {"name": name}
+                ).rowcount
+                if inserted:
+                    conn.execute(text(statement))
+                    print(f"✓ Migration '{name}' applied")
+        except Exception as e:
+            print(f"Schema migration warning ({name}): {e}")
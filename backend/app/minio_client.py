@@ -1,21 +1,112 @@
 from minio import Minio
+from minio.datatypes import Part
+from minio.deleteobjects import DeleteObject
 from minio.error import S3Error
 from app.config import settings
+from app.cache import TTLCache
 from io import BytesIO
-from typing import Optional
+from typing import AsyncIterator, BinaryIO, Dict, Iterable, List, Optional, Tuple
+from datetime import timedelta
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio
+import hashlib
+import certifi
+import urllib3
+
+
+# Presigned GET URLs by object key. Entries expire well before the URLs do, so a
+# cached URL always has at least expiry - ttl seconds of validity left.
+presigned_url_cache = TTLCache(
+    "presigned_urls",
+    ttl=settings.PRESIGNED_URL_CACHE_TTL_SECONDS,
+    maxsize=settings.PRESIGNED_URL_CACHE_MAX_ENTRIES
+)
+
+
+def normalize_etag(etag: Optional[str]) -> Optional[str]:
+    """ETags come quoted from some calls and bare from others; compare them bare"""
+    return etag.strip('"') if etag else None
+
+
+@dataclass
+class UploadResult:
+    """Outcome of a streamed upload"""
+    object_name: str
+    size: int
+    sha256: str
+    etag: Optional[str] = None
+
+
+class _HashingReader:
+    """File-like wrapper that counts and hashes bytes as the SDK reads them"""
+
+    def __init__(self, stream: BinaryIO):
+        self._stream = stream
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._stream.read(size)
+        if data:
+            self._hash.update(data)
+            self.size += len(data)
+        return data
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
 
 
 class MinIOClient:
+    """Async facade over the synchronous MinIO SDK.
+
+    Every SDK call runs on a bounded thread pool so slow object I/O never blocks
+    the event loop. Pool size, HTTP connection pool and timeouts come from settings.
+    """
+
     def __init__(self):
+        http_client = urllib3.PoolManager(
+            maxsize=settings.MINIO_CONNECTION_POOL_SIZE,
+            timeout=urllib3.Timeout(
+                connect=settings.MINIO_CONNECT_TIMEOUT,
+                read=settings.MINIO_READ_TIMEOUT
+            ),
+            cert_reqs="CERT_REQUIRED",
+            ca_certs=certifi.where(),
+            retries=urllib3.Retry(
+                total=3,
+                backoff_factor=0.2,
+                status_forcelist=[500, 502, 503, 504]
+            )
+        )
         self.client = Minio(
             settings.MINIO_ENDPOINT,
             access_key=settings.MINIO_ACCESS_KEY,
             secret_key=settings.MINIO_SECRET_KEY,
-            secure=settings.MINIO_USE_SSL
+            secure=settings.MINIO_USE_SSL,
+            region=settings.MINIO_REGION or None,
+            http_client=http_client
         )
+        # Presigned URLs are handed to clients, so sign them for the host clients can reach.
+        # With the region fixed, signing is purely local and never contacts the server.
+        self.signer = self.client
+        if settings.MINIO_PUBLIC_ENDPOINT:
+            self.signer = Minio(
+                settings.MINIO_PUBLIC_ENDPOINT,
+                access_key=settings.MINIO_ACCESS_KEY,
+                secret_key=settings.MINIO_SECRET_KEY,
+                secure=settings.MINIO_PUBLIC_USE_SSL,
+                region=settings.MINIO_REGION or None
+            )
         self.bucket_name = settings.MINIO_BUCKET_NAME
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.MINIO_MAX_WORKERS,
+            thread_name_prefix="minio"
+        )
         self._ensure_bucket_exists()
-    
+
     def _ensure_bucket_exists(self):
         """Create bucket if it doesn't exist"""
         try:
@@ -27,7 +118,16 @@ class MinIOClient:
         except S3Error as e:
             print(f"✗ MinIO bucket error: {e}")
             raise
-    
+
+    async def _run(self, func, *args, **kwargs):
+        """Run a blocking SDK call on the storage thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    def close(self):
+        """Stop the storage thread pool (called on app shutdown)"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
     async def upload_file(
         self,
         file_data: bytes,
@@ -37,7 +137,8 @@ class MinIOClient:
         """Upload file to MinIO"""
         try:
             file_stream = BytesIO(file_data)
-            self.client.put_object(
+            await self._run(
+                self.client.put_object,
                 self.bucket_name,
                 object_name,
                 file_stream,
@@ -48,42 +149,212 @@ class MinIOClient:
         except S3Error as e:
             print(f"✗ File upload error: {e}")
             raise
-    
+
+    async def upload_versioned(
+        self,
+        file_data: bytes,
+        object_name: str,
+        content_type: str = "application/octet-stream"
+    ) -> Optional[str]:
+        """Upload file to MinIO and return the ETag of the version written"""
+        try:
+            result = await self._run(
+                self.client.put_object,
+                self.bucket_name,
+                object_name,
+                BytesIO(file_data),
+                length=len(file_data),
+                content_type=content_type
+            )
+        except S3Error as e:
+            print(f"✗ File upload error: {e}")
+            raise
+        return normalize_etag(getattr(result, 'etag', None))
+
+    async def upload_stream(
+        self,
+        stream: BinaryIO,
+        object_name: str,
+        content_type: str = "application/octet-stream"
+    ) -> UploadResult:
+        """Stream a file-like object to MinIO as a multipart upload of unknown length.
+
+        Only one part (MINIO_UPLOAD_PART_SIZE bytes) is buffered at a time, so memory
+        stays bounded regardless of the object size. Size and SHA-256 are computed
+        while the data flows through.
+        """
+        reader = _HashingReader(stream)
+        try:
+            result = await self._run(
+                self.client.put_object,
+                self.bucket_name,
+                object_name,
+                reader,
+                length=-1,
+                part_size=settings.MINIO_UPLOAD_PART_SIZE,
+                content_type=content_type
+            )
+        except S3Error as e:
+            print(f"✗ File upload error: {e}")
+            raise
+        return UploadResult(
+            object_name=object_name,
+            size=reader.size,
+            sha256=reader.sha256,
+            etag=normalize_etag(getattr(result, 'etag', None))
+        )
+
     async def get_file(self, object_name: str) -> Optional[bytes]:
         """Get file from MinIO"""
         try:
-            response = self.client.get_object(self.bucket_name, object_name)
-            data = response.read()
-            response.close()
-            response.release_conn()
-            return data
+            return await self._run(self._read_object, object_name)
         except S3Error as e:
             print(f"✗ File retrieval error: {e}")
             return None
-    
+
+    def _read_object(self, object_name: str) -> bytes:
+        response = self.client.get_object(self.bucket_name, object_name)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    async def stat_file(self, object_name: str):
+        """Get object metadata (size, etag, last_modified, content_type)"""
+        return await self._run(self.client.stat_object, self.bucket_name, object_name)
+
+    async def open_file(self, object_name: str, offset: int = 0, length: int = 0):
+        """Open an object (or the byte range offset..offset+length) for streaming; pass the response to iter_chunks"""
+        return await self._run(
+            self.client.get_object, self.bucket_name, object_name, offset=offset, length=length
+        )
+
+    async def iter_chunks(self, response, chunk_size: int = 32 * 1024) -> AsyncIterator[bytes]:
+        """Yield an open object's body chunk by chunk, releasing the connection at the end"""
+        try:
+            while True:
+                data = await self._run(response.read, chunk_size)
+                if not data:
+                    break
+                yield data
+        finally:
+            response.close()
+            response.release_conn()
+
     async def delete_file(self, object_name: str) -> bool:
         """Delete file from MinIO"""
         try:
-            self.client.remove_object(self.bucket_name, object_name)
+            await self._run(self.client.remove_object, self.bucket_name, object_name)
             return True
         except S3Error as e:
             print(f"✗ File deletion error: {e}")
             return False
-    
-    def get_presigned_url(self, object_name: str, expiry: int = 3600) -> str:
-        """Get presigned URL for file access"""
+
+    async def delete_files(self, object_names: Iterable[str]) -> List[str]:
+        """Delete many objects with batched DeleteObjects requests.
+
+        Returns the names that could not be deleted. Missing objects count as deleted.
+        """
+        return await self._run(self._remove_objects, list(object_names))
+
+    def _remove_objects(self, object_names: List[str]) -> List[str]:
+        if not object_names:
+            return []
+        failed = []
+        # remove_objects is lazy: iterating the error stream sends the batches (1000 keys each)
+        errors = self.client.remove_objects(
+            self.bucket_name,
+            (DeleteObject(name) for name in object_names)
+        )
+        for error in errors:
+            if error.code != "NoSuchKey":
+                print(f"✗ File deletion error: {error.name}: {error.message}")
+                failed.append(error.name)
+        return failed
+
+    def get_presigned_url(
+        self,
+        object_name: str,
+        expiry: int = 3600,
+        response_headers: Optional[Dict[str, str]] = None
+    ) -> str:
+        """Get presigned URL for file access (local signing, no network round trip)"""
         try:
-            from datetime import timedelta
-            url = self.client.presigned_get_object(
+            url = self.signer.presigned_get_object(
                 self.bucket_name,
                 object_name,
-                expires=timedelta(seconds=expiry)
+                expires=timedelta(seconds=expiry),
+                response_headers=response_headers
             )
             return url
         except S3Error as e:
             print(f"✗ Presigned URL error: {e}")
             raise
 
+    async def presigned_urls(self, object_names: Iterable[str]) -> Dict[str, str]:
+        """Presigned GET URLs for many objects, reusing cached signatures"""
+        urls: Dict[str, str] = {}
+        for name in set(object_names):
+            url = await presigned_url_cache.get(name)
+            if url is None:
+                url = self.get_presigned_url(name, settings.PRESIGNED_URL_EXPIRY_SECONDS)
+                await presigned_url_cache.set(name, url)
+            urls[name] = url
+        return urls
+
+    def get_presigned_put_url(self, object_name: str, expiry: int = 3600) -> str:
+        """Presigned URL a client can PUT an object's bytes to directly"""
+        return self.signer.presigned_put_object(
+            self.bucket_name, object_name, expires=timedelta(seconds=expiry)
+        )
+
+    def get_presigned_part_url(self, object_name: str, upload_id: str, part_number: int, expiry: int = 3600) -> str:
+        """Presigned URL for one part of a multipart upload"""
+        return self.signer.get_presigned_url(
+            "PUT",
+            self.bucket_name,
+            object_name,
+            expires=timedelta(seconds=expiry),
+            extra_query_params={"uploadId": upload_id, "partNumber": str(part_number)}
+        )
+
+    # The SDK keeps its multipart primitives private; they are stable across 7.x
+    async def create_multipart_upload(self, object_name: str, content_type: str) -> str:
+        """Start a multipart upload and return its upload id"""
+        return await self._run(
+            self.client._create_multipart_upload,
+            self.bucket_name,
+            object_name,
+            {"Content-Type": content_type}
+        )
+
+    async def complete_multipart_upload(self, object_name: str, upload_id: str, parts: List[Tuple[int, str]]):
+        """Assemble (part_number, etag) parts into the final object"""
+        return await self._run(
+            self.client._complete_multipart_upload,
+            self.bucket_name,
+            object_name,
+            upload_id,
+            [Part(number, etag) for number, etag in sorted(parts)]
+        )
+
+    async def upload_part(self, object_name: str, upload_id: str, part_number: int, data: bytes) -> str:
+        """Store one part of a multipart upload and return its ETag"""
+        return await self._run(
+            self.client._upload_part,
+            self.bucket_name,
+            object_name,
+            data,
+            None,
+            upload_id,
+            part_number
+        )
+
+    async def abort_multipart_upload(self, object_name: str, upload_id: str) -> None:
+        """Discard a multipart upload and the parts stored so far"""
+        await self._run(self.client._abort_multipart_upload, self.bucket_name, object_name, upload_id)
+
 
 # Initialize MinIO client
 minio_client = MinIOClient()
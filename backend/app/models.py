@@ -1,5 +1,6 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Table, Enum as SQLEnum, Boolean, Text, UniqueConstraint, Index
-from sqlalchemy.orm import relationship, backref
+from sqlalchemy import Column, String, DateTime, ForeignKey, Table, Enum as SQLEnum, Boolean, Text, UniqueConstraint, Index, Integer, BigInteger, Computed, event, select, text
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlalchemy.orm import relationship, backref, deferred
 from datetime import datetime
 import uuid
 import enum
@@ -10,6 +11,25 @@ def generate_uuid():
     return str(uuid.uuid4())
 
 
+# Text search configuration baked into the generated search_vector columns
+# (changing it means rewriting both tables)
+SEARCH_CONFIG = "english"
+NOTE_SEARCH_VECTOR = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(content, '')), 'B')"
+)
+FILE_SEARCH_VECTOR = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(name, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(extracted_text, '')), 'B')"
+)
+
+# Text files whose content still has to be read into extracted_text
+TEXT_PENDING_PREDICATE = (
+    "extracted_text IS NULL AND storage_path IS NOT NULL "
+    "AND (mime_type = 'text/plain' OR lower(name) LIKE '%.txt')"
+)
+
+
 class UserRole(str, enum.Enum):
     LEADER = "leader"
     RESEARCHER = "researcher"
@@ -74,6 +94,7 @@ class Note(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     last_synced = Column(DateTime, nullable=True)
+    search_vector = deferred(Column(TSVECTOR, Computed(NOTE_SEARCH_VECTOR, persisted=True)))
     
     # Relationships
     project = relationship('Project', back_populates='notes')
@@ -81,6 +102,11 @@ class Note(Base):
     attachments = relationship('NoteAttachment', back_populates='note', cascade='all, delete-orphan')
 
 
+# Note listings: newest first within a project, id as the keyset tie-breaker
+Index('ix_notes_project_updated', Note.project_id, Note.updated_at.desc(), Note.id)
+Index('ix_notes_search_vector', Note.search_vector, postgresql_using='gin')
+
+
 class FileNodeType(str, enum.Enum):
     FOLDER = "folder"
     FILE = "file"
@@ -96,8 +122,15 @@ class FileNode(Base):
     name = Column(String, nullable=False)
     type = Column(SQLEnum(FileNodeType), nullable=False, default=FileNodeType.FILE)
     mime_type = Column(String, nullable=True)
-    size = Column(String, nullable=True)
+    size = Column(BigInteger, nullable=True)  # bytes, files only
+    descendant_file_count = Column(BigInteger, nullable=False, default=0)  # folders: files anywhere below
+    descendant_bytes = Column(BigInteger, nullable=False, default=0)  # folders: total size of those files
     storage_path = Column(String, nullable=True)  # object key/path in MinIO for uploaded files
+    checksum = Column(String, nullable=True)  # SHA-256 hex digest of the stored bytes
+    storage_etag = Column(String, nullable=True)  # note files: ETag of the object version mirrored in notes.content
+    path = Column(String, nullable=True)  # materialized path '/<root id>/.../<own id>/'
+    extracted_text = deferred(Column(Text, nullable=True))  # .txt files: indexed text, '' once done; NULL = pending
+    search_vector = deferred(Column(TSVECTOR, Computed(FILE_SEARCH_VECTOR, persisted=True)))
     is_locked = Column(Boolean, default=False)  # for non-deletable/non-movable nodes like Notes folder or note nodes
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -109,9 +142,30 @@ class FileNode(Base):
     __table_args__ = (
         UniqueConstraint('project_id', 'parent_id', 'name', name='uq_file_nodes_sibling_name'),
         Index('ix_file_nodes_project_parent', 'project_id', 'parent_id'),
+        Index('ix_file_nodes_path', 'path', postgresql_ops={'path': 'text_pattern_ops'}),
+        Index('ix_file_nodes_storage_path', 'storage_path'),
+        Index('ix_file_nodes_search_vector', 'search_vector', postgresql_using='gin'),
+        Index('ix_file_nodes_text_pending', 'id', postgresql_where=text(TEXT_PENDING_PREDICATE)),
     )
 
 
+@event.listens_for(FileNode, 'before_insert')
+def _fill_file_node_path(mapper, connection, target):
+    """Fallback for nodes created without file_tree.assign_path: look the parent path up"""
+    if not target.id:
+        target.id = generate_uuid()
+    if not target.path:
+        parent_path = '/'
+        if target.parent_id:
+            parent_path = connection.scalar(
+                select(FileNode.path).where(FileNode.id == target.parent_id)
+            )
+            if not parent_path:
+                # A root path here would put the node outside its parent's subtree
+                raise ValueError(f"Parent {target.parent_id} of file node {target.id} has no path")
+        target.path = f"{parent_path}{target.id}/"
+
+
 class NoteFileLink(Base):
     __tablename__ = 'note_file_links'
 
@@ -127,7 +181,7 @@ class NoteAttachment(Base):
     __tablename__ = 'note_attachments'
     
     id = Column(String, primary_key=True, default=generate_uuid)
-    note_id = Column(String, ForeignKey('notes.id', ondelete='CASCADE'), nullable=False)
+    note_id = Column(String, ForeignKey('notes.id', ondelete='CASCADE'), nullable=False, index=True)
     filename = Column(String, nullable=False)
     file_path = Column(String, nullable=False)  # Path in MinIO
     file_type = Column(String, nullable=False)  # image/jpeg, image/png, etc.
@@ -136,3 +190,121 @@ class NoteAttachment(Base):
     
     # Relationships
     note = relationship('Note', back_populates='attachments')
+
+
+class PendingObjectDeletion(Base):
+    __tablename__ = 'pending_object_deletions'
+
+    object_name = Column(String, primary_key=True)  # MinIO key whose rows are already gone
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text, nullable=True)
+    claimed_until = Column(DateTime, nullable=True)  # set while a purge is deleting the object
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class UploadSessionStatus(str, enum.Enum):
+    ACTIVE = "active"
+    COMPLETED = "completed"
+    ABORTED = "aborted"
+    EXPIRED = "expired"
+
+
+class UploadSession(Base):
+    """Resumable upload backed by an S3 multipart upload; the FileNode is created on completion"""
+    __tablename__ = 'upload_sessions'
+
+    id = Column(String, primary_key=True, default=generate_uuid)
+    project_id = Column(String, ForeignKey('projects.id', ondelete='CASCADE'), nullable=False)
+    user_id = Column(String, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    parent_id = Column(String, nullable=True)  # target folder, re-validated on completion
+    filename = Column(String, nullable=False)
+    content_type = Column(String, nullable=True)
+    size = Column(BigInteger, nullable=False)
+    part_size = Column(BigInteger, nullable=False)
+    object_name = Column(String, nullable=False)
+    upload_id = Column(String, nullable=False)  # MinIO multipart upload id
+    status = Column(SQLEnum(UploadSessionStatus), default=UploadSessionStatus.ACTIVE, nullable=False)
+    file_node_id = Column(String, ForeignKey('file_nodes.id', ondelete='SET NULL'), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+
+    parts = relationship('UploadSessionPart', cascade='all, delete-orphan', passive_deletes=True)
+
+    __table_args__ = (
+        Index('ix_upload_sessions_status_expires', 'status', 'expires_at'),
+    )
+
+
+class UploadSessionPart(Base):
+    __tablename__ = 'upload_session_parts'
+
+    session_id = Column(String, ForeignKey('upload_sessions.id', ondelete='CASCADE'), primary_key=True)
+    part_number = Column(Integer, primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    sha256 = Column(String, nullable=False)
+    etag = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class Blob(Base):
+    """Content-addressed object shared by every FileNode with the same bytes"""
+    __tablename__ = 'blobs'
+
+    sha256 = Column(String, primary_key=True)
+    object_name = Column(String, nullable=False, unique=True)  # blobs/<aa>/<bb>/<sha256>
+    size = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=1)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ChangeLog(Base):
+    """One row per insert, update or delete of a synced row, written by triggers (see change_log.py)"""
+    __tablename__ = 'change_log'
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    project_id = Column(String, nullable=False)  # no FK: entries outlive deleted rows
+    entity_type = Column(String, nullable=False)  # "note", "file_node" or "member"
+    entity_id = Column(String, nullable=False)  # note id, file node id or member user id
+    op = Column(String, nullable=False)  # "upsert" or "delete"
+    txid = Column(BigInteger, nullable=False)  # writing transaction, orders the log with id
+    changed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('ix_change_log_project_txid', 'project_id', 'txid', 'id'),
+        Index('ix_change_log_changed_at', 'changed_at'),
+    )
+
+
+class Job(Base):
+    """A queued side effect, claimed by workers with FOR UPDATE SKIP LOCKED (see jobs.py)"""
+    __tablename__ = 'jobs'
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    kind = Column(String, nullable=False)  # handler name, e.g. "objects.purge"
+    payload = Column(JSONB, nullable=False, default=dict)
+    idempotency_key = Column(String, unique=True, nullable=True)  # a second enqueue with the key is dropped
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, nullable=False)
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # next attempt; past the lease while running
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('ix_jobs_run_at', 'run_at', 'id'),
+    )
+
+
+class DeadJob(Base):
+    """A job that failed max_attempts times, kept for inspection and requeueing"""
+    __tablename__ = 'dead_jobs'
+
+    id = Column(BigInteger, primary_key=True)  # id the job had in jobs
+    kind = Column(String, nullable=False)
+    payload = Column(JSONB, nullable=False)
+    idempotency_key = Column(String, nullable=True)
+    attempts = Column(Integer, nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=True)
+    failed_at = Column(DateTime, default=datetime.utcnow)
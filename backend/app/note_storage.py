@@ -0,0 +1,369 @@
+"""Notes and their .txt backing files in MinIO.
+
+create_note_records, apply_note_updates and remove_note keep notes, their
+file nodes under the project's Notes folder and the objects in step; the
+notes routes (single and batch) and the sync push share them. New notes'
+objects are written before their rows; edits and deletes reach MinIO
+through queued jobs ("note.write_text", "objects.purge") committed with
+the rows.
+
+Note text is mirrored into notes.content by object version.
+Every note has a .txt backing object. FileNode.storage_etag is the ETag of the
+version whose text notes.content holds; the API records it whenever it writes
+the object. Reading a note stats the object only when this worker has not
+confirmed that version within NOTE_SYNC_CHECK_SECONDS, and downloads it only
+when the ETag moved (the file was changed outside the notes API). The common
+read is served from PostgreSQL alone.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+import asyncio
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import TTLCache
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.file_tree import adjust_ancestor_totals, apply_total_deltas, assign_path
+from app.jobs import enqueue_many, job_handler
+from app.minio_client import minio_client, normalize_etag
+from app.object_cleanup import schedule_and_purge
+from app.models import FileNode, FileNodeType, Note, NoteFileLink, generate_uuid
+
+# Object key -> ETag seen in MinIO
+note_version_cache = TTLCache(
+    "note_versions",
+    ttl=settings.NOTE_SYNC_CHECK_SECONDS,
+    maxsize=settings.NOTE_SYNC_CACHE_MAX_ENTRIES
+)
+
+
+async def write_note_text(storage_path: str, content_bytes: bytes) -> str:
+    """Upload a note's text and return the ETag to store on its FileNode"""
+    etag = await minio_client.upload_versioned(content_bytes, storage_path, "text/plain")
+    await note_version_cache.set(storage_path, etag)
+    return etag
+
+
+async def remember_version(storage_path: str, etag: str) -> None:
+    """Record a version written by another path (e.g. a file replace)"""
+    await note_version_cache.set(storage_path, normalize_etag(etag))
+
+
+async def sync_note_text(note: Note, file_node: FileNode) -> bool:
+    """Bring note.content up to date with its backing object.
+
+    Returns True when the note or file node changed and needs a commit. Storage
+    errors propagate; callers keep the database copy in that case.
+    """
+    path = file_node.storage_path
+    if file_node.storage_etag and await note_version_cache.get(path) == file_node.storage_etag:
+        return False
+
+    etag = normalize_etag((await minio_client.stat_file(path)).etag)
+    await note_version_cache.set(path, etag)
+    if etag == file_node.storage_etag:
+        return False
+
+    # A write racing this read leaves a newer ETag behind, so the next read fetches again
+    data = await minio_client.get_file(path)
+    if data is None:
+        raise RuntimeError(f"{path} could not be read")
+    content = data.decode('utf-8')
+    if note.content != content:
+        note.content = content
+        note.updated_at = datetime.utcnow()
+    file_node.storage_etag = etag
+    return True
+
+
+async def sign_attachments(notes: List[Note]) -> None:
+    """Set attachment.url on every attachment of the notes in one batch, reusing cached signatures"""
+    attachments = [attachment for note in notes for attachment in note.attachments]
+    urls = await minio_client.presigned_urls(a.file_path for a in attachments)
+    for attachment in attachments:
+        attachment.url = urls[attachment.file_path]
+
+
+def note_event(note: Note) -> dict:
+    """Event payload for a note change; clients refetch the note for its content"""
+    return {"id": note.id, "title": note.title, "author_id": note.author_id, "updated_at": note.updated_at}
+
+
+async def note_file_node(db: AsyncSession, note_id: str) -> Optional[FileNode]:
+    """Return the .txt file node backing a note, if any"""
+    return await db.scalar(
+        select(FileNode)
+        .join(NoteFileLink, NoteFileLink.file_node_id == FileNode.id)
+        .where(NoteFileLink.note_id == note_id)
+    )
+
+
+def note_object_key(project_id: str, note_id: str) -> str:
+    return f"notes/{project_id}/{note_id}.txt"
+
+
+async def get_notes_folder(db: AsyncSession, project_id: str) -> FileNode:
+    """The project's locked Notes root folder, added to the session if it is missing"""
+    notes_folder = await db.scalar(select(FileNode).where(
+        FileNode.project_id == project_id,
+        FileNode.parent_id == None,
+        FileNode.name == "Notes",
+        FileNode.type == FileNodeType.FOLDER
+    ))
+    if not notes_folder:
+        notes_folder = FileNode(
+            project_id=project_id,
+            parent_id=None,
+            name="Notes",
+            type=FileNodeType.FOLDER,
+            is_locked=True,
+        )
+        assign_path(notes_folder, None)
+        db.add(notes_folder)
+    return notes_folder
+
+
+async def discard_objects(object_names: List[str]) -> None:
+    """Compensate for objects written by a transaction that did not commit"""
+    try:
+        failed = await minio_client.delete_files(object_names)
+    except Exception as e:
+        print(f"✗ Object cleanup after a failed transaction errored: {e}")
+        failed = object_names
+    if failed:
+        print(f"✗ Left {len(failed)} unreferenced objects behind: {failed[:5]}")
+
+
+async def commit_or_discard(db: AsyncSession, object_names: List[str]) -> None:
+    """Commit the caller's transaction; if that fails, delete the objects it wrote and re-raise"""
+    try:
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        await discard_objects(object_names)
+        raise
+
+
+def note_rows(notes_folder: FileNode, note: Note, content_bytes: bytes, etag: Optional[str]) -> Tuple[FileNode, NoteFileLink]:
+    """The file node and link backing a note whose object was written with etag"""
+    note_node = FileNode(
+        project_id=note.project_id,
+        parent_id=notes_folder.id,
+        name=f"{note.title}.txt",
+        type=FileNodeType.FILE,
+        mime_type="text/plain",
+        size=len(content_bytes),
+        storage_path=note_object_key(note.project_id, note.id),
+        storage_etag=etag,
+        is_locked=False,  # Allow editing as regular file
+    )
+    assign_path(note_node, notes_folder)
+    return note_node, NoteFileLink(note_id=note.id, file_node_id=note_node.id)
+
+
+async def write_note_texts(objects: List[Tuple[str, bytes]]) -> List[Union[str, BaseException]]:
+    """Upload many notes' text, NOTE_BATCH_UPLOAD_CONCURRENCY at a time; the ETag or the error for each"""
+    semaphore = asyncio.Semaphore(settings.NOTE_BATCH_UPLOAD_CONCURRENCY)
+
+    async def put(storage_path: str, content_bytes: bytes) -> str:
+        async with semaphore:
+            return await write_note_text(storage_path, content_bytes)
+
+    return await asyncio.gather(*(put(path, data) for path, data in objects), return_exceptions=True)
+
+
+async def create_note_records(
+    db: AsyncSession, project_id: str, author_id: str, drafts: List[Tuple[str, Optional[str]]]
+) -> List[Union[Note, Exception]]:
+    """Create notes from (title, content) drafts with their .txt files and file nodes.
+
+    Returns the Note or the error for each draft: ValueError when the title
+    is taken in the Notes folder, the storage error when its object could not
+    be written. Objects are written first, concurrently; the rows of every
+    note that got one are then inserted in a single flush. Nothing is
+    committed: commit with commit_or_discard(db, [note_object_key(...)]) so
+    the objects go away if the commit fails. A failed flush discards them too.
+    """
+    notes_folder = await get_notes_folder(db, project_id)
+    names = [f"{title}.txt" for title, _ in drafts]
+    taken = set()
+    if notes_folder not in db.new:
+        taken = set((await db.scalars(select(FileNode.name).where(
+            FileNode.parent_id == notes_folder.id, FileNode.name.in_(set(names))
+        ))).all())
+
+    results: List[Union[Note, Exception]] = []
+    for (title, content), name in zip(drafts, names):
+        if name in taken:
+            results.append(ValueError(f"A note titled '{title}' already exists"))
+            continue
+        taken.add(name)
+        # Ids are assigned here so object keys are known before anything is inserted
+        results.append(Note(
+            id=generate_uuid(),
+            title=title,
+            content=content,
+            project_id=project_id,
+            author_id=author_id,
+            attachments=[],
+        ))
+
+    pending = [(index, note) for index, note in enumerate(results) if isinstance(note, Note)]
+    payloads = [(note.content or '').encode('utf-8') for _, note in pending]
+    etags = await write_note_texts([
+        (note_object_key(project_id, note.id), data) for (_, note), data in zip(pending, payloads)
+    ])
+
+    rows, written, nbytes = [], [], 0
+    for (index, note), content_bytes, etag in zip(pending, payloads, etags):
+        if isinstance(etag, BaseException):
+            print(f"✗ Note text upload failed for {note.id}: {etag}")
+            results[index] = RuntimeError("The note text could not be stored")
+            continue
+        note_node, link = note_rows(notes_folder, note, content_bytes, etag)
+        rows += [note, note_node, link]
+        written.append(note_node.storage_path)
+        nbytes += len(content_bytes)
+
+    if written:
+        try:
+            db.add_all(rows)
+            await db.flush()
+            await apply_total_deltas(db, {notes_folder.id: (len(written), nbytes)})
+        except Exception:
+            await db.rollback()
+            await discard_objects(written)
+            raise
+    return results
+
+
+async def create_note_record(db: AsyncSession, project_id: str, author_id: str, title: str, content: Optional[str]) -> Note:
+    """create_note_records for a single note, raising its error"""
+    [note] = await create_note_records(db, project_id, author_id, [(title, content)])
+    if isinstance(note, Exception):
+        raise note
+    return note
+
+
+async def apply_note_updates(
+    db: AsyncSession, updates: List[Tuple[Note, Optional[FileNode], Optional[str], Optional[str]]]
+) -> List[Optional[Exception]]:
+    """Apply (note, file node, title, content) changes; None or the error for each (not committed).
+
+    A title whose file name is taken by another node in the same folder is
+    refused with ValueError. Folder totals move in one UPDATE and the txt
+    files are rewritten by "note.write_text" jobs queued in one INSERT.
+    """
+    renamed = [(node, f"{title}.txt") for _, node, title, _ in updates if node and title is not None]
+    taken = {}
+    if renamed:
+        rows = (await db.execute(
+            select(FileNode.id, FileNode.project_id, FileNode.parent_id, FileNode.name).where(
+                FileNode.project_id.in_({node.project_id for node, _ in renamed}),
+                FileNode.name.in_({name for _, name in renamed})
+            )
+        )).all()
+        taken = {(row.project_id, row.parent_id, row.name): row.id for row in rows}
+
+    now = datetime.utcnow()
+    errors: List[Optional[Exception]] = []
+    deltas: Dict[str, Tuple[int, int]] = {}
+    jobs = []
+    for note, file_node, title, content in updates:
+        if file_node and title is not None:
+            key = (file_node.project_id, file_node.parent_id, f"{title}.txt")
+            if taken.get(key, file_node.id) != file_node.id:
+                errors.append(ValueError(f"A note titled '{title}' already exists"))
+                continue
+            taken[key] = file_node.id
+        errors.append(None)
+
+        if title is not None:
+            note.title = title
+            # Update filename in file node
+            if file_node:
+                file_node.name = f"{title}.txt"
+                file_node.updated_at = now
+
+        if content is not None:
+            note.content = content
+            # The txt file in MinIO is rewritten by a job once this commits
+            if file_node and file_node.storage_path:
+                content_bytes = (content or '').encode('utf-8')
+                for folder_id in file_node.path.strip('/').split('/')[:-1]:
+                    files, nbytes = deltas.get(folder_id, (0, 0))
+                    deltas[folder_id] = (files, nbytes + len(content_bytes) - (file_node.size or 0))
+                file_node.size = len(content_bytes)
+                file_node.updated_at = now
+                jobs.append(({"note_id": note.id}, f"note-text:{note.id}:{now.isoformat()}"))
+
+        note.updated_at = now
+
+    await apply_total_deltas(db, deltas)
+    await enqueue_many(db, "note.write_text", jobs)
+    return errors
+
+
+async def apply_note_update(db: AsyncSession, note: Note, title: Optional[str], content: Optional[str]) -> None:
+    """Apply a title and/or content change to a note and its backing file, raising ValueError on a taken title (not committed)"""
+    file_node = await note_file_node(db, note.id)
+    [error] = await apply_note_updates(db, [(note, file_node, title, content)])
+    if error:
+        raise error
+
+
+# Rewrites of a note whose text keeps changing under the job before it gives up (and is retried)
+_WRITE_TEXT_ATTEMPTS = 5
+
+
+@job_handler("note.write_text")
+async def _write_note_text_job(payload) -> None:
+    """Write the note's current content to its object, then record the ETag.
+
+    Nothing is locked during the upload. Afterwards the file node is locked
+    just long enough to check the note still holds the text written: if it
+    changed (an edit, or another job writing newer text first), the current
+    text is written again, so the object never stays behind the note.
+    """
+    note_id = payload["note_id"]
+    text_of_note = (
+        select(FileNode.storage_path, Note.content)
+        .join(NoteFileLink, NoteFileLink.file_node_id == FileNode.id)
+        .join(Note, Note.id == NoteFileLink.note_id)
+        .where(NoteFileLink.note_id == note_id)
+    )
+    for _ in range(_WRITE_TEXT_ATTEMPTS):
+        async with AsyncSessionLocal() as db:
+            row = (await db.execute(text_of_note)).first()
+        if not row or not row.storage_path:
+            return  # the note was deleted meanwhile
+        etag = await write_note_text(row.storage_path, (row.content or '').encode('utf-8'))
+
+        async with AsyncSessionLocal() as db:
+            current = (await db.execute(text_of_note.with_for_update(of=FileNode))).first()
+            if not current or current.storage_path != row.storage_path:
+                return
+            if current.content == row.content:
+                await db.execute(
+                    update(FileNode)
+                    .where(FileNode.storage_path == row.storage_path)
+                    .values(storage_etag=etag)
+                )
+                await db.commit()
+                return
+    raise RuntimeError(f"Text of note {note_id} kept changing while it was written")
+
+
+async def remove_note(db: AsyncSession, note: Note) -> None:
+    """Delete a note (attachments loaded) and its backing file, queueing their objects for deletion (not committed)"""
+    object_names = [attachment.file_path for attachment in note.attachments]
+    file_node = await note_file_node(db, note.id)
+    if file_node and file_node.storage_path:
+        object_names.append(file_node.storage_path)
+        await adjust_ancestor_totals(db, file_node.path, -1, -(file_node.size or 0))
+        await db.delete(file_node)
+    
+    await schedule_and_purge(db, object_names)
+    await db.delete(note)
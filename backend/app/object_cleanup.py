@@ -0,0 +1,207 @@
+"""Deferred removal of MinIO objects whose database rows were deleted.
+
+Routes record keys in pending_object_deletions in the same transaction that
+removes the rows and queue an "objects.purge" job with them (enqueue_purge), so
+the request returns as soon as it commits. Keys that still fail after the
+job's retries stay in the table and are retried by the periodic sweep.
+
+A purge first claims its rows (claimed_until) in a short committed
+transaction, deletes the objects with no transaction open, then settles the
+rows it still owns. A purge that dies mid-way leaves its claim to expire.
+"""
+from datetime import datetime, timedelta
+from typing import Iterable, List, Tuple
+import asyncio
+import math
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.jobs import enqueue, job_handler
+from app.minio_client import minio_client
+from app.models import Blob, PendingObjectDeletion
+
+
+# Keeps each statement well under PostgreSQL's bind parameter limit
+_CHUNK = 5000
+
+
+def chunks(items: List[str]):
+    for start in range(0, len(items), _CHUNK):
+        yield items[start:start + _CHUNK]
+
+
+async def schedule_object_deletion(db: AsyncSession, object_names: Iterable[str]) -> List[str]:
+    """Record object keys for deletion; commits with the caller's transaction"""
+    names = sorted({name for name in object_names if name})
+    for chunk in chunks(names):
+        await db.execute(
+            insert(PendingObjectDeletion)
+            .values([{"object_name": name} for name in chunk])
+            .on_conflict_do_nothing(index_elements=["object_name"])
+        )
+    return names
+
+
+async def enqueue_purge(db: AsyncSession, object_names: List[str]) -> None:
+    """Queue deletion of keys already scheduled; the job runs once the caller commits"""
+    for chunk in chunks(sorted(set(object_names))):
+        await enqueue(db, "objects.purge", {"object_names": chunk})
+
+
+async def schedule_and_purge(db: AsyncSession, object_names: Iterable[str]) -> List[str]:
+    """schedule_object_deletion followed by enqueue_purge"""
+    names = await schedule_object_deletion(db, object_names)
+    await enqueue_purge(db, names)
+    return names
+
+
+def _unclaimed(now: datetime):
+    return or_(PendingObjectDeletion.claimed_until == None, PendingObjectDeletion.claimed_until < now)
+
+
+async def reclaim_objects(db: AsyncSession, object_names: List[str]) -> None:
+    """Withdraw keys from pending deletion before writing them again, in the caller's transaction.
+
+    Keys whose purge is in flight are waited for, so that purge's delete cannot
+    land after the new upload; after OBJECT_RECLAIM_WAIT_SECONDS the request
+    gets a 503 rather than holding its transaction open. Rows removed here stay
+    locked until the caller commits, which keeps later purges from claiming them.
+    """
+    names = sorted(set(object_names))
+    deadline = asyncio.get_running_loop().time() + settings.OBJECT_RECLAIM_WAIT_SECONDS
+    while names:
+        now = datetime.utcnow()
+        busy = []
+        for chunk in chunks(names):
+            await db.execute(
+                delete(PendingObjectDeletion)
+                .where(PendingObjectDeletion.object_name.in_(chunk), _unclaimed(now))
+            )
+            busy.extend((await db.scalars(
+                select(PendingObjectDeletion.object_name).where(PendingObjectDeletion.object_name.in_(chunk))
+            )).all())
+        names = busy
+        if not names:
+            break
+        if asyncio.get_running_loop().time() + settings.OBJECT_DELETE_RETRY_DELAY > deadline:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="An earlier copy of this file is still being removed; retry shortly",
+                headers={"Retry-After": str(math.ceil(settings.OBJECT_RECLAIM_WAIT_SECONDS))},
+            )
+        await asyncio.sleep(settings.OBJECT_DELETE_RETRY_DELAY)
+
+
+async def _claim(object_names: List[str]) -> Tuple[datetime, List[str]]:
+    """Claim the keys nobody else is purging; the lease time doubles as this purge's token"""
+    now = datetime.utcnow()
+    lease = now + timedelta(seconds=settings.OBJECT_DELETE_CLAIM_SECONDS)
+    claimed = []
+    async with AsyncSessionLocal() as db:
+        for chunk in chunks(sorted(set(object_names))):
+            free = (
+                select(PendingObjectDeletion.object_name)
+                .where(PendingObjectDeletion.object_name.in_(chunk), _unclaimed(now))
+                .with_for_update(skip_locked=True)
+            )
+            taken = (await db.scalars(
+                update(PendingObjectDeletion)
+                .where(PendingObjectDeletion.object_name.in_(free))
+                .values(claimed_until=lease)
+                .returning(PendingObjectDeletion.object_name)
+                .execution_options(synchronize_session=False)
+            )).all()
+            # A blob stored again since its key was queued keeps its object
+            kept = set((await db.scalars(select(Blob.object_name).where(Blob.object_name.in_(taken)))).all()) if taken else set()
+            if kept:
+                await db.execute(delete(PendingObjectDeletion).where(PendingObjectDeletion.object_name.in_(kept)))
+            claimed.extend(name for name in taken if name not in kept)
+        await db.commit()
+    return lease, claimed
+
+
+@job_handler("objects.purge")
+async def _purge_job(payload) -> None:
+    await purge_objects(payload["object_names"])
+
+
+async def purge_objects(object_names: List[str]) -> None:
+    """Delete objects in batches, retrying with backoff, then clear their pending rows.
+
+    Only keys this purge claimed are deleted; keys another purge holds, and keys
+    taken back by reclaim_objects(), are skipped. No connection is held while
+    MinIO is called or between retries.
+    """
+    lease, claimed = await _claim(object_names)
+    if not claimed:
+        return
+
+    remaining = list(claimed)
+    last_error = None
+    delay = settings.OBJECT_DELETE_RETRY_DELAY
+    for attempt in range(settings.OBJECT_DELETE_RETRIES):
+        try:
+            remaining = await minio_client.delete_files(remaining)
+            last_error = "DeleteObjects reported errors"
+        except Exception as e:
+            last_error = str(e)
+            print(f"✗ Batch object deletion failed (attempt {attempt + 1}): {e}")
+        # Past the lease the keys may belong to someone else; leave them to the next purge
+        if not remaining or datetime.utcnow() + timedelta(seconds=delay) >= lease:
+            break
+        await asyncio.sleep(delay)
+        delay *= 2
+
+    failed = set(remaining)
+    done = [name for name in claimed if name not in failed]
+    owned = PendingObjectDeletion.claimed_until == lease
+    async with AsyncSessionLocal() as db:
+        for chunk in chunks(done):
+            await db.execute(delete(PendingObjectDeletion).where(PendingObjectDeletion.object_name.in_(chunk), owned))
+        for chunk in chunks(remaining):
+            await db.execute(
+                update(PendingObjectDeletion)
+                .where(PendingObjectDeletion.object_name.in_(chunk), owned)
+                .values(
+                    attempts=PendingObjectDeletion.attempts + 1,
+                    last_error=last_error,
+                    claimed_until=None
+                )
+            )
+        await db.commit()
+
+
+async def reconcile_pending_deletions(batch_size: int = 1000) -> int:
+    """Retry every recorded deletion once; returns how many keys were attempted"""
+    attempted = 0
+    last_seen = ""
+    while True:
+        async with AsyncSessionLocal() as db:
+            names = (await db.scalars(
+                select(PendingObjectDeletion.object_name)
+                .where(PendingObjectDeletion.object_name > last_seen)
+                .order_by(PendingObjectDeletion.object_name)
+                .limit(batch_size)
+            )).all()
+        if not names:
+            return attempted
+        await purge_objects(list(names))
+        attempted += len(names)
+        last_seen = names[-1]
+
+
+async def run_periodic_reconciliation() -> None:
+    """Background loop started with the app"""
+    while True:
+        try:
+            count = await reconcile_pending_deletions()
+            if count:
+                print(f"✓ Reconciled {count} pending object deletions")
+        except Exception as e:
+            print(f"✗ Object reconciliation error: {e}")
+        await asyncio.sleep(settings.OBJECT_RECONCILE_INTERVAL_SECONDS)
@@ -0,0 +1,139 @@
+"""WebP thumbnail renditions for uploaded images.
+
+Decoding and resizing run in a process pool so large photos never tie up the
+API workers. Renditions live next to the original under a derived key and are
+regenerated whenever the original is replaced. Uploads queue a
+"thumbnails.generate" job; a missing rendition is also rendered on demand.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Dict, Iterable, List, Optional, Tuple
+import asyncio
+
+from minio.error import S3Error
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.jobs import enqueue, job_handler
+from app.minio_client import minio_client
+
+THUMBNAIL_SIZES = (128, 256, 512)  # longest edge in pixels
+THUMBNAIL_MIME_TYPE = "image/webp"
+RENDERABLE_MIME_TYPES = {
+    "image/jpeg", "image/jpg", "image/png", "image/webp",
+    "image/gif", "image/bmp", "image/tiff",
+}
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def thumbnail_key(storage_path: str, size: int) -> str:
+    return f"thumbnails/{storage_path}/{size}.webp"
+
+
+def thumbnail_keys(storage_path: str) -> List[str]:
+    return [thumbnail_key(storage_path, size) for size in THUMBNAIL_SIZES]
+
+
+def is_renderable(mime_type: Optional[str]) -> bool:
+    return (mime_type or "").lower() in RENDERABLE_MIME_TYPES
+
+
+def rendition_keys(rows: Iterable[Tuple[Optional[str], Optional[str]]]) -> List[str]:
+    """Thumbnail keys for (storage_path, mime_type) pairs of deleted files"""
+    keys = []
+    for storage_path, mime_type in rows:
+        if storage_path and is_renderable(mime_type):
+            keys.extend(thumbnail_keys(storage_path))
+    return keys
+
+
+def _render(data: bytes, sizes: Tuple[int, ...], quality: int) -> Dict[int, bytes]:
+    """Runs in a worker process: decode once, emit one WebP per size"""
+    from PIL import Image, ImageOps
+
+    with Image.open(BytesIO(data)) as image:
+        # Let JPEG decode at a reduced scale when the largest rendition allows it
+        image.draft("RGB", (max(sizes), max(sizes)))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        out = {}
+        for size in sorted(sizes, reverse=True):
+            rendition = image.copy()
+            rendition.thumbnail((size, size))
+            buffer = BytesIO()
+            rendition.save(buffer, format="WEBP", quality=quality, method=4)
+            out[size] = buffer.getvalue()
+        return out
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.THUMBNAIL_WORKERS)
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def render_thumbnails(storage_path: str, mime_type: Optional[str]) -> bool:
+    """Render and store every thumbnail size for an object; False when skipped, errors propagate"""
+    if not is_renderable(mime_type):
+        return False
+    stat = await minio_client.stat_file(storage_path)
+    if stat.size > settings.THUMBNAIL_MAX_SOURCE_BYTES:
+        return False
+    data = await minio_client.get_file(storage_path)
+    if data is None:
+        raise RuntimeError(f"{storage_path} could not be read")
+    loop = asyncio.get_running_loop()
+    renditions = await loop.run_in_executor(
+        _get_pool(), _render, data, THUMBNAIL_SIZES, settings.THUMBNAIL_QUALITY
+    )
+    await asyncio.gather(*[
+        minio_client.upload_file(payload, thumbnail_key(storage_path, size), THUMBNAIL_MIME_TYPE)
+        for size, payload in renditions.items()
+    ])
+    return True
+
+
+async def generate_thumbnails(storage_path: str, mime_type: Optional[str]) -> bool:
+    """Render and store every thumbnail size for an object; False when skipped or failed"""
+    try:
+        return await render_thumbnails(storage_path, mime_type)
+    except Exception as e:
+        print(f"✗ Thumbnail generation failed for {storage_path}: {e}")
+        return False
+
+
+async def enqueue_thumbnails(db: AsyncSession, storage_path: Optional[str], mime_type: Optional[str]) -> None:
+    """Queue rendering with the caller's transaction; one job per object however many nodes share it"""
+    if storage_path and is_renderable(mime_type):
+        await enqueue(
+            db, "thumbnails.generate", {"storage_path": storage_path, "mime_type": mime_type},
+            key=f"thumbnails:{storage_path}"
+        )
+
+
+@job_handler("thumbnails.generate")
+async def _thumbnails_job(payload) -> None:
+    try:
+        await render_thumbnails(payload["storage_path"], payload.get("mime_type"))
+    except S3Error as e:
+        if e.code != "NoSuchKey":
+            raise
+        # The original was deleted or replaced before its turn came
+
+
+def closest_size(requested: int) -> int:
+    """Smallest rendition at least as large as requested (largest if none is)"""
+    for size in THUMBNAIL_SIZES:
+        if size >= requested:
+            return size
+    return THUMBNAIL_SIZES[-1]
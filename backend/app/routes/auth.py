@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
-from app.dependencies import get_current_user
+from app.dependencies import get_current_user, invalidate_user
 from app.models import User
 from app.schemas import UserResponse, FirebaseTokenRequest, AuthResponse, LoginRequest, RegisterRequest
+from app.user_search import MIN_QUERY_LENGTH, find_users
+from typing import List
 import firebase_admin.auth as firebase_auth
 from datetime import datetime, timedelta
 import uuid
@@ -16,7 +19,7 @@ router = APIRouter(prefix="/auth", tags=["authentication"])
 @router.post("/login", response_model=AuthResponse)
 async def login(
     request: LoginRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Login with email and password using Firebase authentication"""
     try:
@@ -25,7 +28,7 @@ async def login(
         # For production, you might want to use Firebase Auth REST API
         
         # Try to get user by email first to check if they exist
-        user = db.query(User).filter(User.email == request.email).first()
+        user = await db.scalar(select(User).where(User.email == request.email))
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -42,7 +45,8 @@ async def login(
             
             # Update last login
             user.last_login = datetime.utcnow()
-            db.commit()
+            await db.commit()
+            await invalidate_user(user.id)
             
             # Generate JWT token for our API
             jwt_payload = {
@@ -81,12 +85,12 @@ async def login(
 @router.post("/register", response_model=AuthResponse)
 async def register(
     request: RegisterRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Register new user with email and password"""
     try:
         # Check if user already exists
-        existing_user = db.query(User).filter(User.email == request.email).first()
+        existing_user = await db.scalar(select(User).where(User.email == request.email))
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -110,8 +114,7 @@ async def register(
             last_login=datetime.utcnow()
         )
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
         
         # Generate JWT token for our API
         jwt_payload = {
@@ -147,7 +150,7 @@ async def register(
 @router.post("/verify-token", response_model=AuthResponse)
 async def verify_firebase_token(
     request: FirebaseTokenRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Verify Firebase ID token and return user data"""
     try:
@@ -164,7 +167,7 @@ async def verify_firebase_token(
             )
 
         # Check if user exists in our database
-        user = db.query(User).filter(User.firebase_uid == firebase_uid).first()
+        user = await db.scalar(select(User).where(User.firebase_uid == firebase_uid))
         
         if not user:
             # Create new user
@@ -177,12 +180,12 @@ async def verify_firebase_token(
                 last_login=datetime.utcnow()
             )
             db.add(user)
-            db.commit()
-            db.refresh(user)
+            await db.commit()
         else:
             # Update last login
             user.last_login = datetime.utcnow()
-            db.commit()
+            await db.commit()
+            await invalidate_user(user.id)
 
         # Generate JWT token for our API
         jwt_payload = {
@@ -220,22 +223,18 @@ async def get_current_user_info(
     return current_user
 
 
-@router.get("/users/search")
+@router.get("/users/search", response_model=List[UserResponse])
 async def search_users(
     query: str,
+    limit: int = Query(10, ge=1, le=50),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Search users by email or display name"""
-    if len(query) < 3:
+    """Search users by email or display name (prefix matches first, then by similarity)"""
+    if len(query.strip()) < MIN_QUERY_LENGTH:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Search query must be at least 3 characters"
+            detail=f"Search query must be at least {MIN_QUERY_LENGTH} characters"
         )
     
-    users = db.query(User).filter(
-        (User.email.ilike(f"%{query}%")) |
-        (User.display_name.ilike(f"%{query}%"))
-    ).limit(10).all()
-    
-    return users
+    return await find_users(db, query, limit)
@@ -0,0 +1,111 @@
+"""Live project changes as a Server-Sent Events stream.
+
+GET /projects/{id}/events stays open and sends one SSE message per change
+made in the project (note.*, notes.*, file.*, files.created, member.*, project.*),
+after the change is committed. Each message carries an id; a client that
+reconnects with Last-Event-ID (EventSource does this by itself) first gets
+the events it missed. A "resync" event means that gap could not be filled,
+or the client fell too far behind: reload from the API or /changes and
+reconnect without Last-Event-ID.
+"""
+from typing import AsyncIterator, Optional
+import asyncio
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import AsyncSessionLocal, get_db
+from app.dependencies import get_current_user, check_project_permission
+from app.events import Event, event_broker
+from app.models import User
+
+router = APIRouter(prefix="/projects", tags=["events"])
+
+def format_sse(event: Event) -> str:
+    return f"id: {event.id}\nevent: {event.type}\ndata: {event.to_json()}\n\n"
+
+
+def _control(event_type: str) -> str:
+    """A message without id, so it never becomes the client's resume point"""
+    return f"event: {event_type}\ndata: {{}}\n\n"
+
+
+def _closes_stream(event: Event, user_id: str) -> bool:
+    """The stream ends once the project is gone or this user was removed from it"""
+    if event.type == "member.removed":
+        return event.data.get("user_id") == user_id
+    return event.type == "project.deleted"
+
+
+async def _still_member(project_id: str, user: User) -> bool:
+    async with AsyncSessionLocal() as db:
+        try:
+            await check_project_permission(project_id, user, db)
+            return True
+        except HTTPException:
+            return False
+
+
+async def _stream(project_id: str, user: User, last_event_id: Optional[str]) -> AsyncIterator[str]:
+    # Subscribing here, not in the route, ties the subscription to the generator's
+    # finally; a client gone before the body starts leaves nothing behind.
+    # Subscribe before reading the buffer so nothing published in between is lost.
+    subscription = event_broker.subscribe(project_id)
+    try:
+        backlog = event_broker.replay_after(project_id, last_event_id) if last_event_id else []
+        yield f"retry: {settings.EVENT_RETRY_MS}\n\n"
+        if backlog is None:
+            yield _control("resync")
+            backlog = []
+        # Events published while the backlog was read can be in both; send them once
+        sent = set()
+        for event in backlog:
+            sent.add(event.id)
+            yield format_sse(event)
+            if _closes_stream(event, user.id):
+                return
+
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), settings.EVENT_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if subscription.overflowed:
+                    yield _control("resync")
+                    return
+                # Access can be lost without an event reaching this worker (e.g. cache expiry)
+                if not await _still_member(project_id, user):
+                    yield _control("revoked")
+                    return
+                yield ": keepalive\n\n"
+                continue
+            if event.id in sent:
+                continue
+            yield format_sse(event)
+            if _closes_stream(event, user.id):
+                return
+            if subscription.overflowed and subscription.queue.empty():
+                yield _control("resync")
+                return
+    finally:
+        event_broker.unsubscribe(subscription)
+
+
+@router.get("/{project_id}/events")
+async def project_events(
+    project_id: str,
+    last_event_id: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Stream the project's changes as Server-Sent Events (resume with Last-Event-ID)"""
+    await check_project_permission(project_id, current_user, db)
+    # The stream outlives the request; don't hold a pooled connection for it
+    await db.close()
+
+    return StreamingResponse(
+        _stream(project_id, current_user, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,42 +1,133 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request
-from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response, status, UploadFile, File, Form, Request
+from fastapi.responses import RedirectResponse, StreamingResponse
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from app.database import get_db
 from app.dependencies import get_current_user, check_project_permission
 from app.models import User, Project, FileNode, FileNodeType, Note, NoteFileLink
-from app.schemas import FileNodeBase, FileNodeCreateFolder, FileNodeMoveRequest, FileNodeRenameRequest
+from app.schemas import FileNodeBase, FileNodeCreateFolder, FileNodeMoveRequest, FileNodeRenameRequest, FileTreeResponse, BatchUploadResult, BatchUploadResponse
+from app.file_tree import (
+    SIBLING_ORDER, after_cursor, encode_cursor, load_tree, assign_path, ancestor_ids,
+    in_subtree, is_within, move_subtree, node_totals, adjust_ancestor_totals,
+    resolve_parent, add_file_node
+)
+from app.config import settings
+from app.downloads import content_disposition, is_not_modified, requested_range, validator_headers
 from app.minio_client import minio_client
+from app.note_storage import remember_version
+from minio.error import S3Error
+from app.archives import archive_entries, stream_zip
+from app.batch_upload import BatchLimitExceeded, ImportEntry, close_entries, expand_archive, import_entries, is_archive, split_path
+from app.blobs import commit_or_release, is_blob_key, release_objects, store_blob
+from app.object_cleanup import enqueue_purge
+from app.events import publish
+from app.text_index import index_file_text, is_text_file
+from app.renditions import THUMBNAIL_MIME_TYPE, closest_size, enqueue_thumbnails, generate_thumbnails, is_renderable, thumbnail_key
 from datetime import datetime
-import uuid
+import asyncio
 
 router = APIRouter(prefix="/files", tags=["files"])
 
 
+async def _linked_note(db: AsyncSession, file_node_id: str) -> Optional[Note]:
+    """Return the note backed by a file node, if any"""
+    return await db.scalar(
+        select(Note)
+        .join(NoteFileLink, NoteFileLink.note_id == Note.id)
+        .where(NoteFileLink.file_node_id == file_node_id)
+    )
+
+
+def _node_event(node: FileNode) -> dict:
+    """Event payload for a file node: enough to patch a cached tree in place"""
+    return FileNodeBase.model_validate(node).model_dump(mode="json")
+
+
+async def _list_page(db: AsyncSession, where, response: Response, limit: Optional[int], cursor: Optional[str]) -> List[FileNode]:
+    """Siblings in listing order; with a limit, sets X-Next-Cursor when more remain"""
+    stmt = select(FileNode).where(*where, after_cursor(cursor)).order_by(*SIBLING_ORDER)
+    if limit is None:
+        return (await db.scalars(stmt)).all()
+    nodes = (await db.scalars(stmt.limit(limit + 1))).all()
+    if len(nodes) > limit:
+        nodes = nodes[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(nodes[-1].type, nodes[-1].name)
+    return nodes
+
+
 @router.get("/project/{project_id}", response_model=List[FileNodeBase])
 async def list_project_root(
     project_id: str,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """List root-level file nodes for a project"""
-    check_project_permission(project_id, current_user, db)
-    nodes = db.query(FileNode).filter(FileNode.project_id == project_id, FileNode.parent_id == None).order_by(FileNode.type.desc(), FileNode.name.asc()).all()
-    return nodes
+    """List root-level file nodes for a project (paginated when limit is given)"""
+    await check_project_permission(project_id, current_user, db)
+    where = (FileNode.project_id == project_id, FileNode.parent_id == None)
+    return await _list_page(db, where, response, limit, cursor)
+
+
+@router.get("/project/{project_id}/tree", response_model=FileTreeResponse)
+async def get_tree(
+    project_id: str,
+    depth: int = Query(2, ge=1, le=10),
+    limit: int = Query(100, ge=1, le=1000),
+    parent_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Nested subtree below parent_id (or the project root), `depth` levels deep.
+
+    Each folder returns at most `limit` children; folders with more carry a
+    next_cursor to continue via /files/{id}/children. The top level itself
+    pages with `cursor`.
+    """
+    await check_project_permission(project_id, current_user, db)
+    if parent_id:
+        parent = await db.scalar(select(FileNode).where(FileNode.id == parent_id, FileNode.project_id == project_id))
+        if not parent:
+            raise HTTPException(status_code=404, detail="Folder not found")
+    nodes, next_cursor = await load_tree(db, project_id, parent_id, depth, limit, cursor)
+    return FileTreeResponse(project_id=project_id, parent_id=parent_id, nodes=nodes, next_cursor=next_cursor)
 
 
 @router.get("/{node_id}/children", response_model=List[FileNodeBase])
 async def list_children(
     node_id: str,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    node = db.query(FileNode).filter(FileNode.id == node_id).first()
+    node = await db.get(FileNode, node_id)
     if not node:
         raise HTTPException(status_code=404, detail="Folder not found")
-    check_project_permission(node.project_id, current_user, db)
-    children = db.query(FileNode).filter(FileNode.parent_id == node_id).order_by(FileNode.type.desc(), FileNode.name.asc()).all()
-    return children
+    await check_project_permission(node.project_id, current_user, db)
+    return await _list_page(db, (FileNode.parent_id == node_id,), response, limit, cursor)
+
+
+@router.get("/{node_id}/ancestors", response_model=List[FileNodeBase])
+async def list_ancestors(
+    node_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Breadcrumb trail from the project root down to the node's parent"""
+    node = await db.get(FileNode, node_id)
+    if not node:
+        raise HTTPException(status_code=404, detail="Node not found")
+    await check_project_permission(node.project_id, current_user, db)
+    ids = ancestor_ids(node)
+    if not ids:
+        return []
+    ancestors = {a.id: a for a in (await db.scalars(select(FileNode).where(FileNode.id.in_(ids)))).all()}
+    return [ancestors[i] for i in ids if i in ancestors]
 
 
 @router.post("/project/{project_id}/folders", response_model=FileNodeBase, status_code=status.HTTP_201_CREATED)
@@ -44,16 +135,10 @@ async def create_folder(
     project_id: str,
     folder: FileNodeCreateFolder,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    check_project_permission(project_id, current_user, db)
-    parent = None
-    if folder.parent_id:
-        parent = db.query(FileNode).filter(FileNode.id == folder.parent_id, FileNode.project_id == project_id).first()
-        if not parent:
-            raise HTTPException(status_code=404, detail="Parent folder not found")
-        if parent.type != FileNodeType.FOLDER:
-            raise HTTPException(status_code=400, detail="Parent must be a folder")
+    await check_project_permission(project_id, current_user, db)
+    parent = await resolve_parent(db, project_id, folder.parent_id)
 
     node = FileNode(
         project_id=project_id,
@@ -61,9 +146,11 @@ async def create_folder(
         name=folder.name,
         type=FileNodeType.FOLDER,
     )
+    assign_path(node, parent)
     db.add(node)
-    db.commit()
-    db.refresh(node)
+    await db.commit()
+    await db.refresh(node)
+    await publish(project_id, "file.created", _node_event(node))
     return node
 
 
@@ -72,27 +159,31 @@ async def move_node(
     node_id: str,
     move: FileNodeMoveRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    node = db.query(FileNode).filter(FileNode.id == node_id).first()
+    node = await db.get(FileNode, node_id)
     if not node:
         raise HTTPException(status_code=404, detail="Node not found")
-    check_project_permission(node.project_id, current_user, db)
+    await check_project_permission(node.project_id, current_user, db)
     if node.is_locked:
         raise HTTPException(status_code=400, detail="This node cannot be moved")
 
     new_parent = None
     if move.new_parent_id:
-        new_parent = db.query(FileNode).filter(FileNode.id == move.new_parent_id, FileNode.project_id == node.project_id).first()
+        new_parent = await db.scalar(select(FileNode).where(FileNode.id == move.new_parent_id, FileNode.project_id == node.project_id))
         if not new_parent:
             raise HTTPException(status_code=404, detail="New parent not found")
         if new_parent.type != FileNodeType.FOLDER:
             raise HTTPException(status_code=400, detail="New parent must be a folder")
+        if is_within(new_parent.path, node.path):
+            raise HTTPException(status_code=400, detail="Cannot move a folder into itself or its subfolders")
 
-    node.parent_id = move.new_parent_id
+    old_parent_id = node.parent_id
+    await move_subtree(db, node, new_parent)
     node.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(node)
+    await db.commit()
+    await db.refresh(node)
+    await publish(node.project_id, "file.moved", {**_node_event(node), "old_parent_id": old_parent_id})
     return node
 
 
@@ -101,12 +192,12 @@ async def rename_node(
     node_id: str,
     payload: FileNodeRenameRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    node = db.query(FileNode).filter(FileNode.id == node_id).first()
+    node = await db.get(FileNode, node_id)
     if not node:
         raise HTTPException(status_code=404, detail="Node not found")
-    check_project_permission(node.project_id, current_user, db)
+    await check_project_permission(node.project_id, current_user, db)
     if node.is_locked:
         raise HTTPException(status_code=400, detail="This node cannot be renamed")
     # Preserve extension for file nodes; users can only change base name
@@ -127,21 +218,22 @@ async def rename_node(
     
     # If this is a file in the Notes folder, sync the note title
     if node.parent_id:
-        parent = db.query(FileNode).filter(FileNode.id == node.parent_id).first()
+        parent = await db.get(FileNode, node.parent_id)
         if parent and parent.name == "Notes" and node.type == FileNodeType.FILE:
             # This is a file in the Notes folder, check if it's linked to a note
-            note_link = db.query(NoteFileLink).filter(NoteFileLink.file_node_id == node.id).first()
-            if note_link and note_link.note:
+            note = await _linked_note(db, node.id)
+            if note:
                 # Update the note title from the filename
                 if node.name.endswith('.txt'):
-                    note_link.note.title = node.name[:-4]  # Remove .txt extension
+                    note.title = node.name[:-4]  # Remove .txt extension
                 else:
-                    note_link.note.title = node.name
-                note_link.note.updated_at = datetime.utcnow()
+                    note.title = node.name
+                note.updated_at = datetime.utcnow()
     
     node.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(node)
+    await db.commit()
+    await db.refresh(node)
+    await publish(node.project_id, "file.renamed", _node_event(node))
     return node
 
 
@@ -149,28 +241,31 @@ async def rename_node(
 async def delete_node(
     node_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    node = db.query(FileNode).filter(FileNode.id == node_id).first()
+    node = await db.get(FileNode, node_id)
     if not node:
         raise HTTPException(status_code=404, detail="Node not found")
-    check_project_permission(node.project_id, current_user, db)
+    await check_project_permission(node.project_id, current_user, db)
     if node.is_locked:
         raise HTTPException(status_code=400, detail="This node cannot be deleted")
 
-    # Recursively delete subtree and storage objects
-    async def _delete_subtree(n: FileNode):
-        # delete children first
-        children = db.query(FileNode).filter(FileNode.parent_id == n.id).all()
-        for c in children:
-            await _delete_subtree(c)
-        # delete storage if file
-        if n.type == FileNodeType.FILE and n.storage_path:
-            await minio_client.delete_file(n.storage_path)
-        db.delete(n)
-
-    await _delete_subtree(node)
-    db.commit()
+    files, nbytes = node_totals(node)
+    await adjust_ancestor_totals(db, node.path, -files, -nbytes)
+
+    # The whole subtree is one indexed path-prefix match, deleted in a single statement
+    deleted = (await db.execute(
+        delete(FileNode)
+        .where(in_subtree(node))
+        .returning(FileNode.storage_path, FileNode.mime_type)
+        .execution_options(synchronize_session=False)
+    )).all()
+    # Shared blobs lose one reference per deleted node and go only with the last one
+    object_names = await release_objects(db, deleted)
+    # Storage cleanup is queued with the delete and runs after the response
+    await enqueue_purge(db, object_names)
+    await db.commit()
+    await publish(node.project_id, "file.deleted", {"id": node.id, "parent_id": node.parent_id})
     return None
 
 
@@ -178,10 +273,11 @@ async def delete_node(
 async def upload_file(
     project_id: str,
     request: Request,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    check_project_permission(project_id, current_user, db)
+    await check_project_permission(project_id, current_user, db)
     
     # Parse form manually to be more tolerant
     form = await request.form()
@@ -201,95 +297,272 @@ async def upload_file(
     if file is None:
         raise HTTPException(status_code=422, detail=f"No file uploaded. Received keys: {list(form.keys())}")
     
-    parent = None
-    if parent_id:
-        parent = db.query(FileNode).filter(FileNode.id == parent_id, FileNode.project_id == project_id).first()
-        if not parent:
-            raise HTTPException(status_code=404, detail="Parent folder not found")
-        if parent.type != FileNodeType.FOLDER:
-            raise HTTPException(status_code=400, detail="Parent must be a folder")
+    parent = await resolve_parent(db, project_id, parent_id)
 
-    data = await file.read()
-    object_name = f"files/{project_id}/{uuid.uuid4()}"
-    await minio_client.upload_file(data, object_name, file.content_type)
+    # Content-addressed: identical bytes already stored are referenced, not uploaded again
+    stored = await store_blob(db, file.file, file.content_type or "application/octet-stream")
 
-    node = FileNode(
-        project_id=project_id,
-        parent_id=parent_id,
-    name=file.filename or "file",
-        type=FileNodeType.FILE,
-        mime_type=file.content_type,
-        size=str(len(data)),
-        storage_path=object_name,
+    node = await add_file_node(
+        db, project_id, parent, file.filename or "file", stored.object_name, stored.size,
+        mime_type=file.content_type, checksum=stored.sha256
     )
-    db.add(node)
-    db.commit()
-    db.refresh(node)
+    if not stored.deduplicated:
+        # Renditions are keyed by object, so a duplicate already has them (or gets them on demand)
+        await enqueue_thumbnails(db, node.storage_path, node.mime_type)
+    await commit_or_release(db, [stored.object_name])
+    await db.refresh(node)
+    await publish(project_id, "file.created", _node_event(node))
+    if is_text_file(node.name, node.mime_type):
+        background_tasks.add_task(index_file_text, [node.id])
     return node
 
 
+@router.post(
+    "/project/{project_id}/upload/batch",
+    response_model=BatchUploadResponse,
+    status_code=status.HTTP_201_CREATED,
+    responses={
+        status.HTTP_207_MULTI_STATUS: {"model": BatchUploadResponse, "description": "Some files were skipped or failed"},
+        status.HTTP_400_BAD_REQUEST: {"model": BatchUploadResponse, "description": "Nothing was created"},
+    }
+)
+async def upload_batch(
+    project_id: str,
+    request: Request,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Upload many files, or zip/tar archives expanded server-side, into one folder.
+
+    Multipart fields: any number of file fields, an optional `parent_id`, optional
+    `paths` (one relative path per file, in order, to recreate folders), and
+    `expand_archives` (default true). Folders are created as needed. Files whose
+    name is already taken are skipped. Results are reported per file, and every
+    row is written in one transaction. The status is 201 when every file was
+    created, 207 when some were skipped or failed, and 400 when nothing was.
+    """
+    await check_project_permission(project_id, current_user, db)
+    form = await request.form(max_files=settings.BATCH_UPLOAD_MAX_FILES, max_fields=settings.BATCH_UPLOAD_MAX_FILES + 10)
+    parent = await resolve_parent(db, project_id, form.get('parent_id'))
+    expand = str(form.get('expand_archives', 'true')).lower() not in ('false', '0', 'no')
+    uploads = [value for _, value in form.multi_items() if hasattr(value, 'file')]
+    paths = form.getlist('paths')
+    if not uploads:
+        raise HTTPException(status_code=422, detail="No files uploaded")
+    if paths and len(paths) != len(uploads):
+        raise HTTPException(status_code=422, detail="'paths' must list one path per file")
+
+    entries = []
+    rejected = []
+    budget = [settings.BATCH_UPLOAD_MAX_EXPANDED_BYTES]
+    try:
+        for index, upload in enumerate(uploads):
+            raw_path = paths[index] if paths else (upload.filename or "file")
+            split = split_path(raw_path)
+            if not split:
+                rejected.append(BatchUploadResult(path=raw_path, status="skipped", detail="Unusable file name"))
+                continue
+            folders, name = split
+            if expand and is_archive(name):
+                # Members land in the folder the archive was sent for
+                try:
+                    entries += await asyncio.to_thread(
+                        expand_archive, upload.file, name, folders, budget,
+                        settings.BATCH_UPLOAD_MAX_FILES - len(entries)
+                    )
+                except ValueError as e:
+                    rejected.append(BatchUploadResult(path=raw_path, status="failed", detail=str(e)))
+                continue
+            if len(entries) >= settings.BATCH_UPLOAD_MAX_FILES:
+                raise BatchLimitExceeded("Too many files in batch")
+            entries.append(ImportEntry(folders, name, upload.file, upload.content_type or "application/octet-stream"))
+
+        results, created, folders_created = await import_entries(db, project_id, parent, entries)
+        for node in created:
+            await enqueue_thumbnails(db, node.storage_path, node.mime_type)
+        await commit_or_release(db, [node.storage_path for node in created])
+    except BatchLimitExceeded as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    finally:
+        close_entries(entries)
+
+    if created:
+        await publish(project_id, "files.created", {"ids": [node.id for node in created], "parent_id": parent.id if parent else None})
+    text_ids = [node.id for node in created if is_text_file(node.name, node.mime_type)]
+    if text_ids:
+        background_tasks.add_task(index_file_text, text_ids)
+    results = rejected + results
+    summary = BatchUploadResponse(
+        created=sum(1 for r in results if r.status == "created"),
+        skipped=sum(1 for r in results if r.status == "skipped"),
+        failed=sum(1 for r in results if r.status == "failed"),
+        folders_created=folders_created,
+        results=results,
+    )
+    if not summary.created and not folders_created:
+        response.status_code = status.HTTP_400_BAD_REQUEST
+    elif summary.skipped or summary.failed:
+        response.status_code = status.HTTP_207_MULTI_STATUS
+    return summary
+
+
 @router.get("/{node_id}/download")
 async def download_file(
     node_id: str,
+    request: Request,
+    redirect: bool = Query(False, description="Redirect to a short-lived presigned storage URL instead of proxying"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Download a file node's content.
 
     Returns a streaming response with appropriate Content-Type and Content-Disposition.
-    Notes and folders are not downloadable.
+    Supports a single byte range (206 Partial Content) and conditional requests via
+    ETag/If-None-Match and Last-Modified/If-Modified-Since (304 Not Modified).
+    With redirect=true the client is sent to a presigned MinIO URL and the bytes
+    bypass the API entirely. Notes and folders are not downloadable.
     """
-    node = db.query(FileNode).filter(FileNode.id == node_id).first()
+    node = await db.get(FileNode, node_id)
     if not node:
         raise HTTPException(status_code=404, detail="Node not found")
     if node.type != FileNodeType.FILE:
         raise HTTPException(status_code=400, detail="Only file nodes can be downloaded")
-    check_project_permission(node.project_id, current_user, db)
+    await check_project_permission(node.project_id, current_user, db)
     if not node.storage_path:
         raise HTTPException(status_code=404, detail="Stored object missing")
 
-    # Stream file from MinIO to avoid loading entire content in memory for large files
+    filename = node.name or "download"
+    media_type = node.mime_type or "application/octet-stream"
+    if redirect:
+        url = minio_client.get_presigned_url(
+            node.storage_path,
+            settings.PRESIGNED_DOWNLOAD_EXPIRY_SECONDS,
+            response_headers={
+                "response-content-type": media_type,
+                "response-content-disposition": content_disposition(filename),
+            }
+        )
+        return RedirectResponse(url, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+
     try:
-        # Get object to stream and its stat for size
-        stat = minio_client.client.stat_object(minio_client.bucket_name, node.storage_path)
-        obj = minio_client.client.get_object(minio_client.bucket_name, node.storage_path)
+        stat = await minio_client.stat_file(node.storage_path)
+    except S3Error as e:
+        if e.code == "NoSuchKey":
+            raise HTTPException(status_code=404, detail="Stored object missing")
+        raise HTTPException(status_code=500, detail="Failed to retrieve object")
     except Exception:
         raise HTTPException(status_code=500, detail="Failed to retrieve object")
 
-    def iterfile():
-        try:
-            for data in obj.stream(32 * 1024):
-                yield data
-        finally:
-            obj.close()
-            obj.release_conn()
+    headers = validator_headers(stat)
+    if is_not_modified(request, stat):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
 
-    filename = node.name or "download"
-    media_type = node.mime_type or "application/octet-stream"
-    headers = {
-        "Content-Disposition": f"attachment; filename=\"{filename}\"",
-        "Content-Length": str(getattr(stat, 'size', '') or '')
-    }
-    return StreamingResponse(iterfile(), media_type=media_type, headers=headers)
+    byte_range = requested_range(request, stat)
+    headers["Content-Disposition"] = content_disposition(filename)
+
+    # Ranged reads are passed through to MinIO so only the requested bytes leave storage
+    try:
+        if byte_range:
+            start, end = byte_range
+            obj = await minio_client.open_file(node.storage_path, offset=start, length=end - start + 1)
+        else:
+            obj = await minio_client.open_file(node.storage_path)
+    except Exception:
+        raise HTTPException(status_code=500, detail="Failed to retrieve object")
+
+    status_code = status.HTTP_200_OK
+    if byte_range:
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{stat.size}"
+        headers["Content-Length"] = str(end - start + 1)
+    else:
+        headers["Content-Length"] = str(stat.size)
+    return StreamingResponse(
+        minio_client.iter_chunks(obj, settings.DOWNLOAD_CHUNK_SIZE),
+        status_code=status_code,
+        media_type=media_type,
+        headers=headers
+    )
+
+
+@router.get("/{node_id}/archive")
+async def download_archive(
+    node_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Stream a folder and everything below it as a zip, built on the fly"""
+    node = await db.get(FileNode, node_id)
+    if not node:
+        raise HTTPException(status_code=404, detail="Node not found")
+    if node.type != FileNodeType.FOLDER:
+        raise HTTPException(status_code=400, detail="Only folders can be archived; download files directly")
+    await check_project_permission(node.project_id, current_user, db)
+
+    nodes = (await db.scalars(select(FileNode).where(in_subtree(node)))).all()
+    entries = archive_entries(nodes, node, node.name)
+    return StreamingResponse(
+        stream_zip(entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": content_disposition(f"{node.name}.zip")}
+    )
+
+
+@router.get("/{node_id}/thumbnail")
+async def get_thumbnail(
+    node_id: str,
+    size: int = Query(256, ge=1, le=4096),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """WebP thumbnail of an image file, at the smallest rendition covering `size` pixels.
+
+    Renditions are normally produced right after upload; one that is missing
+    (older files, or a request racing the upload) is generated on demand.
+    """
+    node = await db.get(FileNode, node_id)
+    if not node:
+        raise HTTPException(status_code=404, detail="Node not found")
+    if node.type != FileNodeType.FILE or not node.storage_path:
+        raise HTTPException(status_code=400, detail="Only file nodes have thumbnails")
+    await check_project_permission(node.project_id, current_user, db)
+    if not is_renderable(node.mime_type):
+        raise HTTPException(status_code=415, detail="No thumbnail available for this file type")
+
+    key = thumbnail_key(node.storage_path, closest_size(size))
+    content = await minio_client.get_file(key)
+    if content is None and await generate_thumbnails(node.storage_path, node.mime_type):
+        content = await minio_client.get_file(key)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Thumbnail could not be generated")
+
+    return Response(
+        content=content,
+        media_type=THUMBNAIL_MIME_TYPE,
+        headers={"Cache-Control": "private, max-age=86400"}
+    )
 
 
 @router.put("/{node_id}/content", response_model=FileNodeBase)
 async def replace_file_content(
     node_id: str,
     request: Request,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Replace the bytes of a file node while preserving its name and extension.
 
     Accepts multipart/form-data with a 'file' field. Updates mime_type and size. Denies locked nodes.
     """
-    node = db.query(FileNode).filter(FileNode.id == node_id).first()
+    node = await db.get(FileNode, node_id)
     if not node:
         raise HTTPException(status_code=404, detail="Node not found")
     if node.type != FileNodeType.FILE:
         raise HTTPException(status_code=400, detail="Only file nodes can be replaced")
-    check_project_permission(node.project_id, current_user, db)
+    await check_project_permission(node.project_id, current_user, db)
     if node.is_locked:
         raise HTTPException(status_code=400, detail="This node cannot be modified")
 
@@ -302,38 +575,60 @@ async def replace_file_content(
     if not new_file:
         raise HTTPException(status_code=422, detail="No file provided")
 
-    # Read new content
-    data = await new_file.read()
-    if not node.storage_path:
-        # Assign a storage path if missing (shouldn't happen for files, but safe-guard)
-        node.storage_path = f"files/{node.project_id}/{uuid.uuid4()}"
-
-    # Upload (overwrite) to same object path
-    await minio_client.upload_file(data, node.storage_path, new_file.content_type or node.mime_type or "application/octet-stream")
+    content_type = new_file.content_type or node.mime_type or "application/octet-stream"
+    note = None
+    if node.parent_id:
+        parent = await db.get(FileNode, node.parent_id)
+        if parent and parent.name == "Notes":
+            # This is a file in the Notes folder, check if it's linked to a note
+            note = await _linked_note(db, node.id)
+
+    stale_objects = []
+    if note:
+        # Note backing files are rewritten in place by the notes API, so they never share a blob
+        if not node.storage_path or is_blob_key(node.storage_path):
+            stale_objects = await release_objects(db, [(node.storage_path, node.mime_type)])
+            node.storage_path = f"notes/{node.project_id}/{note.id}.txt"
+        stored = await minio_client.upload_stream(new_file.file, node.storage_path, content_type)
+        node.storage_etag = stored.etag
+        await remember_version(node.storage_path, stored.etag)
+    else:
+        stored = await store_blob(db, new_file.file, content_type)
+        # Dropping the old reference after taking the new one keeps unchanged content alive
+        stale_objects = await release_objects(db, [(node.storage_path, node.mime_type)])
+        node.storage_path = stored.object_name
+    size, checksum = stored.size, stored.sha256
 
     # Update metadata
     node.mime_type = new_file.content_type or node.mime_type
-    node.size = str(len(data))
+    await adjust_ancestor_totals(db, node.path, 0, size - (node.size or 0))
+    node.size = size
+    node.checksum = checksum
+    node.extracted_text = None  # searchable text is read again from the new object
     node.updated_at = datetime.utcnow()
     
     # If this is a note file, sync the note content
-    if node.parent_id:
-        parent = db.query(FileNode).filter(FileNode.id == node.parent_id).first()
-        if parent and parent.name == "Notes":
-            # This is a file in the Notes folder, check if it's linked to a note
-            note_link = db.query(NoteFileLink).filter(NoteFileLink.file_node_id == node.id).first()
-            if note_link and note_link.note:
-                # Update the note content from the file
-                try:
-                    note_link.note.content = data.decode('utf-8')
-                    filename = node.name
-                    if filename.endswith('.txt'):
-                        note_link.note.title = filename[:-4]  # Remove .txt extension
-                    note_link.note.updated_at = datetime.utcnow()
-                except UnicodeDecodeError:
-                    # If file is not valid UTF-8, don't update note
-                    pass
+    if note:
+        # Update the note content from the file (note files are small text, re-read the spool)
+        try:
+            new_file.file.seek(0)
+            note.content = new_file.file.read().decode('utf-8')
+            filename = node.name
+            if filename.endswith('.txt'):
+                note.title = filename[:-4]  # Remove .txt extension
+            note.updated_at = datetime.utcnow()
+        except UnicodeDecodeError:
+            # If file is not valid UTF-8, don't update note
+            pass
     
-    db.commit()
-    db.refresh(node)
+    await enqueue_purge(db, stale_objects)
+    # Renditions are keyed by the stored object, so regenerating overwrites any stale ones
+    await enqueue_thumbnails(db, node.storage_path, node.mime_type)
+    await commit_or_release(db, [] if note else [node.storage_path])
+    await db.refresh(node)
+    await publish(node.project_id, "file.updated", _node_event(node))
+    if note:
+        await publish(node.project_id, "note.updated", {"id": note.id, "title": note.title, "updated_at": note.updated_at})
+    if is_text_file(node.name, node.mime_type):
+        background_tasks.add_task(index_file_text, [node.id])
     return node
\ No newline at end of file
@@ -1,114 +1,341 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status, UploadFile, File
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import List, Optional, Set, Tuple, Union
 from app.database import get_db
 from app.dependencies import get_current_user, check_project_permission
-from app.models import User, Note, NoteAttachment, FileNode, FileNodeType, NoteFileLink
-from app.schemas import NoteCreate, NoteUpdate, NoteResponse
-from app.minio_client import minio_client
+from app.models import User, Note, NoteAttachment, FileNode, NoteFileLink
+from app.schemas import (
+    NoteCreate, NoteUpdate, NoteResponse, NoteAttachmentResponse, NoteSummaryResponse, NoteBatchCreate,
+    NoteBatchResponse, NoteBatchResult, NoteBatchUpdate, NoteProjection
+)
+from app.minio_client import minio_client, normalize_etag, presigned_url_cache
+from app.note_storage import (
+    apply_note_update, apply_note_updates, commit_or_discard, create_note_record, create_note_records, note_event,
+    note_file_node, note_object_key, remember_version, remove_note, sign_attachments, sync_note_text
+)
+from app.events import publish
+from app.object_cleanup import schedule_and_purge
 from datetime import datetime
+import base64
+import json
 import uuid
 
 router = APIRouter(prefix="/notes", tags=["notes"])
 
+# Newest first; id breaks ties so keyset pages never skip or repeat a note
+NOTE_ORDER = (Note.updated_at.desc(), Note.id)
+
+# Columns a listing can be projected to with ?fields=
+NOTE_FIELDS = ("id", "title", "content", "project_id", "author_id", "created_at", "updated_at", "last_synced", "attachments")
+
+
+async def _get_note(db: AsyncSession, note_id: str) -> Optional[Note]:
+    """Load a note with its attachments (responses always serialize them)"""
+    return await db.scalar(
+        select(Note)
+        .options(selectinload(Note.attachments))
+        .where(Note.id == note_id)
+        .execution_options(populate_existing=True)
+    )
+
+
+def encode_note_cursor(updated_at: datetime, note_id: str) -> str:
+    raw = json.dumps([updated_at.isoformat(), note_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_note_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        updated_at, note_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(updated_at), note_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _note_filters(
+    project_id: str,
+    cursor: Optional[str],
+    author_id: Optional[str],
+    updated_after: Optional[datetime],
+    updated_before: Optional[datetime],
+    title_prefix: Optional[str]
+) -> list:
+    """WHERE clauses of a note listing; the cursor resumes after the last note received"""
+    where = [Note.project_id == project_id]
+    if cursor:
+        updated_at, note_id = decode_note_cursor(cursor)
+        # Mixed sort directions rule out a row comparison; this form still walks ix_notes_project_updated
+        where.append(or_(
+            Note.updated_at < updated_at,
+            and_(Note.updated_at == updated_at, Note.id > note_id)
+        ))
+    if author_id:
+        where.append(Note.author_id == author_id)
+    if updated_after:
+        where.append(Note.updated_at >= updated_after)
+    if updated_before:
+        where.append(Note.updated_at < updated_before)
+    if title_prefix:
+        where.append(Note.title.istartswith(title_prefix, autoescape=True))
+    return where
+
+
+def _parse_fields(fields: Optional[str]) -> Optional[Set[str]]:
+    """Requested projection (id always included), or None for full notes"""
+    if not fields:
+        return None
+    wanted = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = wanted - set(NOTE_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}. Allowed: {', '.join(NOTE_FIELDS)}"
+        )
+    return wanted | {"id"}
+
+
+def _mappings(db: AsyncSession):
+    async def run(stmt):
+        return (await db.execute(stmt)).mappings()
+    return run
+
+
+async def _page(run, stmt, limit: Optional[int], key) -> Tuple[list, Optional[str]]:
+    """Run a listing with one extra row to tell whether another page follows"""
+    if limit is None:
+        return (await run(stmt)).all(), None
+    rows = (await run(stmt.limit(limit + 1))).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_note_cursor(*key(rows[-1]))
+
 
 @router.post("/", response_model=NoteResponse, status_code=status.HTTP_201_CREATED)
 async def create_note(
     note_data: NoteCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new note in a project"""
-    check_project_permission(note_data.project_id, current_user, db)
-    
-    # Ensure Notes folder exists
-    notes_folder = db.query(FileNode).filter(
-        FileNode.project_id == note_data.project_id,
-        FileNode.parent_id == None,
-        FileNode.name == "Notes",
-        FileNode.type == FileNodeType.FOLDER
-    ).first()
-    if not notes_folder:
-        notes_folder = FileNode(
-            project_id=note_data.project_id,
-            parent_id=None,
-            name="Notes",
-            type=FileNodeType.FOLDER,
-            is_locked=True,
-        )
-        db.add(notes_folder)
-        db.commit()
-        db.refresh(notes_folder)
-    
-    # Create note in database (for backwards compatibility and metadata)
-    note = Note(
-        title=note_data.title,
-        content=note_data.content,
-        project_id=note_data.project_id,
-        author_id=current_user.id
-    )
+    await check_project_permission(note_data.project_id, current_user, db)
     
-    db.add(note)
-    db.commit()
-    db.refresh(note)
-    
-    # Store note content as a txt file in MinIO
-    filename = f"{note_data.title}.txt"
-    content_bytes = (note_data.content or '').encode('utf-8')
-    storage_path = f"notes/{note_data.project_id}/{note.id}.txt"
-    
-    await minio_client.upload_file(content_bytes, storage_path, "text/plain")
-    
-    # Create file node pointing to the txt file
-    note_node = FileNode(
-        project_id=note_data.project_id,
-        parent_id=notes_folder.id,
-        name=filename,
-        type=FileNodeType.FILE,
-        mime_type="text/plain",
-        size=str(len(content_bytes)),
-        storage_path=storage_path,
-        is_locked=False,  # Allow editing as regular file
-    )
-    db.add(note_node)
-    db.commit()
-    db.refresh(note_node)
-
-    # Link note to file node
-    link = NoteFileLink(note_id=note.id, file_node_id=note_node.id)
-    db.add(link)
-    db.commit()
+    # One transaction for the folder, note, file node and link; the object is removed if it fails
+    try:
+        note = await create_note_record(db, note_data.project_id, current_user.id, note_data.title, note_data.content)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    await commit_or_discard(db, [note_object_key(note.project_id, note.id)])
+    await publish(note.project_id, "note.created", note_event(note))
     
     return note
 
 
-@router.get("/project/{project_id}", response_model=List[NoteResponse])
+def _batch_response(results: List[NoteBatchResult]) -> NoteBatchResponse:
+    succeeded = sum(1 for r in results if r.status in ("created", "updated"))
+    return NoteBatchResponse(succeeded=succeeded, failed=len(results) - succeeded, results=results)
+
+
+@router.post("/batch", response_model=NoteBatchResponse, status_code=status.HTTP_201_CREATED)
+async def create_notes_batch(
+    batch: NoteBatchCreate,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Create many notes in one project at once.
+
+    The .txt objects are written concurrently and every row goes in with one
+    flush and one commit. A note whose title is taken or whose object could not
+    be written is reported as failed; the others are still created.
+    """
+    await check_project_permission(batch.project_id, current_user, db)
+
+    created = await create_note_records(
+        db, batch.project_id, current_user.id, [(item.title, item.content) for item in batch.notes]
+    )
+    notes = [note for note in created if isinstance(note, Note)]
+    await commit_or_discard(db, [note_object_key(note.project_id, note.id) for note in notes])
+    if notes:
+        await publish(batch.project_id, "notes.created", {"ids": [note.id for note in notes]})
+
+    return _batch_response([
+        NoteBatchResult(index=index, status="created", note=NoteResponse.model_validate(note))
+        if isinstance(note, Note) else NoteBatchResult(index=index, status="failed", detail=str(note))
+        for index, note in enumerate(created)
+    ])
+
+
+@router.patch("/batch", response_model=NoteBatchResponse)
+async def update_notes_batch(
+    batch: NoteBatchUpdate,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Update many notes at once, in one transaction.
+
+    Notes are loaded with their file nodes in one query and permissions are
+    checked once per project. Text files are rewritten by queued jobs after the
+    commit, as with PUT /notes/{id}. Missing notes, notes in projects the user
+    cannot edit and taken titles are reported per item.
+    """
+    ids = [item.id for item in batch.notes]
+    rows = (await db.execute(
+        select(Note, FileNode)
+        .options(selectinload(Note.attachments))
+        .outerjoin(NoteFileLink, NoteFileLink.note_id == Note.id)
+        .outerjoin(FileNode, FileNode.id == NoteFileLink.file_node_id)
+        .where(Note.id.in_(ids))
+    )).all()
+    found = {note.id: (note, file_node) for note, file_node in rows}
+
+    allowed = set()
+    for project_id in {note.project_id for note, _ in found.values()}:
+        try:
+            await check_project_permission(project_id, current_user, db)
+            allowed.add(project_id)
+        except HTTPException:
+            pass
+
+    results: List[Optional[NoteBatchResult]] = [None] * len(ids)
+    updates, positions, seen = [], [], set()
+    for index, item in enumerate(batch.notes):
+        if item.id not in found:
+            results[index] = NoteBatchResult(index=index, status="not_found", detail="Note not found")
+        elif found[item.id][0].project_id not in allowed:
+            results[index] = NoteBatchResult(index=index, status="forbidden", detail="Not a member of this project")
+        elif item.id in seen:
+            results[index] = NoteBatchResult(index=index, status="failed", detail="Note appears more than once in the batch")
+        else:
+            seen.add(item.id)
+            note, file_node = found[item.id]
+            updates.append((note, file_node, item.title, item.content))
+            positions.append(index)
+
+    errors = await apply_note_updates(db, updates)
+    await db.commit()
+
+    applied = [note for (note, _, _, _), error in zip(updates, errors) if not error]
+    await sign_attachments(applied)
+    for index, (note, _, _, _), error in zip(positions, updates, errors):
+        results[index] = (
+            NoteBatchResult(index=index, status="failed", detail=str(error)) if error
+            else NoteBatchResult(index=index, status="updated", note=NoteResponse.model_validate(note))
+        )
+
+    for project_id in {note.project_id for note in applied}:
+        await publish(project_id, "notes.updated", {"ids": [note.id for note in applied if note.project_id == project_id]})
+    return _batch_response(results)
+
+
+@router.get(
+    "/project/{project_id}",
+    response_model=Union[List[NoteResponse], List[NoteProjection]],
+    response_model_exclude_unset=True
+)
 async def get_project_notes(
     project_id: str,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    author_id: Optional[str] = None,
+    updated_after: Optional[datetime] = None,
+    updated_before: Optional[datetime] = None,
+    title_prefix: Optional[str] = None,
+    fields: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get all notes for a project"""
-    check_project_permission(project_id, current_user, db)
-    
-    notes = db.query(Note).filter(Note.project_id == project_id).order_by(Note.updated_at.desc()).all()
-    
-    # Add presigned URLs to attachments
-    for note in notes:
-        for attachment in note.attachments:
-            attachment.url = minio_client.get_presigned_url(attachment.file_path)
-    
-    return notes
+    """Get the notes of a project, most recently updated first.
+
+    With a limit, X-Next-Cursor is set when more notes remain. `fields` is a
+    comma-separated projection (e.g. fields=id,title,updated_at); only those
+    columns are read and returned, and attachments are signed only when listed.
+    """
+    await check_project_permission(project_id, current_user, db)
+    wanted = _parse_fields(fields)
+    where = _note_filters(project_id, cursor, author_id, updated_after, updated_before, title_prefix)
+    
+    if wanted is None:
+        # Attachments for the whole page come in one extra IN query
+        stmt = select(Note).options(selectinload(Note.attachments)).where(*where).order_by(*NOTE_ORDER)
+        notes, next_cursor = await _page(db.scalars, stmt, limit, lambda n: (n.updated_at, n.id))
+        await sign_attachments(notes)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return notes
+    
+    columns = [getattr(Note, name) for name in NOTE_FIELDS if name in wanted and name != "attachments"]
+    stmt = select(*columns, Note.updated_at.label("_updated_at")).where(*where).order_by(*NOTE_ORDER)
+    rows, next_cursor = await _page(_mappings(db), stmt, limit, lambda r: (r["_updated_at"], r["id"]))
+    items = [{name: row[name] for name in NOTE_FIELDS if name in wanted and name != "attachments"} for row in rows]
+    
+    if "attachments" in wanted and items:
+        attachments = (await db.scalars(
+            select(NoteAttachment)
+            .where(NoteAttachment.note_id.in_([item["id"] for item in items]))
+            .order_by(NoteAttachment.uploaded_at)
+        )).all()
+        urls = await minio_client.presigned_urls(a.file_path for a in attachments)
+        by_note = {item["id"]: item for item in items}
+        for item in items:
+            item["attachments"] = []
+        for attachment in attachments:
+            attachment.url = urls[attachment.file_path]
+            by_note[attachment.note_id]["attachments"].append(NoteAttachmentResponse.model_validate(attachment))
+    
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
+
+
+@router.get("/project/{project_id}/summary", response_model=List[NoteSummaryResponse])
+async def get_project_note_summaries(
+    project_id: str,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    author_id: Optional[str] = None,
+    updated_after: Optional[datetime] = None,
+    updated_before: Optional[datetime] = None,
+    title_prefix: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Lightweight note list: no content and no signed URLs, only attachment counts"""
+    await check_project_permission(project_id, current_user, db)
+    
+    attachment_count = (
+        select(func.count())
+        .where(NoteAttachment.note_id == Note.id)
+        .correlate(Note)
+        .scalar_subquery()
+    )
+    stmt = (
+        select(
+            Note.id, Note.title, Note.project_id, Note.author_id,
+            Note.created_at, Note.updated_at, Note.last_synced,
+            attachment_count.label("attachment_count")
+        )
+        .where(*_note_filters(project_id, cursor, author_id, updated_after, updated_before, title_prefix))
+        .order_by(*NOTE_ORDER)
+    )
+    rows, next_cursor = await _page(_mappings(db), stmt, limit, lambda r: (r["updated_at"], r["id"]))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [NoteSummaryResponse(**row) for row in rows]
 
 
 @router.get("/{note_id}", response_model=NoteResponse)
 async def get_note(
     note_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get a specific note"""
-    note = db.query(Note).filter(Note.id == note_id).first()
+    note = await _get_note(db, note_id)
     
     if not note:
         raise HTTPException(
@@ -116,29 +343,20 @@ async def get_note(
             detail="Note not found"
         )
     
-    check_project_permission(note.project_id, current_user, db)
+    await check_project_permission(note.project_id, current_user, db)
     
-    # Try to sync content from txt file if it exists
-    file_link = db.query(NoteFileLink).filter(NoteFileLink.note_id == note_id).first()
-    if file_link and file_link.file_node and file_link.file_node.storage_path:
+    # Pick up edits made to the txt file outside the notes API (refetched only when its ETag moved)
+    file_node = await note_file_node(db, note_id)
+    if file_node and file_node.storage_path:
         try:
-            # Get content from txt file
-            file_data = await minio_client.get_file(file_link.file_node.storage_path)
-            file_content = file_data.decode('utf-8')
-            
-            # Update note content if it differs (file was edited externally)
-            if note.content != file_content:
-                note.content = file_content
-                note.updated_at = datetime.utcnow()
-                db.commit()
-                db.refresh(note)
+            if await sync_note_text(note, file_node):
+                await db.commit()
         except Exception as e:
             # If file doesn't exist or can't be read, keep database content
             print(f"Warning: Could not sync note {note_id} from file: {e}")
     
     # Add presigned URLs to attachments
-    for attachment in note.attachments:
-        attachment.url = minio_client.get_presigned_url(attachment.file_path)
+    await sign_attachments([note])
     
     return note
 
@@ -148,10 +366,10 @@ async def update_note(
     note_id: str,
     note_data: NoteUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a note"""
-    note = db.query(Note).filter(Note.id == note_id).first()
+    note = await _get_note(db, note_id)
     
     if not note:
         raise HTTPException(
@@ -159,33 +377,15 @@ async def update_note(
             detail="Note not found"
         )
     
-    check_project_permission(note.project_id, current_user, db)
+    await check_project_permission(note.project_id, current_user, db)
     
-    # Get the linked file node
-    file_link = db.query(NoteFileLink).filter(NoteFileLink.note_id == note_id).first()
-    file_node = file_link.file_node if file_link else None
-    
-    # Update fields
-    if note_data.title is not None:
-        note.title = note_data.title
-        # Update filename in file node
-        if file_node:
-            file_node.name = f"{note_data.title}.txt"
-            file_node.updated_at = datetime.utcnow()
-            
-    if note_data.content is not None:
-        note.content = note_data.content
-        # Update txt file content in MinIO
-        if file_node and file_node.storage_path:
-            content_bytes = (note_data.content or '').encode('utf-8')
-            await minio_client.upload_file(content_bytes, file_node.storage_path, "text/plain")
-            file_node.size = str(len(content_bytes))
-            file_node.updated_at = datetime.utcnow()
-    
-    note.updated_at = datetime.utcnow()
-    
-    db.commit()
-    db.refresh(note)
+    try:
+        await apply_note_update(db, note, note_data.title, note_data.content)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    
+    await db.commit()
+    await publish(note.project_id, "note.updated", note_event(note))
     
     return note
 
@@ -194,10 +394,10 @@ async def update_note(
 async def sync_note_from_file(
     note_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Sync note content from its associated txt file"""
-    note = db.query(Note).filter(Note.id == note_id).first()
+    note = await _get_note(db, note_id)
     
     if not note:
         raise HTTPException(
@@ -205,30 +405,33 @@ async def sync_note_from_file(
             detail="Note not found"
         )
     
-    check_project_permission(note.project_id, current_user, db)
+    await check_project_permission(note.project_id, current_user, db)
     
     # Get the linked file node
-    file_link = db.query(NoteFileLink).filter(NoteFileLink.note_id == note_id).first()
-    if not file_link or not file_link.file_node or not file_link.file_node.storage_path:
+    file_node = await note_file_node(db, note_id)
+    if not file_node or not file_node.storage_path:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No associated txt file found"
         )
     
     try:
-        # Get content from txt file
-        file_data = await minio_client.get_file(file_link.file_node.storage_path)
+        # Get content from txt file, recording the version read
+        stat = await minio_client.stat_file(file_node.storage_path)
+        file_data = await minio_client.get_file(file_node.storage_path)
         file_content = file_data.decode('utf-8')
+        file_node.storage_etag = normalize_etag(stat.etag)
+        await remember_version(file_node.storage_path, stat.etag)
         
         # Update note content and title from filename
         note.content = file_content
-        filename = file_link.file_node.name
+        filename = file_node.name
         if filename.endswith('.txt'):
             note.title = filename[:-4]  # Remove .txt extension
         note.updated_at = datetime.utcnow()
         
-        db.commit()
-        db.refresh(note)
+        await db.commit()
+        await publish(note.project_id, "note.updated", note_event(note))
         
         return note
         
@@ -243,10 +446,10 @@ async def sync_note_from_file(
 async def delete_note(
     note_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a note"""
-    note = db.query(Note).filter(Note.id == note_id).first()
+    note = await _get_note(db, note_id)
     
     if not note:
         raise HTTPException(
@@ -254,24 +457,15 @@ async def delete_note(
             detail="Note not found"
         )
     
-    check_project_permission(note.project_id, current_user, db)
+    await check_project_permission(note.project_id, current_user, db)
     
     # Only author or project leader can delete
     if note.author_id != current_user.id:
-        check_project_permission(note.project_id, current_user, db, required_role="leader")
-    
-    # Delete txt file from MinIO
-    file_link = db.query(NoteFileLink).filter(NoteFileLink.note_id == note_id).first()
-    if file_link and file_link.file_node and file_link.file_node.storage_path:
-        await minio_client.delete_file(file_link.file_node.storage_path)
-        db.delete(file_link.file_node)
+        await check_project_permission(note.project_id, current_user, db, required_role="leader")
     
-    # Delete attachments from MinIO
-    for attachment in note.attachments:
-        await minio_client.delete_file(attachment.file_path)
-    
-    db.delete(note)
-    db.commit()
+    await remove_note(db, note)
+    await db.commit()
+    await publish(note.project_id, "note.deleted", {"id": note.id})
     
     return None
 
@@ -281,10 +475,10 @@ async def add_note_attachment(
     note_id: str,
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Add an attachment (photo) to a note"""
-    note = db.query(Note).filter(Note.id == note_id).first()
+    note = await db.get(Note, note_id)
     
     if not note:
         raise HTTPException(
@@ -292,7 +486,7 @@ async def add_note_attachment(
             detail="Note not found"
         )
     
-    check_project_permission(note.project_id, current_user, db)
+    await check_project_permission(note.project_id, current_user, db)
     
     # Validate file type
     allowed_types = ["image/jpeg", "image/png", "image/jpg", "image/heic"]
@@ -323,11 +517,11 @@ async def add_note_attachment(
     )
     
     db.add(attachment)
-    db.commit()
-    db.refresh(attachment)
+    await db.commit()
+    await publish(note.project_id, "note.attachment_added", {"note_id": note_id, "attachment_id": attachment.id})
     
     # Add presigned URL
-    attachment.url = minio_client.get_presigned_url(file_path)
+    attachment.url = (await minio_client.presigned_urls([file_path]))[file_path]
     
     return attachment
 
@@ -337,10 +531,10 @@ async def delete_note_attachment(
     note_id: str,
     attachment_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete an attachment from a note"""
-    note = db.query(Note).filter(Note.id == note_id).first()
+    note = await db.get(Note, note_id)
     
     if not note:
         raise HTTPException(
@@ -348,12 +542,12 @@ async def delete_note_attachment(
             detail="Note not found"
         )
     
-    check_project_permission(note.project_id, current_user, db)
+    await check_project_permission(note.project_id, current_user, db)
     
-    attachment = db.query(NoteAttachment).filter(
+    attachment = await db.scalar(select(NoteAttachment).where(
         NoteAttachment.id == attachment_id,
         NoteAttachment.note_id == note_id
-    ).first()
+    ))
     
     if not attachment:
         raise HTTPException(
@@ -361,11 +555,11 @@ async def delete_note_attachment(
             detail="Attachment not found"
         )
     
-    # Delete from MinIO
-    await minio_client.delete_file(attachment.file_path)
-    
-    # Delete from database
-    db.delete(attachment)
-    db.commit()
+    # The object is removed by a queued job once the row is gone
+    await schedule_and_purge(db, [attachment.file_path])
+    await db.delete(attachment)
+    await db.commit()
+    await presigned_url_cache.invalidate(attachment.file_path)
+    await publish(note.project_id, "note.attachment_deleted", {"note_id": note_id, "attachment_id": attachment_id})
     
     return None
@@ -1,14 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List
 from app.database import get_db
-from app.dependencies import get_current_user, check_project_permission
-from app.models import User, Project, project_members, FileNode, FileNodeType
+from app.dependencies import get_current_user, check_project_permission, invalidate_project_permissions
+from app.events import publish
+from app.models import User, UserRole, Project, project_members, FileNode, FileNodeType, Note, NoteAttachment
+from app.object_cleanup import enqueue_purge, schedule_object_deletion
+from app.file_tree import assign_path
+from app.archives import archive_entries, stream_zip
+from app.downloads import content_disposition
+from app.blobs import release_objects
 from app.schemas import (
     ProjectCreate, ProjectResponse, ProjectWithMembers,
     ProjectMemberAdd, ProjectMemberUpdate, UserResponse
 )
-from sqlalchemy import select
+from sqlalchemy import delete, select
 
 router = APIRouter(prefix="/projects", tags=["projects"])
 
@@ -17,7 +25,7 @@ router = APIRouter(prefix="/projects", tags=["projects"])
 async def create_project(
     project_data: ProjectCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new archaeological site project"""
     project = Project(
@@ -25,25 +33,27 @@ async def create_project(
         description=project_data.description,
         owner_id=current_user.id
     )
-    
     db.add(project)
-    db.commit()
-    db.refresh(project)
-    
-    # Add the owner as a member with leader role
-    project.members.append(current_user)
-    db.commit()
 
     # Create default Files root folders: Notes (locked)
     notes_folder = FileNode(
-        project_id=project.id,
+        project=project,
         parent_id=None,
         name="Notes",
         type=FileNodeType.FOLDER,
         is_locked=True,
     )
+    assign_path(notes_folder, None)
     db.add(notes_folder)
-    db.commit()
+    await db.flush()
+
+    # Add the owner as a member with leader role; everything commits together
+    await db.execute(project_members.insert().values(
+        project_id=project.id,
+        user_id=current_user.id,
+        role=UserRole.LEADER
+    ))
+    await db.commit()
     
     return project
 
@@ -51,20 +61,20 @@ async def create_project(
 @router.get("/", response_model=List[ProjectResponse])
 async def get_projects(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get all projects the user has access to"""
     # Get owned projects
-    owned = db.query(Project).filter(Project.owner_id == current_user.id).all()
+    owned = (await db.scalars(select(Project).where(Project.owner_id == current_user.id))).all()
     
     # Get projects where user is a member
     stmt = select(Project).join(project_members).where(
         project_members.c.user_id == current_user.id
     )
-    member_projects = db.execute(stmt).scalars().all()
+    member_projects = (await db.scalars(stmt)).all()
     
     # Combine and deduplicate
-    all_projects = {p.id: p for p in owned + list(member_projects)}
+    all_projects = {p.id: p for p in list(owned) + list(member_projects)}
     
     return list(all_projects.values())
 
@@ -73,14 +83,17 @@ async def get_projects(
 async def get_project(
     project_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Get project details with members"""
-    from sqlalchemy.orm import joinedload
-    
-    check_project_permission(project_id, current_user, db)
+    await check_project_permission(project_id, current_user, db)
     
-    project = db.query(Project).options(joinedload(Project.members)).filter(Project.id == project_id).first()
+    project = await db.scalar(
+        select(Project)
+        .options(selectinload(Project.members))
+        .where(Project.id == project_id)
+        .execution_options(populate_existing=True)
+    )
     
     if not project:
         raise HTTPException(
@@ -96,10 +109,10 @@ async def update_project(
     project_id: str,
     project_data: ProjectCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update project details (owner only)"""
-    project = db.query(Project).filter(Project.id == project_id).first()
+    project = await db.get(Project, project_id)
     
     if not project:
         raise HTTPException(
@@ -116,8 +129,9 @@ async def update_project(
     project.name = project_data.name
     project.description = project_data.description
     
-    db.commit()
-    db.refresh(project)
+    await db.commit()
+    await db.refresh(project)
+    await publish(project_id, "project.updated", {"name": project.name, "description": project.description})
     
     return project
 
@@ -126,10 +140,10 @@ async def update_project(
 async def delete_project(
     project_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a project (owner only)"""
-    project = db.query(Project).filter(Project.id == project_id).first()
+    project = await db.get(Project, project_id)
     
     if not project:
         raise HTTPException(
@@ -143,8 +157,23 @@ async def delete_project(
             detail="Only the project owner can delete the project"
         )
     
-    db.delete(project)
-    db.commit()
+    # Queue every stored object of the project for removal with the rows
+    files = (await db.execute(
+        select(FileNode.storage_path, FileNode.mime_type)
+        .where(FileNode.project_id == project_id, FileNode.storage_path != None)
+    )).all()
+    attachment_paths = await db.scalars(
+        select(NoteAttachment.file_path).join(Note).where(Note.project_id == project_id)
+    )
+    object_names = await release_objects(db, files)
+    object_names += await schedule_object_deletion(db, attachment_paths)
+    await enqueue_purge(db, object_names)
+    
+    # Every child table cascades at the database level, so one statement removes the project
+    await db.execute(delete(Project).where(Project.id == project_id))
+    await db.commit()
+    await invalidate_project_permissions(project_id)
+    await publish(project_id, "project.deleted")
     
     return None
 
@@ -154,13 +183,13 @@ async def add_project_member(
     project_id: str,
     member_data: ProjectMemberAdd,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Add a member to the project (leader/owner only)"""
-    check_project_permission(project_id, current_user, db, required_role="leader")
+    await check_project_permission(project_id, current_user, db, required_role="leader")
     
     # Check if user exists
-    user = db.query(User).filter(User.id == member_data.user_id).first()
+    user = await db.get(User, member_data.user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -172,7 +201,7 @@ async def add_project_member(
         project_members.c.project_id == project_id,
         project_members.c.user_id == member_data.user_id
     )
-    existing = db.execute(stmt).first()
+    existing = (await db.execute(stmt)).first()
     
     if existing:
         raise HTTPException(
@@ -186,8 +215,10 @@ async def add_project_member(
         user_id=member_data.user_id,
         role=member_data.role
     )
-    db.execute(stmt)
-    db.commit()
+    await db.execute(stmt)
+    await db.commit()
+    await invalidate_project_permissions(project_id, member_data.user_id)
+    await publish(project_id, "member.added", {"user_id": member_data.user_id, "role": member_data.role.value})
     
     return user
 
@@ -197,23 +228,25 @@ async def remove_project_member(
     project_id: str,
     user_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Remove a member from the project (leader/owner only)"""
-    check_project_permission(project_id, current_user, db, required_role="leader")
+    await check_project_permission(project_id, current_user, db, required_role="leader")
     
     stmt = project_members.delete().where(
         project_members.c.project_id == project_id,
         project_members.c.user_id == user_id
     )
-    result = db.execute(stmt)
-    db.commit()
+    result = await db.execute(stmt)
+    await db.commit()
+    await invalidate_project_permissions(project_id, user_id)
     
     if result.rowcount == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Member not found in project"
         )
+    await publish(project_id, "member.removed", {"user_id": user_id})
     
     return None
 
@@ -224,23 +257,49 @@ async def update_member_role(
     user_id: str,
     role_data: ProjectMemberUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a member's role (leader/owner only)"""
-    check_project_permission(project_id, current_user, db, required_role="leader")
+    await check_project_permission(project_id, current_user, db, required_role="leader")
     
     stmt = project_members.update().where(
         project_members.c.project_id == project_id,
         project_members.c.user_id == user_id
     ).values(role=role_data.role)
     
-    result = db.execute(stmt)
-    db.commit()
+    result = await db.execute(stmt)
+    await db.commit()
+    await invalidate_project_permissions(project_id, user_id)
     
     if result.rowcount == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Member not found in project"
         )
+    await publish(project_id, "member.role_changed", {"user_id": user_id, "role": role_data.role.value})
     
     return {"message": "Role updated successfully"}
+
+
+@router.get("/{project_id}/archive")
+async def download_project_archive(
+    project_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Stream every file of a project, notes and manifests included, as a zip"""
+    await check_project_permission(project_id, current_user, db)
+    project = await db.get(Project, project_id)
+    if not project:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Project not found"
+        )
+
+    nodes = (await db.scalars(select(FileNode).where(FileNode.project_id == project_id))).all()
+    entries = archive_entries(nodes, None, project.name)
+    return StreamingResponse(
+        stream_zip(entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": content_disposition(f"{project.name}.zip")}
+    )
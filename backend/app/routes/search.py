@@ -0,0 +1,144 @@
+"""Ranked full-text search across a project's notes and files.
+
+Notes match on title (weighted higher) and content, files on name and the
+text extracted from .txt files. Both come from generated tsvector columns
+with GIN indexes, so matching never reads note bodies. Results are ordered
+by ts_rank, then kind and id; the cursor is the (rank, kind, id) of the last
+result received. Snippets are built with ts_headline for the returned page
+only.
+"""
+from typing import List, Optional, Tuple
+import base64
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import Float, and_, cast, exists, func, literal, or_, select, true, union_all
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.dependencies import get_current_user, check_project_permission
+from app.models import SEARCH_CONFIG, FileNode, Note, NoteFileLink, User
+from app.schemas import SearchResult
+
+router = APIRouter(prefix="/projects", tags=["search"])
+
+# <mark> around matches; fragments joined with an ellipsis
+_HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=24, MinWords=8, FragmentDelimiter=\" … \""
+
+
+def _rank(vector, query):
+    # ts_rank is float4, which reaches Python rounded; as float8 the cursor round-trips exactly
+    return cast(func.ts_rank(vector, query), Float)
+
+
+def encode_search_cursor(rank: float, kind: str, item_id: str) -> str:
+    raw = json.dumps([rank, kind, item_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_search_cursor(cursor: str) -> Tuple[float, str, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        rank, kind, item_id = json.loads(base64.urlsafe_b64decode(padded))
+        return float(rank), str(kind), str(item_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/{project_id}/search", response_model=List[SearchResult])
+async def search_project(
+    project_id: str,
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=500),
+    kind: Optional[str] = Query(None, pattern="^(note|file)$"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Search notes and files of a project (web-search syntax: "exact phrase", -exclude, or).
+
+    Snippets wrap matches in <mark>...</mark>. Sets X-Next-Cursor when more results remain.
+    """
+    await check_project_permission(project_id, current_user, db)
+    config = cast(SEARCH_CONFIG, REGCONFIG)
+    query = func.websearch_to_tsquery(config, q)
+
+    branches = []
+    if kind in (None, "note"):
+        branches.append(
+            select(
+                literal("note").label("kind"),
+                Note.id.label("id"),
+                Note.title.label("title"),
+                _rank(Note.search_vector, query).label("rank"),
+                Note.updated_at.label("updated_at"),
+            )
+            .where(Note.project_id == project_id, Note.search_vector.bool_op("@@")(query))
+        )
+    if kind in (None, "file"):
+        # Note backing files are found through their notes
+        branches.append(
+            select(
+                literal("file").label("kind"),
+                FileNode.id.label("id"),
+                FileNode.name.label("title"),
+                _rank(FileNode.search_vector, query).label("rank"),
+                FileNode.updated_at.label("updated_at"),
+            )
+            .where(
+                FileNode.project_id == project_id,
+                FileNode.search_vector.bool_op("@@")(query),
+                ~exists().where(NoteFileLink.file_node_id == FileNode.id),
+            )
+        )
+    hits = (union_all(*branches) if len(branches) > 1 else branches[0]).subquery("hits")
+
+    after = true()
+    if cursor:
+        rank, last_kind, last_id = decode_search_cursor(cursor)
+        after = or_(
+            hits.c.rank < rank,
+            and_(hits.c.rank == rank, or_(
+                hits.c.kind > last_kind,
+                and_(hits.c.kind == last_kind, hits.c.id > last_id)
+            ))
+        )
+    rows = (await db.execute(
+        select(hits)
+        .where(after)
+        .order_by(hits.c.rank.desc(), hits.c.kind, hits.c.id)
+        .limit(limit + 1)
+    )).mappings().all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = encode_search_cursor(last["rank"], last["kind"], last["id"])
+
+    snippets = {}
+    note_ids = [row["id"] for row in rows if row["kind"] == "note"]
+    file_ids = [row["id"] for row in rows if row["kind"] == "file"]
+    if note_ids:
+        snippets.update((("note", i), s) for i, s in await db.execute(
+            select(Note.id, func.ts_headline(config, func.coalesce(Note.content, ""), query, _HEADLINE_OPTIONS))
+            .where(Note.id.in_(note_ids))
+        ))
+    if file_ids:
+        snippets.update((("file", i), s) for i, s in await db.execute(
+            select(FileNode.id, func.ts_headline(config, func.coalesce(FileNode.extracted_text, ""), query, _HEADLINE_OPTIONS))
+            .where(FileNode.id.in_(file_ids))
+        ))
+
+    return [
+        SearchResult(
+            kind=row["kind"],
+            id=row["id"],
+            title=row["title"],
+            snippet=snippets.get((row["kind"], row["id"])) or None,
+            rank=row["rank"],
+            updated_at=row["updated_at"],
+        )
+        for row in rows
+    ]
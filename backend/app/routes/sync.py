@@ -0,0 +1,197 @@
+"""Delta sync for offline-first clients.
+
+GET /projects/{id}/changes returns what changed since a cursor: current
+notes, file nodes and members, and tombstones for deleted ones. A client
+takes a cursor (call without `since`), loads the project once, and from then
+on only polls changes. POST /projects/{id}/changes pushes notes edited
+offline. An edit whose cloud copy moved on since the client last saw it is
+not applied and comes back as a SyncConflict; one refused outright (a title
+already taken) comes back in `rejected`.
+"""
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.change_log import read_changes
+from app.database import get_db
+from app.dependencies import get_current_user, check_project_permission
+from app.models import FileNode, Note, User, project_members
+from app.events import publish
+from app.note_storage import (
+    apply_note_update, commit_or_discard, create_note_record, note_event, note_object_key, remove_note,
+    sign_attachments
+)
+from app.schemas import (
+    FileNodeBase, NoteResponse, SyncChangesResponse, SyncConflict, SyncMember, SyncPushRequest,
+    SyncPushResponse, SyncRejected, SyncTombstone, UserResponse
+)
+
+router = APIRouter(prefix="/projects", tags=["sync"])
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Client timestamps may carry an offset; stored ones are naive UTC"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+async def _load_notes(db: AsyncSession, project_id: str, note_ids: List[str]) -> Dict[str, Note]:
+    if not note_ids:
+        return {}
+    notes = (await db.scalars(
+        select(Note)
+        .options(selectinload(Note.attachments))
+        .where(Note.project_id == project_id, Note.id.in_(note_ids))
+        .execution_options(populate_existing=True)
+    )).all()
+    return {note.id: note for note in notes}
+
+
+@router.get("/{project_id}/changes", response_model=SyncChangesResponse)
+async def get_changes(
+    project_id: str,
+    since: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Inserts, updates and deletions since the `since` cursor.
+
+    Without `since` only a starting cursor is returned. A 410 means the cursor
+    is older than the change log retention: reload the project and start over.
+    """
+    await check_project_permission(project_id, current_user, db)
+    changes, cursor, has_more = await read_changes(db, project_id, since, limit)
+
+    wanted: Dict[str, List[str]] = {"note": [], "file_node": [], "member": []}
+    deleted = []
+    for change in changes:
+        if change.op == "delete":
+            deleted.append(SyncTombstone(entity_type=change.entity_type, entity_id=change.entity_id))
+        elif change.entity_type in wanted:
+            wanted[change.entity_type].append(change.entity_id)
+
+    notes = await _load_notes(db, project_id, wanted["note"])
+    await sign_attachments(list(notes.values()))
+
+    nodes = {}
+    if wanted["file_node"]:
+        nodes = {node.id: node for node in (await db.scalars(
+            select(FileNode).where(FileNode.project_id == project_id, FileNode.id.in_(wanted["file_node"]))
+        )).all()}
+
+    members = {}
+    if wanted["member"]:
+        rows = (await db.execute(
+            select(User, project_members.c.role)
+            .join(project_members, project_members.c.user_id == User.id)
+            .where(project_members.c.project_id == project_id, User.id.in_(wanted["member"]))
+        )).all()
+        members = {user.id: SyncMember(user=UserResponse.model_validate(user), role=role) for user, role in rows}
+
+    # Rows changed and then deleted after this page was logged are reported as deleted
+    for entity_type, found in (("note", notes), ("file_node", nodes), ("member", members)):
+        deleted.extend(
+            SyncTombstone(entity_type=entity_type, entity_id=entity_id)
+            for entity_id in wanted[entity_type] if entity_id not in found
+        )
+
+    return SyncChangesResponse(
+        cursor=cursor,
+        has_more=has_more,
+        notes=[NoteResponse.model_validate(notes[i]) for i in wanted["note"] if i in notes],
+        file_nodes=[FileNodeBase.model_validate(nodes[i]) for i in wanted["file_node"] if i in nodes],
+        members=[members[i] for i in wanted["member"] if i in members],
+        deleted=deleted,
+    )
+
+
+@router.post("/{project_id}/changes", response_model=SyncPushResponse)
+async def push_changes(
+    project_id: str,
+    push: SyncPushRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Apply notes created, edited or deleted offline, in order.
+
+    An edit is a conflict when the cloud note was updated after base_updated_at
+    (or after local_updated_at when no base is given). Conflicts are not applied
+    unless the edit sets force. Each applied edit is committed on its own; an
+    edit that fails validation is rolled back alone and listed in `rejected`.
+    """
+    await check_project_permission(project_id, current_user, db)
+    notes = await _load_notes(db, project_id, [edit.id for edit in push.notes if edit.id])
+
+    # Refuse the whole push up front rather than stopping halfway through it
+    if any(edit.deleted and edit.id in notes and notes[edit.id].author_id != current_user.id for edit in push.notes):
+        await check_project_permission(project_id, current_user, db, required_role="leader")
+
+    result = SyncPushResponse()
+    applied: Dict[str, Note] = {}
+    for edit in push.notes:
+        if edit.id is None:
+            if edit.deleted:
+                continue  # created and deleted offline
+            try:
+                async with db.begin_nested():
+                    note = await create_note_record(db, project_id, current_user.id, edit.title or "Untitled", edit.content)
+            except ValueError as e:
+                result.rejected.append(SyncRejected(client_id=edit.client_id, detail=str(e)))
+                continue
+            note.last_synced = datetime.utcnow()
+            await commit_or_discard(db, [note_object_key(project_id, note.id)])
+            await publish(project_id, "note.created", note_event(note))
+            if edit.client_id:
+                result.created_ids[edit.client_id] = note.id
+            applied[note.id] = note
+            continue
+
+        note = notes.get(edit.id)
+        if note is None:
+            result.missing.append(edit.id)
+            continue
+
+        # Later edits to a note already applied in this push build on it
+        base = _naive_utc(edit.base_updated_at) or _naive_utc(edit.local_updated_at)
+        conflicting = note.id not in applied and note.updated_at and base and note.updated_at > base
+        if conflicting and not edit.force:
+            result.conflicts.append(SyncConflict(
+                resource_type="note",
+                resource_id=note.id,
+                local_updated_at=edit.local_updated_at,
+                cloud_updated_at=note.updated_at,
+                resolution="overwrite_local",
+            ))
+            continue
+
+        if edit.deleted:
+            await remove_note(db, note)
+            await db.commit()
+            await publish(project_id, "note.deleted", {"id": note.id})
+            del notes[note.id]
+            result.deleted.append(note.id)
+            applied.pop(note.id, None)
+            continue
+
+        try:
+            async with db.begin_nested():
+                await apply_note_update(db, note, edit.title, edit.content)
+        except ValueError as e:
+            result.rejected.append(SyncRejected(id=note.id, client_id=edit.client_id, detail=str(e)))
+            continue
+        note.last_synced = datetime.utcnow()
+        await db.commit()
+        await publish(project_id, "note.updated", note_event(note))
+        applied[note.id] = note
+
+    if applied:
+        stored = await _load_notes(db, project_id, list(applied))
+        await sign_attachments(list(stored.values()))
+        result.notes = [NoteResponse.model_validate(note) for note in stored.values()]
+    return result
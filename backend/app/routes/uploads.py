@@ -0,0 +1,398 @@
+"""Direct-to-storage and resumable uploads.
+
+Direct uploads: the API only signs. Clients PUT bytes straight to MinIO with
+presigned URLs, then call commit, which checks the stored object and creates
+its FileNode. Session state lives in a short-lived signed token, so nothing is
+written to the database until the upload is committed.
+
+Resumable uploads: the client sends fixed-size parts through the API, each
+verified against its SHA-256 and recorded in upload_session_parts. After a
+disconnect it reads the session status and sends only the missing parts. The
+FileNode is created once every part is in (see app.upload_sessions).
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional
+import hashlib
+import math
+import uuid
+
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Path, Request, status
+from minio.error import S3Error
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+import jwt
+
+from app.config import settings
+from app.database import get_db
+from app.dependencies import get_current_user, check_project_permission
+from app.events import publish
+from app.file_tree import resolve_parent, add_file_node
+from app.minio_client import minio_client
+from app.models import User, FileNode, UploadSession, UploadSessionPart, UploadSessionStatus
+from app.object_cleanup import reclaim_objects, schedule_and_purge
+from app.renditions import enqueue_thumbnails
+from app.text_index import index_file_text, is_text_file
+from app.schemas import (
+    FileNodeBase, DirectUploadRequest, DirectUploadSession, DirectUploadCommit, DirectUploadAbort,
+    ResumableUploadStatus
+)
+from app.upload_sessions import (
+    MAX_PARTS, abort_multipart, next_expiry, part_bounds, part_count, part_size_for, session_status
+)
+
+router = APIRouter(prefix="/files", tags=["uploads"])
+
+UPLOAD_TOKEN_PURPOSE = "direct_upload"
+MAX_SINGLE_PUT_BYTES = 5 * 1024 ** 3
+
+
+def _encode_token(claims: dict, expires_at: datetime) -> str:
+    # "purpose" keeps upload tokens and session tokens from being used for each other
+    return jwt.encode(
+        {**claims, "purpose": UPLOAD_TOKEN_PURPOSE, "exp": expires_at},
+        settings.APP_SECRET_KEY,
+        algorithm="HS256"
+    )
+
+
+def _decode_token(token: str, user: User) -> dict:
+    try:
+        claims = jwt.decode(token, settings.APP_SECRET_KEY, algorithms=["HS256"])
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=410, detail="Upload session has expired")
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=400, detail="Invalid upload token")
+    if claims.get("purpose") != UPLOAD_TOKEN_PURPOSE or claims.get("sub") != user.id:
+        raise HTTPException(status_code=400, detail="Invalid upload token")
+    return claims
+
+
+@router.post("/project/{project_id}/uploads", response_model=DirectUploadSession, status_code=status.HTTP_201_CREATED)
+async def start_direct_upload(
+    project_id: str,
+    payload: DirectUploadRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Presign a direct upload: one PUT URL, or one URL per part above the multipart threshold"""
+    await check_project_permission(project_id, current_user, db)
+    await resolve_parent(db, project_id, payload.parent_id)
+
+    object_name = f"files/{project_id}/{uuid.uuid4()}"
+    content_type = payload.content_type or "application/octet-stream"
+    expires_at = datetime.utcnow() + timedelta(seconds=settings.DIRECT_UPLOAD_EXPIRY_SECONDS)
+    claims = {
+        "sub": current_user.id,
+        "project_id": project_id,
+        "parent_id": payload.parent_id,
+        "object_name": object_name,
+        "filename": payload.filename,
+        "content_type": content_type,
+        "size": payload.size,
+    }
+
+    multipart = payload.size > min(settings.DIRECT_UPLOAD_MULTIPART_THRESHOLD, MAX_SINGLE_PUT_BYTES)
+    if not multipart:
+        return DirectUploadSession(
+            upload_token=_encode_token(claims, expires_at),
+            object_name=object_name,
+            expires_at=expires_at,
+            url=minio_client.get_presigned_put_url(object_name, settings.DIRECT_UPLOAD_EXPIRY_SECONDS),
+        )
+
+    part_size = part_size_for(payload.size)
+    parts = math.ceil(payload.size / part_size)
+    upload_id = await minio_client.create_multipart_upload(object_name, content_type)
+    claims["upload_id"] = upload_id
+    return DirectUploadSession(
+        upload_token=_encode_token(claims, expires_at),
+        object_name=object_name,
+        expires_at=expires_at,
+        part_size=part_size,
+        part_urls=[
+            minio_client.get_presigned_part_url(object_name, upload_id, number, settings.DIRECT_UPLOAD_EXPIRY_SECONDS)
+            for number in range(1, parts + 1)
+        ],
+    )
+
+
+@router.post("/uploads/commit", response_model=FileNodeBase, status_code=status.HTTP_201_CREATED)
+async def commit_direct_upload(
+    payload: DirectUploadCommit,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Verify a direct upload landed in storage and create its file node.
+
+    Committing the same token twice returns the node created the first time.
+    """
+    claims = _decode_token(payload.upload_token, current_user)
+    project_id = claims["project_id"]
+    object_name = claims["object_name"]
+    await check_project_permission(project_id, current_user, db)
+
+    existing = await db.scalar(select(FileNode).where(FileNode.storage_path == object_name))
+    if existing:
+        return existing
+
+    upload_id = claims.get("upload_id")
+    if upload_id:
+        if not payload.parts:
+            raise HTTPException(status_code=400, detail="Multipart uploads must list their parts")
+        try:
+            await minio_client.complete_multipart_upload(
+                object_name, upload_id, [(part.part_number, part.etag) for part in payload.parts]
+            )
+        except S3Error as e:
+            raise HTTPException(status_code=400, detail=f"Could not complete multipart upload: {e.code}")
+
+    # An earlier abort or size mismatch may have queued this key for deletion while
+    # the token stayed valid; take it back (waiting out a purge in flight) before
+    # checking the object, so a queued purge cannot remove the committed file
+    await reclaim_objects(db, [object_name])
+    try:
+        stat = await minio_client.stat_file(object_name)
+    except S3Error as e:
+        if e.code == "NoSuchKey":
+            raise HTTPException(status_code=409, detail="Object has not been uploaded yet")
+        raise HTTPException(status_code=500, detail="Failed to verify upload")
+    if stat.size != claims["size"]:
+        await schedule_and_purge(db, [object_name])
+        await db.commit()
+        raise HTTPException(
+            status_code=400,
+            detail=f"Uploaded size {stat.size} does not match declared size {claims['size']}"
+        )
+
+    # The parent may have been deleted or moved while the bytes were in flight
+    parent = await resolve_parent(db, project_id, claims.get("parent_id"))
+    node = await add_file_node(
+        db, project_id, parent, claims["filename"], object_name, stat.size,
+        mime_type=claims["content_type"]
+    )
+    await enqueue_thumbnails(db, node.storage_path, node.mime_type)
+    await db.commit()
+    await db.refresh(node)
+    await publish(node.project_id, "file.created", FileNodeBase.model_validate(node).model_dump(mode="json"))
+    if is_text_file(node.name, node.mime_type):
+        background_tasks.add_task(index_file_text, [node.id])
+    return node
+
+
+@router.post("/uploads/abort", status_code=status.HTTP_204_NO_CONTENT)
+async def abort_direct_upload(
+    payload: DirectUploadAbort,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Discard an uncommitted direct upload and any bytes already stored"""
+    claims = _decode_token(payload.upload_token, current_user)
+    object_name = claims["object_name"]
+    if await db.scalar(select(FileNode.id).where(FileNode.storage_path == object_name)):
+        raise HTTPException(status_code=409, detail="Upload was already committed")
+    if claims.get("upload_id"):
+        try:
+            await minio_client.abort_multipart_upload(object_name, claims["upload_id"])
+        except S3Error as e:
+            if e.code != "NoSuchUpload":
+                raise HTTPException(status_code=500, detail="Failed to abort upload")
+    await schedule_and_purge(db, [object_name])
+    await db.commit()
+    return None
+
+
+async def _get_session(db: AsyncSession, session_id: str, user: User, for_update: bool = False) -> UploadSession:
+    stmt = (
+        select(UploadSession)
+        .where(UploadSession.id == session_id)
+        .options(selectinload(UploadSession.parts))
+        .execution_options(populate_existing=True)
+    )
+    if for_update:
+        stmt = stmt.with_for_update()
+    session = await db.scalar(stmt)
+    if not session or session.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return session
+
+
+def _require_active(session: UploadSession) -> None:
+    if session.status != UploadSessionStatus.ACTIVE:
+        raise HTTPException(status_code=409, detail=f"Upload session is {session.status.value}")
+    if session.expires_at < datetime.utcnow():
+        raise HTTPException(status_code=410, detail="Upload session has expired")
+
+
+@router.post("/project/{project_id}/uploads/resumable", response_model=ResumableUploadStatus, status_code=status.HTTP_201_CREATED)
+async def start_resumable_upload(
+    project_id: str,
+    payload: DirectUploadRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Open a resumable upload; send parts of `part_size` bytes to .../parts/{n}"""
+    await check_project_permission(project_id, current_user, db)
+    await resolve_parent(db, project_id, payload.parent_id)
+
+    object_name = f"files/{project_id}/{uuid.uuid4()}"
+    content_type = payload.content_type or "application/octet-stream"
+    session = UploadSession(
+        project_id=project_id,
+        user_id=current_user.id,
+        parent_id=payload.parent_id,
+        filename=payload.filename,
+        content_type=content_type,
+        size=payload.size,
+        part_size=part_size_for(payload.size),
+        object_name=object_name,
+        upload_id=await minio_client.create_multipart_upload(object_name, content_type),
+        expires_at=next_expiry(),
+        parts=[],
+    )
+    db.add(session)
+    await db.commit()
+    return session_status(session)
+
+
+@router.get("/project/{project_id}/uploads/resumable", response_model=List[ResumableUploadStatus])
+async def list_resumable_uploads(
+    project_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """The caller's unfinished sessions in a project, for clients that lost their session ids"""
+    await check_project_permission(project_id, current_user, db)
+    sessions = (await db.scalars(
+        select(UploadSession)
+        .where(
+            UploadSession.project_id == project_id,
+            UploadSession.user_id == current_user.id,
+            UploadSession.status == UploadSessionStatus.ACTIVE,
+            UploadSession.expires_at >= datetime.utcnow()
+        )
+        .options(selectinload(UploadSession.parts))
+        .order_by(UploadSession.created_at)
+    )).all()
+    return [session_status(session) for session in sessions]
+
+
+@router.get("/uploads/resumable/{session_id}", response_model=ResumableUploadStatus)
+async def get_resumable_upload(
+    session_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Which parts have arrived; resume by sending the missing ones"""
+    return session_status(await _get_session(db, session_id, current_user))
+
+
+@router.put("/uploads/resumable/{session_id}/parts/{part_number}", response_model=ResumableUploadStatus)
+async def upload_resumable_part(
+    session_id: str,
+    request: Request,
+    part_number: int = Path(..., ge=1, le=MAX_PARTS),
+    x_chunk_sha256: Optional[str] = Header(None, description="Hex SHA-256 of the part body"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Store one part (raw request body). Re-sending a part replaces it."""
+    session = await _get_session(db, session_id, current_user)
+    _require_active(session)
+    if part_number > part_count(session):
+        raise HTTPException(status_code=400, detail=f"Upload has only {part_count(session)} parts")
+
+    offset, expected = part_bounds(session, part_number)
+    data = await request.body()
+    if len(data) != expected:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Part {part_number} covers bytes {offset}-{offset + expected - 1}; expected {expected} bytes, got {len(data)}"
+        )
+    digest = hashlib.sha256(data).hexdigest()
+    if x_chunk_sha256 and x_chunk_sha256.lower() != digest:
+        raise HTTPException(status_code=422, detail="Part checksum mismatch")
+
+    etag = await minio_client.upload_part(session.object_name, session.upload_id, part_number, data)
+    values = {"size": len(data), "sha256": digest, "etag": etag, "created_at": datetime.utcnow()}
+    await db.execute(
+        insert(UploadSessionPart)
+        .values(session_id=session.id, part_number=part_number, **values)
+        .on_conflict_do_update(index_elements=["session_id", "part_number"], set_=values)
+    )
+    # Every received part keeps an active session alive
+    session.expires_at = next_expiry()
+    await db.commit()
+    return session_status(await _get_session(db, session_id, current_user))
+
+
+@router.post("/uploads/resumable/{session_id}/complete", response_model=FileNodeBase)
+async def complete_resumable_upload(
+    session_id: str,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Assemble all parts and create the file node. Completing twice returns the same node."""
+    session = await _get_session(db, session_id, current_user, for_update=True)
+    if session.status == UploadSessionStatus.COMPLETED and session.file_node_id:
+        node = await db.get(FileNode, session.file_node_id)
+        if node:
+            return node
+    _require_active(session)
+    await check_project_permission(session.project_id, current_user, db)
+
+    received = {part.part_number: part for part in session.parts}
+    missing = [n for n in range(1, part_count(session) + 1) if n not in received]
+    if missing:
+        raise HTTPException(status_code=409, detail={"message": "Upload is incomplete", "missing_parts": missing[:100]})
+
+    # The parent may have been deleted or moved while parts were arriving
+    parent = await resolve_parent(db, session.project_id, session.parent_id)
+    try:
+        await minio_client.complete_multipart_upload(
+            session.object_name, session.upload_id, [(n, part.etag) for n, part in received.items()]
+        )
+        stat = await minio_client.stat_file(session.object_name)
+    except S3Error as e:
+        raise HTTPException(status_code=500, detail=f"Could not complete upload: {e.code}")
+    if stat.size != session.size:
+        raise HTTPException(status_code=500, detail="Assembled object has an unexpected size")
+
+    node = await add_file_node(
+        db, session.project_id, parent, session.filename, session.object_name, stat.size,
+        mime_type=session.content_type
+    )
+    await db.flush()
+    session.status = UploadSessionStatus.COMPLETED
+    session.file_node_id = node.id
+    await enqueue_thumbnails(db, node.storage_path, node.mime_type)
+    await db.commit()
+    await db.refresh(node)
+    await publish(node.project_id, "file.created", FileNodeBase.model_validate(node).model_dump(mode="json"))
+    if is_text_file(node.name, node.mime_type):
+        background_tasks.add_task(index_file_text, [node.id])
+    return node
+
+
+@router.delete("/uploads/resumable/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def abort_resumable_upload(
+    session_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Abandon a resumable upload and free the parts stored so far"""
+    session = await _get_session(db, session_id, current_user, for_update=True)
+    if session.status == UploadSessionStatus.COMPLETED:
+        raise HTTPException(status_code=409, detail="Upload was already completed")
+    if session.status == UploadSessionStatus.ACTIVE:
+        try:
+            await abort_multipart(session)
+        except S3Error:
+            raise HTTPException(status_code=500, detail="Failed to abort upload")
+    session.status = UploadSessionStatus.ABORTED
+    session.parts.clear()
+    await db.commit()
+    return None
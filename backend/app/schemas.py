@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field
+from typing import Dict, Optional, List
 from datetime import datetime
 from enum import Enum
 
@@ -128,6 +128,68 @@ class NoteResponse(NoteBase):
         from_attributes = True
 
 
+class NoteProjection(BaseModel):
+    """A note listed with ?fields=: only the requested fields are present"""
+    id: Optional[str] = None
+    title: Optional[str] = None
+    content: Optional[str] = None
+    project_id: Optional[str] = None
+    author_id: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    last_synced: Optional[datetime] = None
+    attachments: Optional[List[NoteAttachmentResponse]] = None
+
+
+class NoteBatchCreate(BaseModel):
+    project_id: str
+    notes: List[NoteBase] = Field(..., min_length=1, max_length=200)
+
+
+class NoteBatchUpdateItem(NoteUpdate):
+    id: str
+
+
+class NoteBatchUpdate(BaseModel):
+    notes: List[NoteBatchUpdateItem] = Field(..., min_length=1, max_length=200)
+
+
+class NoteBatchResult(BaseModel):
+    index: int  # position in the request
+    status: str  # "created", "updated", "not_found", "forbidden" or "failed"
+    detail: Optional[str] = None
+    note: Optional[NoteResponse] = None
+
+
+class NoteBatchResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[NoteBatchResult]
+
+
+class NoteSummaryResponse(BaseModel):
+    """List view of a note: no content, attachments counted instead of signed"""
+    id: str
+    title: str
+    project_id: str
+    author_id: str
+    created_at: datetime
+    updated_at: datetime
+    last_synced: Optional[datetime] = None
+    attachment_count: int = 0
+
+
+# Search Schemas
+class SearchResult(BaseModel):
+    """A note or file matching a project search"""
+    kind: str  # "note" or "file"
+    id: str  # note id or file node id
+    title: str
+    snippet: Optional[str] = None  # matches wrapped in <mark>...</mark>
+    rank: float
+    updated_at: Optional[datetime] = None
+
+
 # Sync Schemas
 class SyncConflict(BaseModel):
     resource_type: str  # "note", "attachment", etc.
@@ -141,6 +203,58 @@ class SyncRequest(BaseModel):
     conflicts: List[SyncConflict]
 
 
+class SyncTombstone(BaseModel):
+    entity_type: str  # "note", "file_node" or "member"
+    entity_id: str
+
+
+class SyncMember(BaseModel):
+    user: UserResponse
+    role: UserRole
+
+
+class SyncChangesResponse(BaseModel):
+    """Current state of everything changed since the cursor; deleted rows as tombstones"""
+    cursor: str  # pass as `since` on the next call
+    has_more: bool = False  # more changes are waiting: call again right away
+    notes: List[NoteResponse] = []
+    file_nodes: List['FileNodeBase'] = []
+    members: List[SyncMember] = []
+    deleted: List[SyncTombstone] = []
+
+
+class NoteSyncEdit(BaseModel):
+    """A note edit made offline"""
+    id: Optional[str] = None  # None for notes created offline
+    client_id: Optional[str] = None  # offline id, echoed back in created_ids
+    title: Optional[str] = None
+    content: Optional[str] = None
+    deleted: bool = False
+    base_updated_at: Optional[datetime] = None  # cloud updated_at the edit started from
+    local_updated_at: datetime
+    force: bool = False  # overwrite the cloud copy even if it changed since base_updated_at
+
+
+class SyncPushRequest(BaseModel):
+    notes: List[NoteSyncEdit] = Field(..., max_length=500)
+
+
+class SyncRejected(BaseModel):
+    """An offline edit refused on its own merits, e.g. a title already taken in the Notes folder"""
+    id: Optional[str] = None  # None for notes created offline
+    client_id: Optional[str] = None
+    detail: str
+
+
+class SyncPushResponse(BaseModel):
+    notes: List[NoteResponse] = []  # applied creates and updates, as stored
+    created_ids: Dict[str, str] = {}  # client_id -> note id
+    deleted: List[str] = []  # note ids deleted by this push
+    missing: List[str] = []  # edited or deleted notes that no longer exist in the cloud
+    conflicts: List[SyncConflict] = []  # not applied: the cloud copy moved on (resolution "overwrite_local")
+    rejected: List[SyncRejected] = []  # not applied: fix locally (e.g. rename) and push again
+
+
 # Authentication Schemas
 class TokenData(BaseModel):
     firebase_uid: str
@@ -161,7 +275,11 @@ class FileNodeBase(BaseModel):
     name: str
     type: FileNodeType
     mime_type: Optional[str] = None
-    size: Optional[str] = None
+    size: Optional[int] = None
+    descendant_file_count: int = 0
+    descendant_bytes: int = 0
+    checksum: Optional[str] = None
+    path: Optional[str] = None
     is_locked: bool = False
     created_at: datetime
     updated_at: datetime
@@ -170,6 +288,21 @@ class FileNodeBase(BaseModel):
         from_attributes = True
 
 
+class FileTreeNode(FileNodeBase):
+    children: Optional[List['FileTreeNode']] = None  # None when the depth limit stopped expansion
+    next_cursor: Optional[str] = None  # more children: continue with /files/{id}/children?cursor=
+
+
+FileTreeNode.model_rebuild()
+
+
+class FileTreeResponse(BaseModel):
+    project_id: str
+    parent_id: Optional[str] = None
+    nodes: List[FileTreeNode]
+    next_cursor: Optional[str] = None
+
+
 class FileNodeCreateFolder(BaseModel):
     name: str
     parent_id: Optional[str] = None
@@ -181,3 +314,67 @@ class FileNodeRenameRequest(BaseModel):
 
 class FileNodeMoveRequest(BaseModel):
     new_parent_id: Optional[str] = None
+
+
+class DirectUploadRequest(BaseModel):
+    filename: str
+    size: int = Field(..., ge=0)
+    content_type: Optional[str] = None
+    parent_id: Optional[str] = None
+
+
+class DirectUploadSession(BaseModel):
+    upload_token: str  # pass back to /files/uploads/commit or /files/uploads/abort
+    object_name: str
+    expires_at: datetime
+    url: Optional[str] = None  # single PUT target for small files
+    part_size: Optional[int] = None  # multipart: every part but the last has this size
+    part_urls: List[str] = []  # multipart: PUT part i+1 to part_urls[i], keep each ETag
+
+
+class UploadedPart(BaseModel):
+    part_number: int = Field(..., ge=1, le=10000)
+    etag: str
+
+
+class DirectUploadCommit(BaseModel):
+    upload_token: str
+    parts: List[UploadedPart] = []
+
+
+class DirectUploadAbort(BaseModel):
+    upload_token: str
+
+
+class ResumableUploadStatus(BaseModel):
+    id: str
+    project_id: str
+    parent_id: Optional[str] = None
+    filename: str
+    size: int
+    part_size: int
+    part_count: int
+    received_parts: List[int] = []  # part i covers bytes [(i-1)*part_size, i*part_size)
+    bytes_received: int = 0
+    status: str
+    file_node_id: Optional[str] = None
+    expires_at: datetime
+
+
+class BatchUploadResult(BaseModel):
+    path: str  # relative path inside the target folder
+    status: str  # "created", "skipped" or "failed"
+    detail: Optional[str] = None
+    node: Optional[FileNodeBase] = None
+
+
+class BatchUploadResponse(BaseModel):
+    created: int
+    skipped: int
+    failed: int
+    folders_created: int
+    results: List[BatchUploadResult]
+
+
+# SyncChangesResponse refers to FileNodeBase, defined after it
+SyncChangesResponse.model_rebuild()
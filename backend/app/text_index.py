@@ -0,0 +1,99 @@
+"""Text extraction feeding full-text search over files.
+
+Notes are searchable through their generated search_vector column as soon
+as they are written. Files are searched by name and, for .txt files, by
+extracted_text: the first TEXT_INDEX_MAX_BYTES of the object, read after
+upload (or by the periodic sweep for files stored by direct uploads, older
+rows and anything a background task missed). NULL marks a file still
+waiting to be read and '' one with nothing to index. Note backing files are
+skipped; their text is already in notes.content.
+"""
+from typing import Iterable, List, Optional
+import asyncio
+
+from sqlalchemy import exists, select, text, update
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.minio_client import minio_client
+from app.models import TEXT_PENDING_PREDICATE, FileNode, NoteFileLink
+
+
+def is_text_file(name: Optional[str], mime_type: Optional[str]) -> bool:
+    return mime_type == "text/plain" or (name or "").lower().endswith(".txt")
+
+
+async def _read_text(storage_path: str) -> str:
+    response = await minio_client.open_file(storage_path, length=settings.TEXT_INDEX_MAX_BYTES)
+    data = b"".join([chunk async for chunk in minio_client.iter_chunks(response, settings.DOWNLOAD_CHUNK_SIZE)])
+    # A cut-off multibyte character at the end is dropped; NUL is not valid in PostgreSQL text
+    return data.decode("utf-8", errors="ignore").replace("\x00", "")
+
+
+async def index_file_text(node_ids: Iterable[str]) -> int:
+    """Read and store the text of pending .txt nodes; returns how many were indexed"""
+    node_ids = list(node_ids)
+    if not node_ids:
+        return 0
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(
+            select(
+                FileNode.id,
+                FileNode.storage_path,
+                FileNode.size,
+                exists().where(NoteFileLink.file_node_id == FileNode.id).label("is_note")
+            )
+            .where(FileNode.id.in_(node_ids), text(TEXT_PENDING_PREDICATE))
+        )).all()
+
+    indexed = 0
+    for node_id, storage_path, size, is_note in rows:
+        if is_note or size == 0:
+            content = ""
+        else:
+            try:
+                content = await _read_text(storage_path)
+            except Exception as e:
+                print(f"✗ Text extraction failed for {storage_path}: {e}")
+                continue
+        async with AsyncSessionLocal() as db:
+            # Only if the node still holds the object that was read
+            await db.execute(
+                update(FileNode)
+                .where(FileNode.id == node_id, FileNode.storage_path == storage_path, FileNode.extracted_text.is_(None))
+                .values(extracted_text=content)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        indexed += 1
+    return indexed
+
+
+async def index_pending_files(batch_size: int = 200) -> int:
+    """Index every pending .txt file once, oldest id first"""
+    total = 0
+    last_seen = ""
+    while True:
+        async with AsyncSessionLocal() as db:
+            ids: List[str] = (await db.scalars(
+                select(FileNode.id)
+                .where(text(TEXT_PENDING_PREDICATE), FileNode.id > last_seen)
+                .order_by(FileNode.id)
+                .limit(batch_size)
+            )).all()
+        if not ids:
+            return total
+        total += await index_file_text(ids)
+        last_seen = ids[-1]
+
+
+async def run_periodic_text_indexing() -> None:
+    """Background loop started with the app"""
+    while True:
+        try:
+            count = await index_pending_files()
+            if count:
+                print(f"✓ Indexed text of {count} files")
+        except Exception as e:
+            print(f"✗ Text indexing error: {e}")
+        await asyncio.sleep(settings.TEXT_INDEX_INTERVAL_SECONDS)
@@ -0,0 +1,119 @@
+"""Resumable upload sessions.
+
+A session wraps one S3 multipart upload. Every received part is recorded in
+upload_session_parts (number, size, SHA-256, ETag), so after a dropped
+connection the client asks which parts arrived and sends only the rest.
+Sessions idle past RESUMABLE_UPLOAD_TTL_SECONDS are aborted by a periodic
+sweep, which also frees the parts already held by MinIO.
+"""
+from datetime import datetime, timedelta
+from typing import Tuple
+import asyncio
+import math
+
+from minio.error import S3Error
+from sqlalchemy import delete, select, update
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.minio_client import minio_client
+from app.models import UploadSession, UploadSessionPart, UploadSessionStatus
+from app.schemas import ResumableUploadStatus
+
+MAX_PARTS = 10000
+
+
+def part_size_for(size: int) -> int:
+    # Grow parts for huge files so the upload stays within S3's part limit
+    return max(settings.MINIO_UPLOAD_PART_SIZE, math.ceil(size / MAX_PARTS))
+
+
+def part_count(session: UploadSession) -> int:
+    return max(1, math.ceil(session.size / session.part_size))
+
+
+def part_bounds(session: UploadSession, part_number: int) -> Tuple[int, int]:
+    """(offset, length) of a part within the final object"""
+    offset = (part_number - 1) * session.part_size
+    return offset, min(session.part_size, session.size - offset)
+
+
+def next_expiry() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=settings.RESUMABLE_UPLOAD_TTL_SECONDS)
+
+
+def session_status(session: UploadSession) -> ResumableUploadStatus:
+    """Status payload; session.parts must already be loaded"""
+    received = sorted(session.parts, key=lambda part: part.part_number)
+    return ResumableUploadStatus(
+        id=session.id,
+        project_id=session.project_id,
+        parent_id=session.parent_id,
+        filename=session.filename,
+        size=session.size,
+        part_size=session.part_size,
+        part_count=part_count(session),
+        received_parts=[part.part_number for part in received],
+        bytes_received=sum(part.size for part in received),
+        status=session.status.value,
+        file_node_id=session.file_node_id,
+        expires_at=session.expires_at,
+    )
+
+
+async def abort_multipart(session: UploadSession) -> None:
+    try:
+        await minio_client.abort_multipart_upload(session.object_name, session.upload_id)
+    except S3Error as e:
+        if e.code != "NoSuchUpload":
+            raise
+
+
+async def collect_expired_sessions(batch_size: int = 100) -> int:
+    """Abort every active session past its expiry; returns how many were collected"""
+    collected = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            sessions = (await db.scalars(
+                select(UploadSession)
+                .where(
+                    UploadSession.status == UploadSessionStatus.ACTIVE,
+                    UploadSession.expires_at < datetime.utcnow()
+                )
+                .order_by(UploadSession.expires_at)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )).all()
+            if not sessions:
+                return collected
+            aborted = []
+            for session in sessions:
+                try:
+                    await abort_multipart(session)
+                    aborted.append(session.id)
+                except Exception as e:
+                    print(f"✗ Could not abort upload session {session.id}: {e}")
+            if aborted:
+                # Part rows are only needed while a session can still resume
+                await db.execute(delete(UploadSessionPart).where(UploadSessionPart.session_id.in_(aborted)))
+                await db.execute(
+                    update(UploadSession)
+                    .where(UploadSession.id.in_(aborted))
+                    .values(status=UploadSessionStatus.EXPIRED)
+                )
+            await db.commit()
+            collected += len(aborted)
+            if len(aborted) < len(sessions):
+                return collected  # storage is failing; retry on the next sweep
+
+
+async def run_periodic_session_gc() -> None:
+    """Background loop started with the app"""
+    while True:
+        try:
+            count = await collect_expired_sessions()
+            if count:
+                print(f"✓ Collected {count} abandoned upload sessions")
+        except Exception as e:
+            print(f"✗ Upload session GC error: {e}")
+        await asyncio.sleep(settings.RESUMABLE_UPLOAD_GC_INTERVAL_SECONDS)
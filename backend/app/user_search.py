@@ -0,0 +1,70 @@
+"""Member-picker user search over email and display name.
+
+Prefix matches come first, from lower(column) text_pattern_ops btree indexes.
+If they don't fill the page, substring matches follow, taken from pg_trgm GIN
+indexes and ranked by trigram similarity. Results are cached briefly per query,
+because the picker sends one request per keystroke and users type the same
+prefixes.
+"""
+from typing import List
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import TTLCache
+from app.config import settings
+from app.models import User
+from app.schemas import UserResponse
+
+MIN_QUERY_LENGTH = 3  # shorter patterns have no trigram to look up
+
+user_search_cache = TTLCache(
+    "user_search",
+    ttl=settings.USER_SEARCH_CACHE_TTL_SECONDS,
+    maxsize=settings.USER_SEARCH_CACHE_MAX_ENTRIES
+)
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def prefix_stmt(query: str, limit: int):
+    """Users whose email or display name starts with query"""
+    pattern = _escape_like(query.lower()) + "%"
+    return (
+        select(User)
+        .where(or_(func.lower(User.email).like(pattern), func.lower(User.display_name).like(pattern)))
+        .order_by(func.lower(User.email))
+        .limit(limit)
+    )
+
+
+def substring_stmt(query: str, limit: int, exclude: List[str] = ()):
+    """Users containing query anywhere, most similar first"""
+    pattern = "%" + _escape_like(query) + "%"
+    similarity = func.greatest(
+        func.similarity(User.email, query),
+        func.similarity(func.coalesce(User.display_name, ""), query)
+    )
+    stmt = select(User).where(or_(User.email.ilike(pattern), User.display_name.ilike(pattern)))
+    if exclude:
+        stmt = stmt.where(User.id.not_in(list(exclude)))
+    return stmt.order_by(similarity.desc(), User.email).limit(limit)
+
+
+async def find_users(db: AsyncSession, query: str, limit: int = 10) -> List[dict]:
+    """Serialized users matching query, prefix matches first"""
+    query = query.strip()
+    key = f"{limit}:{query.lower()}"
+    cached = await user_search_cache.get(key)
+    if cached is not None:
+        return cached
+
+    users = list((await db.scalars(prefix_stmt(query, limit))).all())
+    if len(users) < limit:
+        users += (await db.scalars(substring_stmt(query, limit - len(users), [u.id for u in users]))).all()
+
+    results = [UserResponse.model_validate(user).model_dump(mode="json") for user in users]
+    await user_search_cache.set(key, results)
+    return results
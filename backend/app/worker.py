@@ -0,0 +1,41 @@
+"""Standalone job worker, for running jobs outside the API processes.
+
+    python -m app.worker                       # run jobs until interrupted
+    python -m app.worker --requeue-dead        # move every dead job back into the queue
+    python -m app.worker --requeue-dead objects.purge
+
+Set JOB_WORKER_IN_APP=false on the API when dedicated workers take over.
+"""
+import argparse
+import asyncio
+
+from app.database import async_engine
+from app.jobs import requeue_dead_jobs, run_worker
+from app.minio_client import minio_client
+from app.renditions import shutdown_pool as shutdown_renditions
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Run queued jobs")
+    parser.add_argument("--requeue-dead", nargs="?", const="", metavar="KIND",
+                        help="Requeue dead jobs (optionally of one kind) and exit")
+    args = parser.parse_args()
+
+    try:
+        if args.requeue_dead is not None:
+            count = await requeue_dead_jobs(args.requeue_dead or None)
+            print(f"✓ Requeued {count} dead jobs")
+            return
+        print("✓ Job worker started")
+        await run_worker()
+    finally:
+        shutdown_renditions()
+        minio_client.close()
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1 @@
+# Load and latency benchmarks; run from backend/ with `python -m benchmarks.<name>`
@@ -0,0 +1,40 @@
+"""Shared helpers for the benchmark scripts"""
+import argparse
+import os
+import statistics
+from typing import Dict, List
+
+
+def base_parser(description: str) -> argparse.ArgumentParser:
+    """Argument parser with the connection options every HTTP benchmark needs"""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--base-url", default=os.environ.get("STRATUM_BASE_URL", "http://localhost:8000"))
+    parser.add_argument("--token", default=os.environ.get("STRATUM_TOKEN"), help="Bearer token of a project member")
+    parser.add_argument("--project-id", default=os.environ.get("STRATUM_PROJECT_ID"))
+    return parser
+
+
+def auth_headers(token: str) -> Dict[str, str]:
+    return {"Authorization": f"Bearer {token}"} if token else {}
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def summarize(label: str, samples_ms: List[float]) -> str:
+    """One-line latency summary in milliseconds"""
+    if not samples_ms:
+        return f"{label:<40} no samples"
+    return (
+        f"{label:<40} n={len(samples_ms):<6} "
+        f"p50={percentile(samples_ms, 50):8.2f}ms "
+        f"p99={percentile(samples_ms, 99):8.2f}ms "
+        f"max={max(samples_ms):8.2f}ms "
+        f"mean={statistics.fmean(samples_ms):8.2f}ms"
+    )
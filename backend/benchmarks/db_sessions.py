@@ -0,0 +1,81 @@
+"""Requests/sec of the project and note listing queries: sync vs async sessions.
+
+Replays the queries behind GET /api/projects/ and GET /api/notes/project/{id}
+from many concurrent coroutines on one event loop. The "sync" path runs them
+on a blocking Session inside the coroutine, exactly as the old handlers did;
+the "async" path uses the AsyncSession that the routers use now.
+
+    python -m benchmarks.db_sessions --user-id $USER_ID --project-id $PID \
+        --concurrency 50 --requests 2000
+"""
+import asyncio
+import time
+
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from app.database import AsyncSessionLocal, SessionLocal, async_engine, engine
+from app.models import Note, Project, project_members
+from benchmarks._common import base_parser
+
+
+def _projects_stmt(user_id: str):
+    return select(Project).outerjoin(project_members).where(
+        (Project.owner_id == user_id) | (project_members.c.user_id == user_id)
+    )
+
+
+def _notes_stmt(project_id: str):
+    return (
+        select(Note)
+        .options(selectinload(Note.attachments))
+        .where(Note.project_id == project_id)
+        .order_by(Note.updated_at.desc())
+    )
+
+
+async def _sync_request(stmt):
+    # Blocks the loop for the whole round trip, like the old sync handlers
+    with SessionLocal() as db:
+        db.scalars(stmt).unique().all()
+
+
+async def _async_request(stmt):
+    async with AsyncSessionLocal() as db:
+        (await db.scalars(stmt)).unique().all()
+
+
+async def _run(label: str, request, stmt, total: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await request(stmt)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(total)])
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {total / elapsed:10.1f} req/s  ({total} requests, concurrency {concurrency})")
+
+
+async def main():
+    parser = base_parser(__doc__.splitlines()[0])
+    parser.add_argument("--user-id", required=True)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    cases = [
+        ("GET /api/projects/", _projects_stmt(args.user_id)),
+        ("GET /api/notes/project/{id}", _notes_stmt(args.project_id)),
+    ]
+    for name, stmt in cases:
+        await _run(f"sync  {name}", _sync_request, stmt, args.requests, args.concurrency)
+        await _run(f"async {name}", _async_request, stmt, args.requests, args.concurrency)
+
+    engine.dispose()
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
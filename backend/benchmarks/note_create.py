@@ -0,0 +1,104 @@
+"""Per-note creation latency: one commit per row vs a single transaction.
+
+Creates notes in a throwaway project owned by --user-id, first with the old
+sequence behind POST /api/notes/ (commit the note, upload, commit the file
+node, commit the link), then with create_note_record + commit_or_discard as
+the route does now. Both paths write the same .txt object to MinIO. The
+project and its objects are removed at the end.
+
+    python -m benchmarks.note_create --user-id $USER_ID --notes 300 --concurrency 10
+"""
+import asyncio
+import time
+
+from sqlalchemy import delete, select
+
+from app.database import AsyncSessionLocal, async_engine, engine
+from app.file_tree import adjust_ancestor_totals, assign_path
+from app.minio_client import minio_client
+from app.models import FileNode, FileNodeType, Note, NoteFileLink, Project
+from app.note_storage import commit_or_discard, create_note_record, get_notes_folder, note_object_key, write_note_text
+from benchmarks._common import base_parser, summarize
+
+_CONTENT = "Context 1042. Compact silty clay, mid brown, occasional charcoal flecks.\n" * 20
+
+
+async def _create_legacy(project_id: str, user_id: str, title: str) -> None:
+    """The pre-transaction sequence: three commits around the upload"""
+    async with AsyncSessionLocal() as db:
+        notes_folder = await get_notes_folder(db, project_id)
+        note = Note(title=title, content=_CONTENT, project_id=project_id, author_id=user_id)
+        db.add(note)
+        await db.commit()
+
+        content_bytes = _CONTENT.encode("utf-8")
+        storage_path = note_object_key(project_id, note.id)
+        etag = await write_note_text(storage_path, content_bytes)
+        note_node = FileNode(
+            project_id=project_id, parent_id=notes_folder.id, name=f"{title}.txt",
+            type=FileNodeType.FILE, mime_type="text/plain", size=len(content_bytes),
+            storage_path=storage_path, storage_etag=etag,
+        )
+        assign_path(note_node, notes_folder)
+        db.add(note_node)
+        await adjust_ancestor_totals(db, note_node.path, 1, note_node.size)
+        await db.commit()
+
+        db.add(NoteFileLink(note_id=note.id, file_node_id=note_node.id))
+        await db.commit()
+
+
+async def _create_atomic(project_id: str, user_id: str, title: str) -> None:
+    async with AsyncSessionLocal() as db:
+        note = await create_note_record(db, project_id, user_id, title, _CONTENT)
+        await commit_or_discard(db, [note_object_key(project_id, note.id)])
+
+
+async def _run(label: str, create, project_id: str, user_id: str, total: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def one(n: int):
+        async with semaphore:
+            start = time.perf_counter()
+            await create(project_id, user_id, f"{label} {n}")
+            samples.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*[one(n) for n in range(total)])
+    print(summarize(label, samples))
+
+
+async def main():
+    parser = base_parser(__doc__.splitlines()[0])
+    parser.add_argument("--user-id", required=True)
+    parser.add_argument("--notes", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    async with AsyncSessionLocal() as db:
+        project = Project(name="bench-note-create", owner_id=args.user_id)
+        db.add(project)
+        await db.flush()
+        await get_notes_folder(db, project.id)
+        await db.commit()
+        project_id = project.id
+
+    try:
+        # The Notes folder exists already, as it does for every project but the first note's
+        await _run("legacy (3 commits)", _create_legacy, project_id, args.user_id, args.notes, args.concurrency)
+        await _run("single transaction", _create_atomic, project_id, args.user_id, args.notes, args.concurrency)
+    finally:
+        async with AsyncSessionLocal() as db:
+            paths = (await db.scalars(
+                select(FileNode.storage_path).where(FileNode.project_id == project_id, FileNode.storage_path != None)
+            )).all()
+            await db.execute(delete(Project).where(Project.id == project_id))
+            await db.commit()
+        await minio_client.delete_files(paths)
+        minio_client.close()
+        engine.dispose()
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+"""Latency of cheap endpoints while large uploads are in flight.
+
+Samples GET /health and GET /api/files/{folder_id}/children at a fixed rate,
+first on an idle server and then while N concurrent uploads are running. With
+storage I/O off the event loop the p99 of both phases should stay flat.
+
+    python -m benchmarks.storage_load --token $TOKEN --project-id $PID \
+        --folder-id $FOLDER --uploads 50 --size-mb 20
+"""
+import asyncio
+import os
+import time
+from typing import List
+
+import httpx
+
+from benchmarks._common import auth_headers, base_parser, summarize
+
+
+async def _sample(client: httpx.AsyncClient, path: str, headers, out: List[float], stop: asyncio.Event, interval: float):
+    while not stop.is_set():
+        start = time.perf_counter()
+        response = await client.get(path, headers=headers)
+        response.raise_for_status()
+        out.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+
+
+async def _upload(client: httpx.AsyncClient, project_id: str, folder_id: str, headers, payload: bytes, index: int):
+    files = {"file": (f"bench-{index}.bin", payload, "application/octet-stream")}
+    data = {"parent_id": folder_id} if folder_id else {}
+    response = await client.post(f"/api/files/project/{project_id}/upload", headers=headers, files=files, data=data)
+    response.raise_for_status()
+    return response.json()["id"]
+
+
+async def _phase(client, args, headers, payload: bytes, with_uploads: bool):
+    health: List[float] = []
+    children: List[float] = []
+    stop = asyncio.Event()
+    samplers = [
+        asyncio.create_task(_sample(client, "/health", {}, health, stop, args.interval)),
+        asyncio.create_task(_sample(client, f"/api/files/{args.folder_id}/children", headers, children, stop, args.interval)),
+    ]
+    uploaded = []
+    if with_uploads:
+        uploaded = await asyncio.gather(*[
+            _upload(client, args.project_id, args.folder_id, headers, payload, i) for i in range(args.uploads)
+        ])
+    else:
+        await asyncio.sleep(args.idle_seconds)
+    stop.set()
+    await asyncio.gather(*samplers)
+    return health, children, uploaded
+
+
+async def main():
+    parser = base_parser(__doc__.splitlines()[0])
+    parser.add_argument("--folder-id", required=True, help="Folder to upload into and list")
+    parser.add_argument("--uploads", type=int, default=50)
+    parser.add_argument("--size-mb", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.05, help="Seconds between latency samples")
+    parser.add_argument("--idle-seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    headers = auth_headers(args.token)
+    payload = os.urandom(args.size_mb * 1024 * 1024)
+    timeout = httpx.Timeout(600.0)
+    limits = httpx.Limits(max_connections=args.uploads + 10)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=timeout, limits=limits) as client:
+        idle_health, idle_children, _ = await _phase(client, args, headers, payload, with_uploads=False)
+        load_health, load_children, uploaded = await _phase(client, args, headers, payload, with_uploads=True)
+        # Clean up benchmark uploads
+        for node_id in uploaded:
+            await client.delete(f"/api/files/{node_id}", headers=headers)
+
+    print(summarize("idle   GET /health", idle_health))
+    print(summarize("idle   GET /files/{id}/children", idle_children))
+    print(summarize(f"{args.uploads}x upload GET /health", load_health))
+    print(summarize(f"{args.uploads}x upload GET /files/{{id}}/children", load_children))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
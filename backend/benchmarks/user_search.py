@@ -0,0 +1,122 @@
+"""Latency of the member-picker user search: ilike scan vs prefix + trigram.
+
+Seeds synthetic users (firebase_uid 'bench-user-<n>') up to --users rows,
+then replays keystroke-style queries against the old ilike('%q%') query and
+the statements behind GET /api/auth/users/search. Run the app once first so
+the pg_trgm extension and indexes exist.
+
+    python -m benchmarks.user_search --users 1000000 --queries 200
+    python -m benchmarks.user_search --cleanup
+"""
+import asyncio
+import random
+import time
+
+from sqlalchemy import delete, func, or_, select, text
+
+from app.database import AsyncSessionLocal, async_engine, engine
+from app.models import User
+from app.user_search import prefix_stmt, substring_stmt
+from benchmarks._common import base_parser, summarize
+
+_FIRST = ["anna", "marco", "ioana", "stefan", "maria", "andrei", "elena", "mihai", "sofia", "luca", "irina", "dan"]
+_LAST = ["popescu", "ionescu", "rossi", "bianchi", "dumitru", "stan", "marin", "ferrari", "costa", "georgescu"]
+
+
+def seed(count: int) -> int:
+    """Insert synthetic users until count bench users exist; returns how many were added"""
+    with engine.begin() as conn:
+        existing = conn.scalar(select(func.count()).select_from(User).where(User.firebase_uid.like("bench-user-%")))
+        if existing >= count:
+            return 0
+        conn.execute(text("""
+            INSERT INTO users (id, firebase_uid, email, display_name, created_at, updated_at)
+            SELECT 'bench-user-' || n,
+                   'bench-user-' || n,
+                   (CAST(:first AS text[]))[1 + n % :nfirst] || '.' || (CAST(:last AS text[]))[1 + (n / :nfirst) % :nlast] || n || '@bench.example',
+                   initcap((CAST(:first AS text[]))[1 + n % :nfirst]) || ' ' || initcap((CAST(:last AS text[]))[1 + (n / :nfirst) % :nlast]),
+                   now(), now()
+            FROM generate_series(:start, :stop) AS n
+        """), {
+            "first": _FIRST, "nfirst": len(_FIRST), "last": _LAST, "nlast": len(_LAST),
+            "start": existing, "stop": count - 1,
+        })
+        conn.execute(text("ANALYZE users"))
+    return count - existing
+
+
+def cleanup() -> int:
+    with engine.begin() as conn:
+        return conn.execute(delete(User).where(User.firebase_uid.like("bench-user-%"))).rowcount
+
+
+def _queries(total: int):
+    """Keystroke-like prefixes and fragments of names, emails and numbers"""
+    rng = random.Random(7)
+    words = _FIRST + _LAST
+    out = []
+    for _ in range(total):
+        word = rng.choice(words)
+        choice = rng.random()
+        if choice < 0.5:
+            out.append(word[:rng.randint(3, len(word))])
+        elif choice < 0.8:
+            start = rng.randint(0, max(0, len(word) - 3))
+            out.append(word[start:start + rng.randint(3, 5)])
+        else:
+            out.append(str(rng.randint(100, 99999)))
+    return out
+
+
+def _ilike_stmt(query: str, limit: int):
+    return select(User).where(or_(User.email.ilike(f"%{query}%"), User.display_name.ilike(f"%{query}%"))).limit(limit)
+
+
+async def _indexed(db, query: str, limit: int):
+    users = list((await db.scalars(prefix_stmt(query, limit))).all())
+    if len(users) < limit:
+        users += (await db.scalars(substring_stmt(query, limit - len(users), [u.id for u in users]))).all()
+    return users
+
+
+async def _time(label: str, queries, run):
+    samples = []
+    async with AsyncSessionLocal() as db:
+        for query in queries:
+            start = time.perf_counter()
+            await run(db, query)
+            samples.append((time.perf_counter() - start) * 1000)
+    print(summarize(label, samples))
+
+
+async def main():
+    parser = base_parser(__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--cleanup", action="store_true", help="Delete the seeded users and exit")
+    args = parser.parse_args()
+
+    if args.cleanup:
+        print(f"✓ Removed {cleanup()} bench users")
+        return
+    added = seed(args.users)
+    print(f"✓ Seeded {added} bench users")
+
+    queries = _queries(args.queries)
+
+    async def legacy(db, query):
+        (await db.scalars(_ilike_stmt(query, args.limit))).all()
+
+    async def indexed(db, query):
+        await _indexed(db, query, args.limit)
+
+    await _time("ilike scan (old)", queries, legacy)
+    await _time("prefix + trigram", queries, indexed)
+
+    engine.dispose()
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,40 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from starlette.requests import Request
+
+from app.downloads import is_not_modified, requested_range
+
+LAST_MODIFIED = datetime(1994, 11, 6, 8, 49, 37, tzinfo=timezone.utc)
+
+# RFC 9110 date formats; asctime and a "-0000" offset parse as naive datetimes
+IMF_FIXDATE = "Sun, 06 Nov 1994 08:49:37 GMT"
+ASCTIME = "Sun Nov  6 08:49:37 1994"
+UNKNOWN_ZONE = "Sun, 06 Nov 1994 08:49:37 -0000"
+
+
+def _stat(size=100):
+    return SimpleNamespace(etag="abc", last_modified=LAST_MODIFIED, size=size)
+
+
+def _request(**headers):
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "headers": raw})
+
+
+def test_if_modified_since_accepts_every_date_format():
+    for value in (IMF_FIXDATE, ASCTIME, UNKNOWN_ZONE):
+        assert is_not_modified(_request(if_modified_since=value), _stat())
+
+
+def test_if_modified_since_before_last_modified():
+    assert not is_not_modified(_request(if_modified_since="Sat Nov  5 08:49:37 1994"), _stat())
+
+
+def test_if_range_date_matches_in_every_format():
+    for value in (IMF_FIXDATE, ASCTIME, UNKNOWN_ZONE):
+        assert requested_range(_request(range="bytes=0-9", if_range=value), _stat()) == (0, 9)
+
+
+def test_if_range_stale_date_serves_full_body():
+    assert requested_range(_request(range="bytes=0-9", if_range="Sat Nov  5 08:49:37 1994"), _stat()) is None
@@ -82,4 +82,5 @@ api.interceptors.response.use(
   }
 );
 
+export { resolveBaseUrl };
 export default api;
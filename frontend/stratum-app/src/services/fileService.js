@@ -10,6 +10,13 @@ export const fileService = {
     const res = await api.get(`/files/${nodeId}/children`);
     return res.data;
   },
+  getTree: async (projectId, { depth = 2, limit = 100, parentId = null, cursor = null } = {}) => {
+    const params = { depth, limit };
+    if (parentId) params.parent_id = parentId;
+    if (cursor) params.cursor = cursor;
+    const res = await api.get(`/files/project/${projectId}/tree`, { params });
+    return res.data;
+  },
   createFolder: async (projectId, name, parentId = null) => {
     const res = await api.post(`/files/project/${projectId}/folders`, { name, parent_id: parentId });
     return res.data;
@@ -29,6 +36,11 @@ export const fileService = {
     const res = await api.post(`/files/project/${projectId}/upload`, formData);
     return res.data;
   },
+  uploadBatch: async (projectId, formData) => {
+    // formData: file fields, optional parent_id, paths (one per file) and expand_archives
+    const res = await api.post(`/files/project/${projectId}/upload/batch`, formData);
+    return res.data;
+  },
   replaceFile: async (nodeId, formData) => {
     const res = await api.put(`/files/${nodeId}/content`, formData);
     return res.data;
@@ -39,6 +51,66 @@ export const fileService = {
     });
     return res;
   },
+  startDirectUpload: async (projectId, { filename, size, contentType, parentId }) => {
+    const res = await api.post(`/files/project/${projectId}/uploads`, {
+      filename,
+      size,
+      content_type: contentType,
+      parent_id: parentId,
+    });
+    return res.data;
+  },
+  commitDirectUpload: async (uploadToken, parts = []) => {
+    const res = await api.post('/files/uploads/commit', { upload_token: uploadToken, parts });
+    return res.data;
+  },
+  abortDirectUpload: async (uploadToken) => {
+    await api.post('/files/uploads/abort', { upload_token: uploadToken });
+  },
+  startResumableUpload: async (projectId, { filename, size, contentType, parentId }) => {
+    const res = await api.post(`/files/project/${projectId}/uploads/resumable`, {
+      filename,
+      size,
+      content_type: contentType,
+      parent_id: parentId,
+    });
+    return res.data;
+  },
+  getResumableUpload: async (sessionId) => {
+    const res = await api.get(`/files/uploads/resumable/${sessionId}`);
+    return res.data;
+  },
+  uploadResumablePart: async (sessionId, partNumber, blob, sha256) => {
+    const res = await api.put(`/files/uploads/resumable/${sessionId}/parts/${partNumber}`, blob, {
+      headers: {
+        'Content-Type': 'application/octet-stream',
+        ...(sha256 ? { 'X-Chunk-SHA256': sha256 } : {}),
+      },
+    });
+    return res.data;
+  },
+  completeResumableUpload: async (sessionId) => {
+    const res = await api.post(`/files/uploads/resumable/${sessionId}/complete`);
+    return res.data;
+  },
+  abortResumableUpload: async (sessionId) => {
+    await api.delete(`/files/uploads/resumable/${sessionId}`);
+  },
+  downloadFolderArchive: async (nodeId) => {
+    const res = await api.get(`/files/${nodeId}/archive`, { responseType: 'blob' });
+    return res;
+  },
+  downloadProjectArchive: async (projectId) => {
+    const res = await api.get(`/projects/${projectId}/archive`, { responseType: 'blob' });
+    return res;
+  },
+  downloadThumbnail: async (nodeId, size = 256) => {
+    const res = await api.get(`/files/${nodeId}/thumbnail`, {
+      params: { size },
+      responseType: 'blob',
+    });
+    return res;
+  },
   downloadFileWithProgress: async (nodeId, onProgress) => {
     const res = await api.get(`/files/${nodeId}/download`, {
       responseType: 'blob',
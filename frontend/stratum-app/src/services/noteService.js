@@ -1,10 +1,31 @@
 import api from './api';
 
 export const noteService = {
-  // Get all notes for a project
-  getNotes: async (projectId) => {
+  // Get all notes for a project. Optional params: limit, cursor, author_id,
+  // updated_after, updated_before, title_prefix, fields (e.g. 'id,title,updated_at')
+  getNotes: async (projectId, params = {}) => {
     try {
-      const response = await api.get(`/notes/project/${projectId}`);
+      const response = await api.get(`/notes/project/${projectId}`, { params });
+      return response.data;
+    } catch (error) {
+      throw error.response?.data || error;
+    }
+  },
+
+  // One page of notes plus the cursor for the next page (null on the last page)
+  getNotesPage: async (projectId, params = {}) => {
+    try {
+      const response = await api.get(`/notes/project/${projectId}`, { params });
+      return { notes: response.data, nextCursor: response.headers['x-next-cursor'] || null };
+    } catch (error) {
+      throw error.response?.data || error;
+    }
+  },
+
+  // Lightweight note list without content or attachment URLs
+  getNoteSummaries: async (projectId, params = {}) => {
+    try {
+      const response = await api.get(`/notes/project/${projectId}/summary`, { params });
       return response.data;
     } catch (error) {
       throw error.response?.data || error;
@@ -41,6 +62,27 @@ export const noteService = {
     }
   },
 
+  // Create many notes in one project: notes = [{ title, content }], up to 200.
+  // Returns { succeeded, failed, results: [{ index, status, detail, note }] }
+  createNotesBatch: async (projectId, notes) => {
+    try {
+      const response = await api.post('/notes/batch', { project_id: projectId, notes });
+      return response.data;
+    } catch (error) {
+      throw error.response?.data || error;
+    }
+  },
+
+  // Update many notes: notes = [{ id, title, content }]; per-item results as for createNotesBatch
+  updateNotesBatch: async (notes) => {
+    try {
+      const response = await api.patch('/notes/batch', { notes });
+      return response.data;
+    } catch (error) {
+      throw error.response?.data || error;
+    }
+  },
+
   // Delete a note
   deleteNote: async (noteId) => {
     try {
@@ -1,4 +1,5 @@
-import api from './api';
+import AsyncStorage from '@react-native-async-storage/async-storage';
+import api, { resolveBaseUrl } from './api';
 
 export const projectService = {
   // Get all projects for the current user
@@ -82,6 +83,51 @@ export const projectService = {
     }
   },
 
+  // Full-text search over a project's notes and files.
+  // params: { kind: 'note' | 'file', limit, cursor }; returns { results, nextCursor }
+  searchProject: async (projectId, q, params = {}) => {
+    try {
+      const response = await api.get(`/projects/${projectId}/search`, { params: { q, ...params } });
+      return { results: response.data, nextCursor: response.headers['x-next-cursor'] || null };
+    } catch (error) {
+      throw error.response?.data || error;
+    }
+  },
+
+  // Delta sync: call without `since` for a starting cursor, then poll with the returned cursor.
+  // A 410 means the cursor expired: reload the project and start again.
+  getChanges: async (projectId, since = null, params = {}) => {
+    try {
+      const response = await api.get(`/projects/${projectId}/changes`, {
+        params: since ? { since, ...params } : params,
+      });
+      return response.data;
+    } catch (error) {
+      throw error.response?.data || error;
+    }
+  },
+
+  // Push notes edited offline: [{ id, client_id, title, content, deleted, base_updated_at, local_updated_at, force }]
+  pushChanges: async (projectId, notes) => {
+    try {
+      const response = await api.post(`/projects/${projectId}/changes`, { notes });
+      return response.data;
+    } catch (error) {
+      throw error.response?.data || error;
+    }
+  },
+
+  // Live changes: { url, headers } for an SSE client that can send an Authorization header.
+  // Events: note.*, notes.*, file.*, files.created, member.*, project.*; on "resync" reload via getChanges.
+  getEventStream: async (projectId) => {
+    const base = await resolveBaseUrl();
+    const token = await AsyncStorage.getItem('authToken');
+    return {
+      url: `${base}/projects/${projectId}/events`,
+      headers: token ? { Authorization: `Bearer ${token}` } : {},
+    };
+  },
+
   // Update member role
   updateMemberRole: async (projectId, userId, role) => {
     try {